@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from alerts import ALERT_NEEDS, build_alert_table
+from charts import CHART_NEEDS, CHART_REGISTRY
+from instrumentation import bind, span
+from planner import QueryPlan
+
+# Aggregate name -> compute stage; every entry takes the filtered fact rows (plus keyword params)
+AGGREGATES = {**CHART_REGISTRY, 'alert_table': build_alert_table}
+
+# Grouped aggregates behind each compute stage that accepts a totals= source
+AGGREGATE_NEEDS = {**CHART_NEEDS, 'alert_table': ALERT_NEEDS}
+
+AGGREGATION_WORKERS = int(os.environ.get('ADIDAS_AGGREGATION_WORKERS', min(8, os.cpu_count() or 1)))
+
+class AggregationScheduler:
+    """Runs section aggregates concurrently on a thread pool, one job per (aggregate, data key, params).
+
+    Reductions in NumPy and pandas release the GIL for much of their work, so the
+    independent aggregates of a rerun overlap instead of queuing in the script thread.
+    Finished jobs double as a result cache, so renderers and fragment reruns reuse them.
+    """
+
+    def __init__(self, max_workers=AGGREGATION_WORKERS, max_jobs=512):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='aggregate')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job key -> Future (finished ones double as a result cache)
+        self.max_jobs = max_jobs
+
+    def submit(self, name, df, data_key, **params):
+        """Return the Future for this aggregate, reusing any job already in flight or finished"""
+        return self._submit(name, data_key, params, lambda: self._executor.submit(bind(_compute), name, df, **params))
+
+    def submit_all(self, requests, df, data_key):
+        """Queue a rerun's aggregates at once; requests are names or (name, params) pairs.
+
+        Grouped aggregates not already cached go through one QueryPlan, which is returned
+        so the caller can report the data passes this rerun took.
+        """
+        requests = [(request, {}) if isinstance(request, str) else request for request in requests]
+        with self._lock:
+            pending = list(dict.fromkeys(name for name, params in requests if name in AGGREGATE_NEEDS and not params
+                                         and not self._reusable(self._key(name, data_key, params))))
+        plan = QueryPlan([need for name in pending for need in AGGREGATE_NEEDS[name]])
+        if pending:
+            # Submitted ahead of its consumers, so a worker never waits on a plan still in the queue
+            planned = self._executor.submit(bind(_execute_plan), plan, df)
+            for name in pending:
+                self._submit(name, data_key, {}, lambda: self._executor.submit(bind(_from_plan), name, df, planned))
+        for name, params in requests:
+            self.submit(name, df, data_key, **params)
+        return plan
+
+    def call(self, name, data_key, func, *args):
+        """Coalesced pool job for a computation outside AGGREGATES, e.g. KPIs, which also read the full dataset"""
+        return self._submit(name, data_key, {}, lambda: self._executor.submit(bind(func), *args))
+
+    def result(self, name, df, data_key, **params):
+        """Completed aggregate; computed inline when there is no data key to share it under"""
+        if data_key is None:
+            return _compute(name, df, **params)
+        return self.submit(name, df, data_key, **params).result()
+
+    def _key(self, name, data_key, params):
+        return (name, data_key, tuple(sorted(params.items())))
+
+    def _reusable(self, key):
+        future = self._jobs.get(key)
+        return future is not None and not (future.done() and future.exception() is not None)
+
+    def _submit(self, name, data_key, params, start):
+        key = self._key(name, data_key, params)
+        with self._lock:
+            if self._reusable(key):
+                self._jobs.move_to_end(key)
+                return self._jobs[key]
+
+            future = start()
+            self._jobs[key] = future
+            self._evict()
+            return future
+
+    def _evict(self):
+        # Drop the oldest finished jobs; in-flight ones are kept so waiters stay coalesced
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[key].done():
+                del self._jobs[key]
+
+    def in_flight(self):
+        with self._lock:
+            return sum(1 for future in self._jobs.values() if not future.done())
+
+    def items(self):
+        """(job key, result) for the finished jobs still held as cache entries"""
+        with self._lock:
+            jobs = list(self._jobs.items())
+        return [(key, future.result()) for key, future in jobs if future.done() and future.exception() is None]
+
+def _compute(name, df, **params):
+    with span(f'aggregate.{name}', **params):
+        return AGGREGATES[name](df, **params)
+
+def _execute_plan(plan, df):
+    with span('query_plan', **plan.report()):
+        return plan.execute(df)
+
+def _from_plan(name, df, planned):
+    with span(f'aggregate.{name}', planned=True):
+        return AGGREGATES[name](df, totals=planned.result().totals)
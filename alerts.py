@@ -0,0 +1,158 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from planner import QueryPlan
+
+# Default thresholds, override per call with evaluate_alerts(..., thresholds={...})
+ALERT_THRESHOLDS = {
+    'dominant_share': 30.0,   # % of total sales above which a segment is dominant
+    'expansion_share': 10.0,  # % of total sales below which a segment is an expansion target
+}
+
+ALERT_DIMENSIONS = ['retailer_name', 'product_category', 'city', 'sales_method', 'region']
+
+@dataclass
+class AlertRule:
+    """Declarative alert: pick rows of one dimension by rank or by threshold on a measure"""
+    name: str
+    dimension: str
+    measure: str
+    kind: str        # 'top', 'bottom', 'above' or 'below'
+    severity: str    # 'success', 'warning', 'danger' or 'info'
+    template: str    # str.format fields: key, value, value_m, share
+    threshold: str = None  # key into the thresholds dict for 'above'/'below' rules
+
+@dataclass
+class Alert:
+    rule: str
+    dimension: str
+    key: str
+    measure: str
+    value: float
+    severity: str
+    message: str
+
+    @property
+    def css_class(self):
+        return f"alert-{self.severity}"
+
+ALERT_RULES = [
+    AlertRule('top_retailer', 'retailer_name', 'total_sales', 'top', 'success',
+              "🏆 Top Performer: {key} dengan penjualan $ {value_m:.1f}M"),
+    AlertRule('bottom_retailer', 'retailer_name', 'total_sales', 'bottom', 'warning',
+              "⚠️ Perlu Perhatian: {key} dengan penjualan ${value_m:.1f}M"),
+    AlertRule('top_category', 'product_category', 'total_sales', 'top', 'success',
+              "🏅 Best Category: {key} (${value_m:.1f}M)"),
+    AlertRule('bottom_category', 'product_category', 'total_sales', 'bottom', 'warning',
+              "⚠️ Needs Attention: {key} (${value_m:.1f}M)"),
+    AlertRule('top_units_category', 'product_category', 'units_sold', 'top', 'success',
+              "🏆 Top Category: {key} ({value:.0f} units)"),
+    AlertRule('top_margin_category', 'product_category', 'operating_margin', 'top', 'success',
+              "💰 Highest Margin: {key} ({value:.1f}%)"),
+    AlertRule('bottom_margin_category', 'product_category', 'operating_margin', 'bottom', 'warning',
+              "⚠️ Lowest Margin: {key} ({value:.1f}%)"),
+    AlertRule('top_city', 'city', 'total_sales', 'top', 'success',
+              "🌆 Top City: {key} (${value_m:.1f}M)"),
+    AlertRule('bottom_city', 'city', 'total_sales', 'bottom', 'warning',
+              "⚠️ Needs Focus: {key} (${value_m:.1f}M)"),
+    AlertRule('top_sales_method', 'sales_method', 'total_sales', 'top', 'success',
+              "🎯 Dominant Method: {key} (${value_m:.1f}M)"),
+    AlertRule('bottom_sales_method', 'sales_method', 'total_sales', 'bottom', 'warning',
+              "⚠️ Underperforming: {key} (${value_m:.1f}M)"),
+    AlertRule('dominant_region', 'region', 'share', 'above', 'info',
+              "🎯 {key}: Wilayah dominan ({share:.1f}% dari total penjualan)", 'dominant_share'),
+    AlertRule('expansion_region', 'region', 'share', 'below', 'warning',
+              "📈 {key}: Potensi ekspansi ({share:.1f}% dari total penjualan)", 'expansion_share'),
+]
+
+ALERT_MEASURES = {'total_sales': 'sum', 'operating_profit': 'sum', 'units_sold': 'sum', 'operating_margin': 'mean'}
+
+def alert_needs(dimensions=ALERT_DIMENSIONS):
+    """Grouped aggregates the alert table reads, as (keys, measures) for the query planner.
+
+    Grouping by every dimension at once is the one pass over the rows; each
+    dimension's totals are derived from that (small) result.
+    """
+    return [(list(dimensions), ALERT_MEASURES)] + [([dimension], ALERT_MEASURES) for dimension in dimensions]
+
+ALERT_NEEDS = alert_needs()
+
+def build_alert_table(filtered_df, dimensions=ALERT_DIMENSIONS, totals=None):
+    """One long aggregate table (dimension, key, measures, share) shared by every rule, from one pass over the rows"""
+    if totals is None:
+        totals = QueryPlan(alert_needs(dimensions)).execute(filtered_df).totals
+    frames = []
+    for dimension in dimensions:
+        frame = totals(filtered_df, [dimension], ALERT_MEASURES).reset_index().rename(columns={dimension: 'key'})
+        frame.insert(0, 'dimension', dimension)
+        frames.append(frame)
+    return add_shares(pd.concat(frames, ignore_index=True))
+
+def add_shares(table):
+    totals = table.groupby('dimension')['total_sales'].transform('sum')
+    table['share'] = table['total_sales'] / totals * 100
+    return table
+
+def table_from_aggregate(data, dimension):
+    """Adapt a single-dimension aggregate (as built by the dashboard) to the alert table layout"""
+    table = data.rename(columns={dimension: 'key'})
+    for column in ['total_sales', 'operating_profit']:
+        if column not in table and f'{column}_usd' in table:
+            table[column] = table[f'{column}_usd'] * 1e6
+    table.insert(0, 'dimension', dimension)
+    if 'total_sales' in table:
+        table = add_shares(table)
+    return table.reset_index(drop=True)
+
+def evaluate_alerts(table, rules=None, thresholds=None):
+    """Evaluate all rules against the aggregate table and return Alert objects in rule order"""
+    rules = ALERT_RULES if rules is None else rules
+    limits = {**ALERT_THRESHOLDS, **(thresholds or {})}
+    table = table.reset_index(drop=True)
+
+    # Top/bottom row of every dimension for every ranked measure, in one grouped pass each
+    ranked = sorted({rule.measure for rule in rules if rule.kind in ('top', 'bottom') and rule.measure in table})
+    grouped = table.groupby('dimension', sort=False)[ranked] if ranked else None
+    picks = {
+        'top': grouped.idxmax() if ranked else None,
+        'bottom': grouped.idxmin() if ranked else None,
+    }
+    dimensions = table['dimension'].to_numpy()
+
+    alerts = []
+    for rule in rules:
+        if rule.measure not in table:
+            continue
+        if rule.kind in ('top', 'bottom'):
+            rank = picks[rule.kind]
+            if rule.dimension not in rank.index or pd.isna(rank.at[rule.dimension, rule.measure]):
+                continue
+            rows = [int(rank.at[rule.dimension, rule.measure])]
+        else:
+            values = table[rule.measure].to_numpy()
+            limit = limits[rule.threshold]
+            hits = values > limit if rule.kind == 'above' else values < limit
+            rows = np.flatnonzero((dimensions == rule.dimension) & hits)
+        for row in rows:
+            alerts.append(make_alert(rule, table.iloc[row]))
+    return alerts
+
+def make_alert(rule, row):
+    value = row[rule.measure]
+    fields = {
+        'key': row['key'],
+        'value': value,
+        'value_m': value / 1e6,
+        'share': row['share'] if 'share' in row else float('nan'),
+    }
+    return Alert(rule.name, rule.dimension, row['key'], rule.measure, value, rule.severity, rule.template.format(**fields))
+
+def select_alerts(alerts, rule_names):
+    return [alert for alert in alerts if alert.rule in rule_names]
+
+def dimension_frame(table, dimension):
+    """Slice one dimension out of the alert table with its original column name"""
+    frame = table[table['dimension'] == dimension].drop(columns='dimension')
+    return frame.rename(columns={'key': dimension}).reset_index(drop=True)
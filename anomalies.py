@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+ANOMALY_DIMENSIONS = ['retailer_name', 'region', 'product_category']
+
+# Trailing window (periods) and minimum history per granularity
+ANOMALY_WINDOWS = {
+    'D': {'window': 28, 'min_periods': 14},
+    'M': {'window': 6, 'min_periods': 3},
+}
+
+ANOMALY_THRESHOLDS = {'zscore': 3.0, 'mad': 3.5}
+
+def segment_matrix(df, dimensions=ANOMALY_DIMENSIONS, freq='D', value='total_sales'):
+    """Pivot sales into one (period × segment) matrix, columns keyed by (dimension, segment).
+
+    Built with factorize + bincount instead of groupby/unstack; periods without
+    sales are real zeros, so the index covers every period from first to last.
+    """
+    stamps = df['invoice_date'].to_numpy().astype(f'datetime64[{freq}]')
+    if not len(stamps):
+        return pd.DataFrame()
+    first = stamps.min()
+    period_codes = (stamps - first).astype(np.int64)
+    n_periods = int(period_codes.max()) + 1
+    weights = df[value].to_numpy(dtype=float)
+
+    blocks, columns = [], []
+    for dimension in dimensions:
+        codes, segments = pd.factorize(df[dimension], sort=True)
+        known = codes >= 0
+        flat = np.bincount(period_codes[known] * len(segments) + codes[known], weights=weights[known],
+                           minlength=n_periods * len(segments))
+        blocks.append(flat.reshape(n_periods, len(segments)))
+        columns.extend((dimension, segment) for segment in segments)
+
+    index = pd.DatetimeIndex(first + np.arange(n_periods), name='period')
+    return pd.DataFrame(np.hstack(blocks), index=index,
+                        columns=pd.MultiIndex.from_tuples(columns, names=['dimension', 'segment']))
+
+def rolling_zscore(values, window, min_periods):
+    """Score each period against the mean/std of the preceding window, for all columns at once"""
+    n_periods = len(values)
+    # Running sums over a per-column centered matrix keep the variance numerically stable
+    column_mean = values.mean(axis=0)
+    centered = values - column_mean
+    zeros = np.zeros((1, values.shape[1]))
+    csum = np.vstack([zeros, np.cumsum(centered, axis=0)])
+    csum_sq = np.vstack([zeros, np.cumsum(centered ** 2, axis=0)])
+
+    end = np.arange(n_periods)  # period t is scored against periods start..t-1
+    start = np.maximum(end - window, 0)
+    count = (end - start)[:, None].astype(float)
+    total = csum[end] - csum[start]
+    total_sq = csum_sq[end] - csum_sq[start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(total_sq - total * mean, 0) / (count - 1))
+        score = (centered - mean) / std
+    valid = (count >= min_periods) & (std > 0)
+    return np.where(valid, score, np.nan), np.where(count >= min_periods, mean + column_mean, np.nan)
+
+def window_median(windows):
+    """Median along the last axis via partial sort (faster than np.median on large stacks)"""
+    size = windows.shape[-1]
+    k = size // 2
+    if size % 2:
+        return np.partition(windows, k, axis=-1)[..., k]
+    part = np.partition(windows, [k - 1, k], axis=-1)
+    return (part[..., k - 1] + part[..., k]) / 2
+
+def rolling_mad(values, window, min_periods, chunk_columns=512):
+    """Modified z-score against the preceding window's median/MAD, for all columns at once"""
+    n_periods, n_columns = values.shape
+    score = np.full(values.shape, np.nan)
+    median = np.full(values.shape, np.nan)
+
+    # Leading periods with a partial (but long enough) history, one vectorized step each
+    for t in range(min_periods, min(window, n_periods)):
+        history = values[:t]
+        median[t] = np.median(history, axis=0)
+        mad = np.median(np.abs(history - median[t]), axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score[t] = np.where(mad > 0, 0.6745 * (values[t] - median[t]) / mad, np.nan)
+
+    # Full windows as strided views; chunked over columns to bound the temporary copies
+    if n_periods <= window:
+        return score, median
+    for start in range(0, n_columns, chunk_columns):
+        columns = slice(start, start + chunk_columns)
+        windows = sliding_window_view(values[:, columns], window, axis=0)[:-1]  # row i scores period i + window
+        chunk_median = window_median(windows)
+        mad = window_median(np.abs(windows - chunk_median[..., None]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            chunk_score = 0.6745 * (values[window:, columns] - chunk_median) / mad
+        score[window:, columns] = np.where(mad > 0, chunk_score, np.nan)
+        median[window:, columns] = chunk_median
+    return score, median
+
+def detect_anomalies(df, freq='D', method='zscore', dimensions=ANOMALY_DIMENSIONS, thresholds=None):
+    """Flag outlying periods of every segment series; returns one row per anomaly"""
+    limits = {**ANOMALY_THRESHOLDS, **(thresholds or {})}
+    matrix = segment_matrix(df, dimensions, freq)
+    columns = ['period', 'dimension', 'segment', 'total_sales', 'baseline', 'score', 'direction']
+    if matrix.empty:
+        return pd.DataFrame(columns=columns)
+
+    values = matrix.to_numpy(dtype=float)
+    params = ANOMALY_WINDOWS[freq]
+    if method == 'zscore':
+        score, baseline = rolling_zscore(values, params['window'], params['min_periods'])
+    else:
+        score, baseline = rolling_mad(values, params['window'], params['min_periods'])
+
+    rows, cols = np.nonzero(np.abs(np.nan_to_num(score)) > limits[method])
+    anomalies = pd.DataFrame({
+        'period': matrix.index[rows],
+        'dimension': matrix.columns.get_level_values('dimension')[cols],
+        'segment': matrix.columns.get_level_values('segment')[cols],
+        'total_sales': values[rows, cols],
+        'baseline': baseline[rows, cols],
+        'score': score[rows, cols],
+    })
+    anomalies['direction'] = np.where(anomalies['score'] > 0, 'spike', 'drop')
+    return anomalies.sort_values('score', key=np.abs, ascending=False, ignore_index=True)
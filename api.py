@@ -0,0 +1,299 @@
+"""Read-only JSON API over the numbers behind the dashboard: KPIs, section aggregates, alerts and forecasts.
+
+    python api.py --port 8502
+    curl 'http://127.0.0.1:8502/kpis?start=2021-01-01&end=2021-03-31&region=West'
+
+Endpoints: / (index of aggregates, periods and filters), /kpis, /aggregates/<name>,
+/alerts and /forecast. Every endpoint takes a date range (start and end as ISO
+dates, or a period preset label; the whole dataset by default) and dimension
+filters (region=West&region=South ...). Aggregates take their own parameters
+(level for sales_map, freq and method for anomalies), /alerts an optional rule
+and /forecast an optional algorithm. /forecast?scope=history is the next-month
+forecast of the whole warehouse history from the persisted incremental model,
+which ignores the filters.
+
+Results come from the same AggregationScheduler and ForecastJobs as app.py, under
+the same data keys, so a period already opened in the dashboard (or warmed) costs
+no computation. Responses carry an ETag derived from the dataset version and the
+normalized query: a matching If-None-Match gets 304 without touching the data, and
+rendered bodies are kept in an LRU so repeated polls skip computation and encoding.
+With ADIDAS_API_PORT set, app.py serves this API from the Streamlit process itself.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from aggregation import AGGREGATES, AggregationScheduler
+from alerts import evaluate_alerts
+from forecast_jobs import ForecastJobs
+from instrumentation import span, trace
+from predictions import generate_prediction_alert, refresh_sales_model
+from processing import calculate_kpis, dataset_version, filter_data, get_period_options, share_dataset
+
+API_PORT = int(os.environ.get('ADIDAS_API_PORT', 0))
+
+logger = logging.getLogger(__name__)
+
+# Columns the data can be narrowed by, in addition to the date range
+FILTER_DIMENSIONS = ['region', 'state', 'city', 'retailer_name', 'product_category', 'gender_type', 'sales_method']
+
+# Accepted values of each aggregate's parameters; the first one is the dashboard's default
+AGGREGATE_PARAMS = {
+    'sales_map': {'level': ['city', 'state', 'region']},
+    'anomalies': {'freq': ['D', 'M'], 'method': ['zscore', 'mad']},
+}
+
+FORECAST_ALGORITHMS = ['random_forest', 'linear']
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def jsonable(value):
+    """Plain JSON types for frames, NumPy values, alerts and result dicts (NaN becomes null)"""
+    if isinstance(value, pd.DataFrame):
+        frame = value.reset_index(drop=isinstance(value.index, pd.RangeIndex))
+        frame.columns = [str(column) for column in frame.columns]
+        return json.loads(frame.to_json(orient='records', date_format='iso'))
+    if isinstance(value, pd.Series):
+        return jsonable(value.to_frame())
+    if isinstance(value, dict):
+        return {str(key): jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [jsonable(item) for item in value]
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, '__dataclass_fields__'):
+        return {name: jsonable(getattr(value, name)) for name in value.__dataclass_fields__}
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+class SalesApi:
+    """Answers API queries against one shared dataset, with ETags and a response LRU per dataset version"""
+
+    def __init__(self, scheduler, forecast_jobs, df=None, max_responses=256, max_views=8):
+        self.scheduler = scheduler
+        self.forecast_jobs = forecast_jobs
+        self.max_responses = max_responses
+        self.max_views = max_views
+        self._lock = threading.Lock()
+        self._responses = OrderedDict()  # etag -> encoded body
+        self._views = OrderedDict()  # data key -> dimension-filtered rows
+        self.df = None
+        self.version = None
+        self.sales_model = None
+        if df is not None:
+            self.use_dataset(df)
+
+    def use_dataset(self, df, sales_model=None):
+        """Serve df (and its incremental model, for warehouse data) from now on; older cached answers are dropped"""
+        with self._lock:
+            if df is self.df and sales_model is self.sales_model:
+                return
+            self.df, self.version, self.sales_model = df, dataset_version(df), sales_model
+            self._responses.clear()
+            self._views.clear()
+
+    def get(self, target, if_none_match=None):
+        """(status, body, etag) for a GET of target, a path with its query string"""
+        with self._lock:
+            df, version = self.df, self.version
+        if df is None:
+            return 503, self._encode({'error': 'Data belum dimuat'}), None
+        parts = urlsplit(target)
+        path = unquote(parts.path).rstrip('/') or '/'
+        query = {key: sorted(values) for key, values in parse_qs(parts.query).items()}
+        etag = '"' + hashlib.sha1(repr((version, path, sorted(query.items()))).encode()).hexdigest() + '"'
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return 304, b'', etag
+        with self._lock:
+            body = self._responses.get(etag)
+            if body is not None:
+                self._responses.move_to_end(etag)
+                return 200, body, etag
+        try:
+            with trace('api'), span('api.request', path=path):
+                body = self._encode(self._answer(df, version, path, query))
+        except ApiError as e:
+            return e.status, self._encode({'error': str(e)}), None
+        except Exception:
+            # A bug in one endpoint must not drop the connection without a response
+            logger.exception('GET %s failed', target)
+            return 500, self._encode({'error': 'internal error'}), None
+        with self._lock:
+            self._responses[etag] = body
+            while len(self._responses) > self.max_responses:
+                self._responses.popitem(last=False)
+        return 200, body, etag
+
+    def _encode(self, payload):
+        return json.dumps(jsonable(payload), ensure_ascii=False, allow_nan=False).encode()
+
+    def _answer(self, df, version, path, query):
+        if path == '/':
+            return self._index(df)
+        if path not in ('/kpis', '/alerts', '/forecast') and not path.startswith('/aggregates/'):
+            raise ApiError(404, f"Unknown endpoint '{path}'")
+        if path == '/forecast' and query.get('scope', ['period'])[-1] == 'history':
+            if self.sales_model is None:
+                raise ApiError(404, "Model inkremental hanya tersedia untuk data warehouse")
+            prediction = self.sales_model.forecast()
+            if not isinstance(prediction, dict):
+                raise ApiError(422, prediction)
+            return {'scope': 'history', 'forecast': prediction, 'alerts': generate_prediction_alert(prediction)}
+        rows, data_key, selection = self._select(df, version, query)
+        if path == '/kpis':
+            kpis = self.scheduler.call('kpis', data_key, calculate_kpis, rows, df).result()
+            return {'filter': selection, 'rows': len(rows), 'kpis': kpis}
+        if path == '/alerts':
+            alerts = evaluate_alerts(self.scheduler.result('alert_table', rows, data_key))
+            rules = query.get('rule')
+            if rules:
+                alerts = [alert for alert in alerts if alert.rule in rules]
+            return {'filter': selection, 'alerts': alerts}
+        if path == '/forecast':
+            algorithm = self._choice(query, 'algorithm', FORECAST_ALGORITHMS)
+            monthly_data = self.scheduler.result('sales_profit_trend', rows, data_key)
+            # Same filter key as the dashboard's forecast jobs: (start, end), plus any dimension filters
+            prediction, _, _ = self.forecast_jobs.submit(monthly_data, data_key[1:], algorithm=algorithm).result()
+            if not isinstance(prediction, dict):
+                raise ApiError(422, prediction)
+            return {'filter': selection, 'algorithm': algorithm, 'forecast': prediction,
+                    'alerts': generate_prediction_alert(prediction)}
+        if path.startswith('/aggregates/'):
+            name = path[len('/aggregates/'):]
+            if name not in AGGREGATES:
+                raise ApiError(404, f"Unknown aggregate '{name}'")
+            params = {param: self._choice(query, param, values)
+                      for param, values in AGGREGATE_PARAMS.get(name, {}).items()}
+            data = self.scheduler.result(name, rows, data_key, **params)
+            return {'filter': selection, 'aggregate': name, 'params': params,
+                    'attrs': dict(getattr(data, 'attrs', {})), 'data': data}
+
+    def _index(self, df):
+        return {
+            'endpoints': ['/kpis', '/aggregates/<name>', '/alerts', '/forecast', '/forecast?scope=history'],
+            'aggregates': {name: AGGREGATE_PARAMS.get(name, {}) for name in AGGREGATES},
+            'periods': get_period_options(df),
+            'dimensions': FILTER_DIMENSIONS,
+            'forecast_algorithms': FORECAST_ALGORITHMS,
+        }
+
+    def _choice(self, query, param, values):
+        value = query.get(param, [values[0]])[-1]
+        if value not in values:
+            raise ApiError(400, f"{param} must be one of {', '.join(values)}")
+        return value
+
+    def _select(self, df, version, query):
+        """Filtered rows, their data key and a description of the filter.
+
+        Without dimension filters the key is the dashboard's chart key, so the
+        results are shared with the Streamlit sessions and the cache warm-up.
+        """
+        if 'period' in query:
+            periods = get_period_options(df)
+            period = query['period'][-1]
+            if period not in periods:
+                raise ApiError(400, f"Unknown period '{period}'")
+            start_date, end_date = periods[period]
+        else:
+            try:
+                start_date = pd.Timestamp(query['start'][-1]) if 'start' in query else df['invoice_date'].min()
+                end_date = pd.Timestamp(query['end'][-1]) if 'end' in query else df['invoice_date'].max()
+            except ValueError as e:
+                raise ApiError(400, f"Invalid date: {e}")
+        dimensions = tuple((dimension, tuple(query[dimension])) for dimension in FILTER_DIMENSIONS if dimension in query)
+        selection = {'start': start_date, 'end': end_date, **{dimension: list(values) for dimension, values in dimensions}}
+
+        rows = filter_data(df, start_date, end_date)
+        if not dimensions:
+            return rows, (version, start_date, end_date), selection
+        data_key = (version, start_date, end_date, dimensions)
+        with self._lock:
+            view = self._views.get(data_key)
+            if view is not None:
+                self._views.move_to_end(data_key)
+                return view, data_key, selection
+        mask = np.ones(len(rows), dtype=bool)
+        for dimension, values in dimensions:
+            mask &= rows[dimension].isin(values).to_numpy()
+        view = rows[mask]
+        with self._lock:
+            self._views[data_key] = view
+            while len(self._views) > self.max_views:
+                self._views.popitem(last=False)
+        return view, data_key, selection
+
+def start_api_server(api, port=API_PORT, host='127.0.0.1'):
+    """Serve the API from daemon threads; returns the server (None when no port is configured)"""
+    if not port:
+        return None
+
+    class ApiHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, body, etag = api.get(self.path, self.headers.get('If-None-Match'))
+            self.send_response(status)
+            if etag:
+                self.send_header('ETag', etag)
+                # Clients revalidate every poll; an unchanged answer costs a 304 and no computation
+                self.send_header('Cache-Control', 'no-cache')
+            if status != 304:
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='api', daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=API_PORT or 8502)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--rows', type=int, help='synthetic rows when the database is unreachable (ADIDAS_SAMPLE_ROWS)')
+    parser.add_argument('--database-url', help='SQLAlchemy URL of the warehouse (ADIDAS_DATABASE_URL)')
+    args = parser.parse_args(argv)
+
+    # Read by database.py when it is first imported below
+    if args.rows:
+        os.environ['ADIDAS_SAMPLE_ROWS'] = str(args.rows)
+    if args.database_url:
+        os.environ['ADIDAS_DATABASE_URL'] = args.database_url
+    from database import connect_to_database, read_sales_data
+
+    df = share_dataset(read_sales_data(connect_to_database()))
+    api = SalesApi(AggregationScheduler(), ForecastJobs())
+    # Persisted model state only tracks warehouse data, never the sample fallback
+    api.use_dataset(df, refresh_sales_model(df) if df.attrs.get('source') == 'warehouse' else None)
+    server = start_api_server(api, args.port, args.host)
+    print(f"Serving {len(df):,} rows on http://{args.host}:{server.server_address[1]}/", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
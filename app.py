@@ -1,14 +1,26 @@
+import time
+from functools import lru_cache, wraps
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 from database import connect_to_database, load_data
-from processing import filter_data, calculate_kpis
-from predictions import generate_sales_prediction, generate_performance_alert, generate_retailer_alert, generate_geographic_insights, generate_prediction_alert, generate_category_alert, generate_gender_preference_alert, generate_units_category_alert, generate_margin_category_alert, generate_city_alert, generate_sales_method_alert
+from processing import filter_data, calculate_kpis, dataset_version, get_period_options
+from forecast_jobs import ForecastJobs
+from warmup import CACHE_WARMUP, CacheWarmup
+from api import API_PORT, SalesApi, start_api_server
+from instrumentation import TRACE_FILE, current_trace, span, trace
+from memory import AllocationSnapshot, MemoryAccounts, object_bytes, process_rss_bytes, start_metrics_server
+from predictions import refresh_sales_model, generate_performance_alert, generate_prediction_alert, generate_gender_preference_alert
+from alerts import evaluate_alerts, select_alerts, dimension_frame
 from visualizations import (
-    plot_sales_profit_trend, plot_multi_period_trend, plot_annual_sales_profit,
+    get_figure_cache, get_aggregation_scheduler, aggregate,
+    plot_sales_profit_trend, draw_sales_profit_trend, plot_multi_period_trend, plot_annual_sales_profit,
     plot_units_trend, plot_top_retailers, plot_retailer_performance,
     plot_product_category_performance, plot_gender_distribution, plot_gender_preferences,
     plot_gender_trend, plot_units_per_category, plot_margin_per_category,
-    plot_regional_sales, plot_sales_map, plot_sales_method_distribution, plot_sales_method_trend
+    plot_regional_sales, plot_sales_map, plot_sales_method_distribution, plot_sales_method_trend,
+    plot_anomalies
 )
 
 # Set page configuration
@@ -23,10 +35,11 @@ st.set_page_config(
 if 'dark_mode' not in st.session_state:
     st.session_state.dark_mode = False
 
-def get_theme_styles():
-    """Return CSS styles for dark mode with Adidas dashboard color palette"""
-    if st.session_state.dark_mode:
-        return """
+@lru_cache(maxsize=None)
+def get_theme_styles(dark_mode):
+    """Return CSS styles for dark mode with Adidas dashboard color palette, built once per theme"""
+    if dark_mode:
+        css = """
         <style>
             @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
             
@@ -261,7 +274,7 @@ def get_theme_styles():
         </style>
         """
     else:
-        return """
+        css = """
         <style>
             @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
             
@@ -497,6 +510,126 @@ def get_theme_styles():
             }
         </style>
         """
+    # Indentation and blank lines are most of the stylesheet, which is sent to the browser on every rerun
+    return '\n'.join(line.strip() for line in css.splitlines() if line.strip())
+
+@st.cache_resource
+def get_forecast_jobs():
+    """Process-wide forecast executor shared by every session"""
+    return ForecastJobs()
+
+@st.cache_resource
+def get_sales_model(_df, data_key):
+    """Incremental calendar-month model, refreshed (not refit) when new months arrive"""
+    model = refresh_sales_model(_df)
+    get_memory_accounts().register_cache('sales_model', lambda: [(data_key, model)])
+    return model
+
+@st.cache_resource
+def get_sales_api():
+    """Process-wide JSON API on ADIDAS_API_PORT, answering from the dashboard's own scheduler and forecast jobs"""
+    api = SalesApi(get_aggregation_scheduler(), get_forecast_jobs())
+    start_api_server(api)
+    return api
+
+@st.cache_resource
+def get_cache_warmup(_df, data_version):
+    """Process-wide warm-up of every period preset for this dataset; started after the first page render"""
+    return CacheWarmup(_df, warmup_requests(), get_aggregation_scheduler(), get_forecast_jobs(), get_figure_cache())
+
+def warmup_status(warmup):
+    completed, total, current = warmup.progress()
+    if warmup.done():
+        st.caption(f"✅ Cache {total} periode siap ({warmup.elapsed_ms / 1000:,.1f} s)"
+                   + (f" • {len(warmup.errors)} gagal" if warmup.errors else ""))
+    else:
+        st.progress(completed / total, text=f"Menyiapkan cache periode {completed}/{total}" + (f": {current}" if current else ""))
+
+@st.fragment(run_every=1)
+def warmup_progress(warmup):
+    """Polls the background warm-up while it runs; a full rerun once it is done swaps in the static status"""
+    if warmup.done():
+        st.rerun()
+    warmup_status(warmup)
+
+@st.cache_resource
+def get_memory_accounts():
+    """Process-wide memory accounts over the shared caches, also served on ADIDAS_METRICS_PORT"""
+    accounts = MemoryAccounts()
+    accounts.register_cache('figures', get_figure_cache().items)
+    accounts.register_cache('aggregates', get_aggregation_scheduler().items)
+    accounts.register_cache('forecasts', get_forecast_jobs().items)
+    start_metrics_server(accounts)
+    return accounts
+
+def record_session_memory(df, filtered_df, chart_key, deep):
+    """This session's filtered view and state sizes; the deep sizes (a full scan of the view's rows and a walk of
+    the session state) only when deep"""
+    accounts = get_memory_accounts()
+    accounts.register_dataset(df)
+    report = {
+        'view_rows': len(filtered_df),
+        'state_bytes': object_bytes({key: st.session_state[key] for key in st.session_state}) if deep else None,
+        'dataset_bytes': accounts.dataset() if deep else None,
+    }
+    report['view_bytes'], report['view_owned_bytes'] = accounts.view(chart_key, filtered_df, df) if deep else (None, None)
+    ctx = get_script_run_ctx()
+    accounts.record_session(ctx.session_id if ctx else 'script', report)
+    return report
+
+def render_memory(container, session, allocations):
+    accounts = get_memory_accounts()
+    rows = [
+        {'account': 'process RSS', 'entries': None, 'MB': process_rss_bytes()},
+        {'account': 'dataset (shared)', 'entries': 1, 'MB': session['dataset_bytes']},
+        {'account': 'filtered view (this session)', 'entries': session['view_rows'], 'MB': session['view_bytes']},
+        {'account': 'filtered view copies (this session)', 'entries': session['view_rows'], 'MB': session['view_owned_bytes']},
+        {'account': 'session state (this session)', 'entries': len(st.session_state), 'MB': session['state_bytes']},
+    ]
+    rows += [{'account': f'{name} cache', 'entries': cache['entries'], 'MB': cache['bytes']}
+             for name, cache in accounts.caches().items()]
+    for row in rows:
+        row['MB'] = round(row['MB'] / 1e6, 2) if row['MB'] is not None else None
+    with container.container():
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        if allocations is not None:
+            st.write(f"tracemalloc: {allocations['traced_bytes'] / 1e6:,.1f} MB traced, "
+                     f"{allocations['peak_bytes'] / 1e6:,.1f} MB peak. Top allocations this rerun:")
+            st.dataframe(pd.DataFrame([{'site': top['site'], 'KB': round(top['size_diff'] / 1e3, 1),
+                                        'blocks': top['count_diff']} for top in allocations['top']]),
+                         hide_index=True, use_container_width=True)
+
+def prediction_alerts_html(prediction_result):
+    """Build the forecast alerts shown below the Monthly Sales and Profit chart"""
+    alerts_html = ""
+    if isinstance(prediction_result, dict):
+        prediction_alerts = generate_prediction_alert(prediction_result)
+        for alert in prediction_alerts:
+            if "📊" in alert:
+                alert_class = "alert-success"  # Hijau untuk prediction value
+            elif "📈" in alert:
+                if "UP" in alert or "NAIK" in alert:
+                    alert_class = "alert-success"  # Hijau untuk trend positif
+                else:
+                    alert_class = "alert-warning"  # Orange untuk trend negatif
+            else:  # MAE
+                alert_class = "alert-info"  # Biru untuk MAE/akurasi
+            
+            alerts_html += f'<div class="alert {alert_class}">{alert}</div>'
+    return alerts_html
+
+def render_alerts(alerts, *rule_names):
+    """Render the rule engine alerts of the given rules with their severity styling"""
+    for alert in select_alerts(alerts, rule_names):
+        st.markdown(f'<div class="alert {alert.css_class}">{alert.message}</div>', unsafe_allow_html=True)
+
+def history_forecast_html(sales_model):
+    """Full-history forecast from the incremental model, shown under the period forecast (warehouse data only)"""
+    if sales_model is None:
+        return ""
+    year, month = sales_model.last_period
+    return (f'<div class="alert alert-info">🗓️ Seluruh histori ({sales_model.n_months} bulan s/d {year}-{month:02d}, '
+            f'model inkremental)</div>' + prediction_alerts_html(sales_model.forecast()))
 
 def create_kpi_card(label, value, period, alert=None):
     """Helper function to create consistent KPI cards"""
@@ -513,9 +646,332 @@ def create_kpi_card(label, value, period, alert=None):
         alert_class = "alert-success" if "🟢" in alert else "alert-danger" if "🔴" in alert else "alert-warning"
         st.markdown(f'<div class="alert {alert_class}">{alert}</div>', unsafe_allow_html=True)
 
+def toggle_theme():
+    st.session_state.dark_mode = not st.session_state.dark_mode
+
+def timed_fragment(func):
+    """st.fragment that records its last run time in session state for the debug panel.
+
+    A widget inside the fragment reruns only that function, with the arguments of the last full run.
+    """
+    @wraps(func)
+    def run(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            if current_trace() is None:
+                # Fragment-only rerun: main() is not running, so the fragment is a trace of its own
+                with trace(func.__name__):
+                    return func(*args, **kwargs)
+            with span(func.__name__):
+                return func(*args, **kwargs)
+        finally:
+            record_timing(func.__name__, (time.perf_counter() - start) * 1000)
+    return st.fragment(run)
+
+def record_timing(name, elapsed_ms):
+    timings = st.session_state.setdefault('fragment_timings', {})
+    previous = timings.get(name, {'runs': 0})
+    timings[name] = {'last_ms': elapsed_ms, 'runs': previous['runs'] + 1}
+
+def render_timings(container):
+    timings = st.session_state.get('fragment_timings', {})
+    if timings:
+        container.dataframe(
+            pd.DataFrame([{'fragment': name, 'last run (ms)': round(timing['last_ms'], 1), 'runs': timing['runs']}
+                          for name, timing in timings.items()]),
+            hide_index=True, use_container_width=True
+        )
+
+def render_breakdown(container, rerun):
+    """Spans of this rerun by name, in start order (aggregations run on pool threads, so shares can overlap)"""
+    rows = rerun.breakdown() if rerun is not None else []
+    if rows:
+        container.dataframe(
+            pd.DataFrame([{'span': row['span'], 'calls': row['calls'], 'total (ms)': round(row['total_ms'], 1),
+                           'max (ms)': round(row['max_ms'], 1), 'start (ms)': round(row['first_ms'], 1),
+                           'of rerun': f"{row['share']:.0%}", 'threads': row['threads']} for row in rows]),
+            hide_index=True, use_container_width=True
+        )
+
+# Sections open on first load; the rest compute only once the analyst opens them
+SECTION_DEFAULTS = {
+    'trends': True,
+    'retailers': False,
+    'products': False,
+    'geo': False,
+    'channels': False,
+    'anomalies': False,
+    'insights': False,
+}
+
+# Aggregates each open section consumes; queued together so they run concurrently
+SECTION_AGGREGATES = {
+    'trends': ['sales_profit_trend', 'multi_period_trend', 'annual_sales_profit', 'units_trend'],
+    'retailers': ['alert_table', 'top_retailers', 'retailer_performance'],
+    'products': ['alert_table', 'product_category_performance', 'gender_distribution', 'gender_preferences',
+                 'gender_trend', 'units_per_category', 'margin_per_category'],
+    'geo': ['alert_table', 'regional_sales'],
+    'channels': ['alert_table', 'sales_method_distribution', 'sales_method_trend'],
+    'anomalies': [],
+    'insights': ['alert_table', 'sales_profit_trend', 'gender_preferences'],
+}
+
+def section_aggregates():
+    """Aggregate requests of the sections open in this run, with parameters read from their widget state"""
+    requests = []
+    for key, names in SECTION_AGGREGATES.items():
+        if st.session_state.get(f"section_{key}", SECTION_DEFAULTS[key]):
+            requests.extend(name for name in names if name not in requests)
+    if st.session_state.get("section_geo", SECTION_DEFAULTS['geo']):
+        requests.append(('sales_map', {'level': st.session_state.get("map_level", "City").lower()}))
+    if st.session_state.get("section_anomalies", SECTION_DEFAULTS['anomalies']):
+        requests.append(('anomalies', anomaly_params(
+            st.session_state.get("anomaly_granularity", "Daily"), st.session_state.get("anomaly_method", "Rolling z-score")
+        )))
+    return requests
+
+def warmup_requests():
+    """Every section's aggregates with default widget parameters, as precomputed by the cache warm-up"""
+    requests = list(dict.fromkeys(name for names in SECTION_AGGREGATES.values() for name in names))
+    return requests + [('sales_map', {'level': 'city'}), ('anomalies', anomaly_params("Daily", "Rolling z-score"))]
+
+def anomaly_params(granularity, method):
+    return {'freq': 'D' if granularity == "Daily" else 'M', 'method': 'zscore' if method == "Rolling z-score" else 'mad'}
+
+def section_header(key, title):
+    """Section title with an open/closed toggle; returns False (and closes the section) when it is collapsed"""
+    st.markdown(f"""
+    <div class="section-container">
+        <div class="section-title">
+            {title}
+        </div>
+    """, unsafe_allow_html=True)
+    is_open = st.toggle("Tampilkan", value=SECTION_DEFAULTS[key], key=f"section_{key}")
+    if not is_open:
+        st.markdown('</div>', unsafe_allow_html=True)
+    return is_open
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_alerts(_filtered_df, data_key):
+    """One aggregate table feeds every top/bottom and share alert in Sections 3-7"""
+    alert_table = aggregate('alert_table', _filtered_df, data_key)
+    return alert_table, evaluate_alerts(alert_table)
+
+def submit_forecast(filtered_df, chart_key, start_date, end_date):
+    monthly_data = aggregate('sales_profit_trend', filtered_df, chart_key)
+    # Jobs are coalesced per data + filter, so every section asking for the forecast shares one run
+    return monthly_data, get_forecast_jobs().submit(monthly_data, (start_date, end_date), algorithm='random_forest')
+
+@timed_fragment
+def sales_trends_section(filtered_df, chart_key, start_date, end_date):
+    col1, col2 = st.columns(2)
+    with col1:
+        # Forecast runs in the background; the historical trend renders right away
+        # and the prediction slot is filled once the job completes (before Section 7)
+        monthly_data, forecast_future = submit_forecast(filtered_df, chart_key, start_date, end_date)
+        forecast_chart = plot_sales_profit_trend(monthly_data, None, cache_key=chart_key)
+        prediction_slot = st.empty()
+        prediction_slot.info("⏳ Menghitung prediksi penjualan...")
+            
+    with col2:
+        plot_multi_period_trend(filtered_df, cache_key=chart_key)
+    
+    col3, col4 = st.columns(2)
+    with col3:
+        plot_annual_sales_profit(filtered_df, cache_key=chart_key)
+    
+    with col4:
+        plot_units_trend(filtered_df, cache_key=chart_key)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    return monthly_data, forecast_future, forecast_chart, prediction_slot
+
+@timed_fragment
+def retailer_section(filtered_df, chart_key):
+    _, alerts = get_alerts(filtered_df, chart_key)
+    col1, col2 = st.columns(2)
+    with col1:
+        plot_top_retailers(filtered_df, cache_key=chart_key)
+        render_alerts(alerts, 'top_retailer', 'bottom_retailer')
+    
+    with col2:
+        plot_retailer_performance(filtered_df, cache_key=chart_key)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def product_gender_section(filtered_df, chart_key):
+    _, alerts = get_alerts(filtered_df, chart_key)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        plot_product_category_performance(filtered_df, cache_key=chart_key)
+        render_alerts(alerts, 'top_category', 'bottom_category')
+
+    with col2:
+        plot_gender_distribution(filtered_df, cache_key=chart_key)
+
+    with col3:
+        plot_gender_preferences(filtered_df, cache_key=chart_key)
+
+        # Gender x category sales in millions, one row per gender
+        gender_pref_reset = aggregate('gender_preferences', filtered_df, chart_key)
+        categories = [col for col in gender_pref_reset.columns if col != 'gender_type']
+        
+        if len(gender_pref_reset) > 0:
+            gender_alerts = generate_gender_preference_alert(gender_pref_reset, categories)
+            for alert in gender_alerts:
+                st.markdown(f'<div class="alert alert-success">{alert}</div>', unsafe_allow_html=True)
+
+    # Second row with only 2 columns instead of 3
+    col4, col5 = st.columns(2)
+    with col4:
+        plot_gender_trend(filtered_df, cache_key=chart_key)
+
+    with col5:
+        plot_units_per_category(filtered_df, cache_key=chart_key)
+        render_alerts(alerts, 'top_units_category')
+
+    # Third row - Full width for Price vs Volume relationship
+    st.markdown('<div style="margin-top: 20px;"></div>', unsafe_allow_html=True)
+    plot_margin_per_category(filtered_df, cache_key=chart_key)
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def geographic_section(filtered_df, chart_key):
+    _, alerts = get_alerts(filtered_df, chart_key)
+    col1, col2 = st.columns(2)
+    with col1:
+        plot_regional_sales(filtered_df, cache_key=chart_key)
+        render_alerts(alerts, 'dominant_region', 'expansion_region')
+    
+    with col2:
+        map_level = st.radio("Map level", ["City", "State", "Region"], horizontal=True, key="map_level")
+        plot_sales_map(filtered_df, cache_key=chart_key, level=map_level.lower())
+        render_alerts(alerts, 'top_city', 'bottom_city')
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def sales_channel_section(filtered_df, chart_key):
+    _, alerts = get_alerts(filtered_df, chart_key)
+    col1, col2 = st.columns(2)
+    with col1:
+        plot_sales_method_distribution(filtered_df, cache_key=chart_key)
+        render_alerts(alerts, 'top_sales_method', 'bottom_sales_method')
+    
+    with col2:
+        plot_sales_method_trend(filtered_df, cache_key=chart_key)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def anomaly_section(filtered_df, chart_key):
+    col1, col2 = st.columns(2)
+    with col1:
+        granularity = st.radio("Granularity", ["Daily", "Monthly"], horizontal=True, key="anomaly_granularity")
+    with col2:
+        method = st.radio("Method", ["Rolling z-score", "Robust MAD"], horizontal=True, key="anomaly_method")
+    
+    anomalies = aggregate('anomalies', filtered_df, chart_key, **anomaly_params(granularity, method))
+    if anomalies.empty:
+        st.markdown('<div class="alert alert-info">✅ Tidak ada anomali terdeteksi pada periode ini</div>', unsafe_allow_html=True)
+    else:
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            plot_anomalies(anomalies, cache_key=(chart_key, granularity, method))
+        with col2:
+            for _, row in anomalies.head(5).iterrows():
+                alert_class = "alert-warning" if row['direction'] == 'spike' else "alert-danger"
+                icon = "📈" if row['direction'] == 'spike' else "📉"
+                st.markdown(
+                    f'<div class="alert {alert_class}">{icon} {row["segment"]} ({row["dimension"].replace("_", " ")}) '
+                    f'{row["period"]:%Y-%m-%d}: ${row["total_sales"] / 1e3:,.1f}K vs baseline ${row["baseline"] / 1e3:,.1f}K</div>',
+                    unsafe_allow_html=True
+                )
+            st.caption(f"{len(anomalies):,} anomalies flagged")
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@timed_fragment
+def insights_section(filtered_df, chart_key, start_date, end_date):
+    alert_table, _ = get_alerts(filtered_df, chart_key)
+    retailer_data = dimension_frame(alert_table, 'retailer_name')
+    regional_sales = dimension_frame(alert_table, 'region')
+
+    # Interactive filter for insight focus
+    with st.expander("🔍 Sesuaikan Wawasan", expanded=True):
+        focus_area = st.selectbox(
+            "Pilih Area Fokus",
+            ["Semua", "Wilayah", "Pengecer", "Produk", "Gender", "Saluran Penjualan", "Peramalan"],
+            key="insight_focus"
+        )
+
+    # Generate data-driven insights
+    insights = []
+    if focus_area in ["Semua", "Wilayah"]:
+        top_region = regional_sales.nlargest(1, 'total_sales')
+        region_share = top_region['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
+        insights.append(
+            f"<strong>🌍 Fokus pada Wilayah Utama:</strong> {top_region['region'].iloc[0]} menyumbang ${top_region['total_sales'].iloc[0] / 1e6:.1f}M ({region_share:.1f}% dari total penjualan, Peta Penjualan). Tingkatkan anggaran pemasaran sebesar 25% untuk mencapai pertumbuhan penjualan 15% di wilayah ini dalam 6 bulan."
+        )
+    if focus_area in ["Semua", "Pengecer"]:
+        top_retailer = retailer_data.nlargest(1, 'total_sales')
+        retailer_share = top_retailer['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
+        low_performers = retailer_data.nsmallest(3, 'total_sales')['retailer_name'].tolist()
+        insights.append(
+            f"<strong>🏪 Optimalkan Kemitraan Pengecer:</strong> {top_retailer['retailer_name'].iloc[0]} menghasilkan ${top_retailer['total_sales'].iloc[0] / 1e6:.1f}M ({retailer_share:.1f}% dari penjualan, Top 10 Pengecer). Luncurkan promosi eksklusif untuk meningkatkan penjualan sebesar 12%. Untuk pengecer berkinerja rendah ({', '.join(low_performers)}), tawarkan pelatihan penjualan untuk meningkatkan konversi."
+        )
+    if focus_area in ["Semua", "Produk"]:
+        top_category = dimension_frame(alert_table, 'product_category').set_index('product_category').nlargest(1, 'total_sales')
+        category_share = top_category['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
+        insights.append(
+            f"<strong>👕 Prioritaskan Kategori Produk:</strong> {top_category.index[0]} menghasilkan ${top_category['total_sales'].iloc[0] / 1e6:.1f}M ({category_share:.1f}% dari penjualan, Performa Kategori Produk). Tambah stok 20% untuk Q4 dan luncurkan kampanye musiman untuk meningkatkan penjualan sebesar 10%."
+        )
+    if focus_area in ["Semua", "Gender"]:
+        # Gender x category sales (millions) from the planned aggregate; the first gender is reported
+        gender_categories = aggregate('gender_preferences', filtered_df, chart_key).set_index('gender_type').iloc[0]
+        gender_sales = gender_categories.sum() * 1e6
+        top_gender_category = gender_categories[gender_categories != 0].nlargest(2).index.tolist()
+        gender_share = gender_sales / filtered_df['total_sales'].sum() * 100
+        insights.append(
+            f"<strong>👥 Sesuaikan Kampanye Gender:</strong> Pelanggan {gender_categories.name} menyumbang ${gender_sales / 1e6:.1f}M ({gender_share:.1f}% dari penjualan, Tren Pembelian Gender), dengan preferensi untuk {', '.join(top_gender_category)}. Targetkan iklan digital untuk kategori ini guna meningkatkan konversi sebesar 8%."
+        )
+    if focus_area in ["Semua", "Saluran Penjualan"]:
+        top_method = dimension_frame(alert_table, 'sales_method').set_index('sales_method').nlargest(1, 'total_sales')
+        method_share = top_method['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
+        insights.append(
+            f"<strong>🛒 Perkuat Saluran Penjualan:</strong> {top_method.index[0]} menghasilkan ${top_method['total_sales'].iloc[0] / 1e6:.1f}M ({method_share:.1f}% dari penjualan, Distribusi Metode Penjualan). Investasikan $750K untuk meningkatkan UX e-commerce, targetkan pertumbuhan 15% dalam 12 bulan."
+        )
+    if focus_area in ["Semua", "Peramalan"]:
+        monthly_data, forecast_future = submit_forecast(filtered_df, chart_key, start_date, end_date)
+        prediction_result, _, _ = forecast_future.result()
+        historical_avg = monthly_data['total_sales'].mean() / 1e6
+        forecast_diff = (prediction_result['prediction'] / 1e6 - historical_avg) / historical_avg * 100
+        insights.append(
+            f"<strong>📈 Rencanakan Berdasarkan Peramalan:</strong> Prediksi penjualan bulan depan ${prediction_result['prediction'] / 1e6:.1f}M (MAE: ${prediction_result['mae'] / 1e6:.1f}M), {abs(forecast_diff):.1f}% {'lebih tinggi' if forecast_diff > 0 else 'lebih rendah'} dari rata-rata historis (Tren Penjualan Bulanan). Siapkan stok tambahan dan optimalkan logistik untuk efisiensi biaya 5%."
+        )
+
+    # Display insights
+    st.markdown("""
+    <div class="insight-box">
+        <div class="insight-title">🎯 Wawasan Bisnis Utama</div>
+        <div class="insight-text">
+    """, unsafe_allow_html=True)
+    for insight in insights:
+        st.markdown(f"{insight}<br><br>", unsafe_allow_html=True)
+    st.markdown("""
+        </div>
+    </div>
+    </div>
+    """, unsafe_allow_html=True)
+
 def main():
+    # Allocation sites of this rerun, when tracemalloc is enabled (ADIDAS_TRACEMALLOC)
+    allocations = AllocationSnapshot()
+
     # Apply theme styles
-    st.markdown(get_theme_styles(), unsafe_allow_html=True)
+    st.markdown(get_theme_styles(st.session_state.dark_mode), unsafe_allow_html=True)
     
     # Main Dashboard Header with integrated theme toggle
     st.markdown(f"""
@@ -528,14 +984,13 @@ def main():
     # Theme toggle button positioned in the header area
     col1, col2, col3 = st.columns([1, 1, 1])
     with col2:
-        if st.button(
+        st.button(
             "🌙 Switch to Dark Mode" if not st.session_state.dark_mode else "☀️ Switch to Light Mode",
             key="theme_toggle",
             help="Toggle between light and dark mode",
+            on_click=toggle_theme,
             use_container_width=True
-        ):
-            st.session_state.dark_mode = not st.session_state.dark_mode
-            st.rerun()
+        )
     
     # Add some spacing after the theme toggle
     st.markdown("<div style='margin-bottom: 2rem;'></div>", unsafe_allow_html=True)
@@ -545,22 +1000,14 @@ def main():
         st.markdown("### 📊 Dashboard Controls")
         
         # Connect to database
-        engine = connect_to_database()
+        with span('connect'):
+            engine = connect_to_database()
         
         # Load data with progress indicator
-        with st.spinner("Loading data..."):
+        with st.spinner("Loading data..."), span('load') as loaded:
             df = load_data(engine)
-        
-        # Debug prints to diagnose issues
-        print("Data source:", "Database" if engine else "Sample")
-        print("DataFrame shape:", df.shape)
-        print("Columns:", df.columns.tolist())
-        print("Date range:", df['invoice_date'].min(), "to", df['invoice_date'].max())
-        print("price_per_unit sample:", df['price_per_unit'].head().to_list())
-        print("price_per_unit dtype:", df['price_per_unit'].dtype)
-        print("price_per_unit non-null count:", df['price_per_unit'].notnull().sum())
-        print("price_per_unit zero count:", (df['price_per_unit'] == 0).sum())
-        print("price_per_unit mean (raw):", df['price_per_unit'].mean())
+            if loaded is not None:
+                loaded.attrs['rows'] = len(df)
         
         if df.empty:
             st.error("❌ No data loaded. Check database or query.")
@@ -569,23 +1016,44 @@ def main():
         st.success(f"✅ Data loaded successfully")
         st.info(f"📈 {len(df):,} records | {len(df.columns)} columns")
         
+        from_warehouse = df.attrs.get('source') == 'warehouse'
+        sales_model = None
+        if from_warehouse:
+            # Persisted model state only tracks warehouse data, never the sample fallback
+            with span('model.refresh'):
+                sales_model = get_sales_model(df, (len(df), df['invoice_date'].max()))
+
         # Debug info in sidebar
         with st.expander("🔧 Debug Info"):
-            st.write(f"Data source: {'Database' if engine else 'Sample'}")
+            st.write(f"Data source: {'Database' if from_warehouse else 'Sample'}")
             st.write(f"DataFrame shape: {df.shape}")
             st.write(f"Date range: {df['invoice_date'].min()} to {df['invoice_date'].max()}")
             st.write(f"Price per unit mean: ${df['price_per_unit'].mean():,.2f}")
+            if sales_model is not None:
+                st.write(f"Incremental model: {sales_model.n_months} months up to {sales_model.last_period}, {len(sales_model.forest.estimators_)} trees")
+            cache_stats = get_figure_cache().stats()
+            st.write(
+                f"Figure cache: {cache_stats['hit_rate']:.0%} hit rate "
+                f"({cache_stats['hits']} hits / {cache_stats['misses']} misses), "
+                f"{cache_stats['entries']} entries, {cache_stats['evictions']} evictions"
+            )
+            # Filled once the sections below have run; fragment-only reruns show up on the next full run
+            plan_slot = st.empty()
+            st.write("Section timings:")
+            timings_slot = st.empty()
+            st.write("Rerun breakdown:")
+            breakdown_slot = st.empty()
+            if TRACE_FILE:
+                st.caption(f"Spans exported to {TRACE_FILE}")
+            # Deep sizes scan every row of the frames, so they are opt-in
+            memory_accounting = st.toggle("Memory accounting", key="memory_accounting")
+            memory_slot = st.empty()
         
         st.markdown("---")
         
         # Period Filter
         st.markdown("### 📅 Time Period")
-        period_options = {
-            "📊 Jan 2020 - Dec 2021": (pd.to_datetime("2020-01-01"), pd.to_datetime("2021-12-31")),
-            "📅 2021 Full Year": (pd.to_datetime("2021-01-01"), pd.to_datetime("2021-12-31")),
-            "🗓️ Q1 2021": (pd.to_datetime("2021-01-01"), pd.to_datetime("2021-03-31")),
-            "⏰ Last 6 Months": (df['invoice_date'].max() - pd.Timedelta(days=180), df['invoice_date'].max())
-        }
+        period_options = get_period_options(df)
         
         selected_period = st.selectbox(
             "Select Time Period", 
@@ -594,16 +1062,24 @@ def main():
         )
         
         start_date, end_date = period_options[selected_period]
-        filtered_df = filter_data(df, start_date, end_date)
-        
-        print("Filtered df shape:", filtered_df.shape)
-        print("Filtered price_per_unit sample:", filtered_df['price_per_unit'].head().to_list())
-        print("Filtered price_per_unit mean:", filtered_df['price_per_unit'].mean())
+        if API_PORT:
+            get_sales_api().use_dataset(df, sales_model)
+        warmup = get_cache_warmup(df, dataset_version(df)) if CACHE_WARMUP else None
+        if warmup is not None:
+            (warmup_status if warmup.done() else warmup_progress)(warmup)
+        with span('filter', period=selected_period) as filtered:
+            filtered_df = filter_data(df, start_date, end_date)
+            if filtered is not None:
+                filtered.attrs['rows'] = len(filtered_df)
+        # Figures depend only on the data and the filter; the theme is overlaid at render time
+        chart_key = (dataset_version(df), start_date, end_date)
         
         st.info(f"📊 Filtered to {len(filtered_df):,} records")
+        session_memory = record_session_memory(df, filtered_df, chart_key, deep=memory_accounting)
     
-    # Calculate KPIs
-    kpis = calculate_kpis(filtered_df, df)
+    # Calculate KPIs (shared across sessions per data + filter, and prefilled by the warm-up)
+    with span('kpis'):
+        kpis = get_aggregation_scheduler().call('kpis', chart_key, calculate_kpis, filtered_df, df).result()
 
     # current_year = filtered_df['year'].max()
     # last_year = current_year - 1
@@ -645,15 +1121,17 @@ def main():
     previous_year = current_year - 1
     
     # Compute previous year's metrics
-    prev_df = df[df['year'] == previous_year]
-    if not prev_df.empty:
-        prev_total_sales = prev_df['total_sales'].sum() / 1e6  # USD, in millions
-        prev_total_profit = prev_df['operating_profit'].sum() / 1e6  # USD, in millions
-        prev_total_units = prev_df['units_sold'].sum() / 1e6  # Millions
-        prev_avg_price = prev_df['price_per_unit'].dropna().mean() if prev_df['price_per_unit'].notnull().any() else 0  # USD
-    else:
-        prev_total_sales = prev_total_profit = prev_total_units = prev_avg_price = 0
-        print("Warning: No data for previous year", previous_year)
+    with span('kpis.previous_year', year=int(previous_year)) as previous:
+        prev_df = df[df['year'] == previous_year]
+        if previous is not None:
+            previous.attrs['rows'] = len(prev_df)
+        if not prev_df.empty:
+            prev_total_sales = prev_df['total_sales'].sum() / 1e6  # USD, in millions
+            prev_total_profit = prev_df['operating_profit'].sum() / 1e6  # USD, in millions
+            prev_total_units = prev_df['units_sold'].sum() / 1e6  # Millions
+            prev_avg_price = prev_df['price_per_unit'].dropna().mean() if prev_df['price_per_unit'].notnull().any() else 0  # USD
+        else:
+            prev_total_sales = prev_total_profit = prev_total_units = prev_avg_price = 0
     
     # Calculate percentage changes
     def format_pct_change(current, previous):
@@ -706,253 +1184,53 @@ def main():
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Section 2: Tren Penjualan (Sales Performance Trends)
-    st.markdown("""
-    <div class="section-container">
-        <div class="section-title">
-            📊 Sales Trends
-        </div>
-    """, unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        monthly_data = filtered_df.groupby('month').agg({'total_sales': 'sum', 'operating_profit': 'sum'}).reset_index()
-        prediction_result, _, _ = generate_sales_prediction(monthly_data, algorithm='random_forest')
-        plot_sales_profit_trend(monthly_data, prediction_result)
-
-        if isinstance(prediction_result, dict):
-            prediction_alerts = generate_prediction_alert(prediction_result)
-            for alert in prediction_alerts:
-                if "📊" in alert:
-                    alert_class = "alert-success"  # Hijau untuk prediction value
-                elif "📈" in alert:
-                    if "UP" in alert or "NAIK" in alert:
-                        alert_class = "alert-success"  # Hijau untuk trend positif
-                    else:
-                        alert_class = "alert-warning"  # Orange untuk trend negatif
-                else:  # MAE
-                    alert_class = "alert-info"  # Biru untuk MAE/akurasi
-                
-                st.markdown(f'<div class="alert {alert_class}">{alert}</div>', unsafe_allow_html=True)
-            
-    with col2:
-        plot_multi_period_trend(filtered_df)
+    # Sections below only aggregate and build figures while their toggle is open;
+    # shared results (alerts, forecast, figures) come from process-wide caches.
+    # Each section is a fragment: its own widgets rerun just that section
+    with span('aggregate.submit'):
+        plan = get_aggregation_scheduler().submit_all(section_aggregates(), filtered_df, chart_key).report()
+    trends = None
+    if section_header('trends', "📊 Sales Trends"):
+        trends = sales_trends_section(filtered_df, chart_key, start_date, end_date)
     
-    col3, col4 = st.columns(2)
-    with col3:
-        plot_annual_sales_profit(filtered_df)
+    if section_header('retailers', "🏪 Retailer Insights"):
+        retailer_section(filtered_df, chart_key)
     
-    with col4:
-        plot_units_trend(filtered_df)
+    if section_header('products', "👥 Product & Gender Analysis"):
+        product_gender_section(filtered_df, chart_key)
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    if section_header('geo', "🌍 Geographic Analysis"):
+        geographic_section(filtered_df, chart_key)
     
-    # Section 3: Wawasan Pengecer (Retailer Performance Analysis)
-    st.markdown("""
-    <div class="section-container">
-        <div class="section-title">
-            🏪 Retailer Insights
-        </div>
-    """, unsafe_allow_html=True)
+    if section_header('channels', "🛒 Sales Channel Analysis"):
+        sales_channel_section(filtered_df, chart_key)
     
-    col1, col2 = st.columns(2)
-    with col1:
-        plot_top_retailers(filtered_df)
-        retailer_data = filtered_df.groupby('retailer_name').agg({'total_sales': 'sum'}).reset_index()
-        retailer_alerts = generate_retailer_alert(retailer_data)
-        for alert in retailer_alerts:
-            alert_class = "alert-success" if "🏆" in alert else "alert-warning"
-            st.markdown(f'<div class="alert {alert_class}">{alert}</div>', unsafe_allow_html=True)
+    if section_header('anomalies', "🚨 Anomaly Detection"):
+        anomaly_section(filtered_df, chart_key)
     
-    with col2:
-        plot_retailer_performance(filtered_df)
+    if trends is not None:
+        # Wait for the background forecast and fill in the Sales Trends placeholder
+        with span('forecast_wait'):
+            monthly_data, forecast_future, forecast_chart, prediction_slot = trends
+            prediction_result, _, _ = forecast_future.result()
+            draw_sales_profit_trend(forecast_chart, monthly_data, prediction_result, cache_key=chart_key)
+            prediction_slot.markdown(prediction_alerts_html(prediction_result) + history_forecast_html(sales_model),
+                                     unsafe_allow_html=True)
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    if section_header('insights', "💡 Wawasan Strategis & Rekomendasi"):
+        insights_section(filtered_df, chart_key, start_date, end_date)
     
-# Section 4: Analisis Produk & Gender (Product & Customer Insights)
-    st.markdown("""
-    <div class="section-container">
-        <div class="section-title">
-            👥 Product & Gender Analysis
-        </div>
-    """, unsafe_allow_html=True)
-
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        plot_product_category_performance(filtered_df)
-
-        cat_perf = filtered_df.groupby('product_category').agg({'total_sales': 'sum'}).reset_index()
-        cat_perf['total_sales_usd'] = cat_perf['total_sales'] / 1e6
-
-        category_alerts = generate_category_alert(cat_perf)
-        for alert in category_alerts:
-            alert_class = "alert-success" if "🏅" in alert else "alert-warning"
-            st.markdown(f'<div class="alert {alert_class}">{alert}</div>', unsafe_allow_html=True)
-
-    with col2:
-        plot_gender_distribution(filtered_df)
-
-    with col3:
-        plot_gender_preferences(filtered_df)
-
-        gender_pref = filtered_df.groupby(['gender_type', 'product_category']).agg({'total_sales': 'sum'}).reset_index()
-        gender_pref_pivot = gender_pref.pivot(index='gender_type', columns='product_category', values='total_sales').fillna(0)
-        gender_pref_pivot = gender_pref_pivot.div(1e6)  # Convert to millions
-        
-        # Get categories list
-        categories = gender_pref_pivot.columns.tolist()
-        gender_pref_reset = gender_pref_pivot.reset_index()
-        
-        if len(gender_pref_reset) > 0:
-            gender_alerts = generate_gender_preference_alert(gender_pref_reset, categories)
-            for alert in gender_alerts:
-                st.markdown(f'<div class="alert alert-success">{alert}</div>', unsafe_allow_html=True)
-
-    # Second row with only 2 columns instead of 3
-    col4, col5 = st.columns(2)
-    with col4:
-        plot_gender_trend(filtered_df)
-
-    with col5:
-        plot_units_per_category(filtered_df)
-        units_cat = filtered_df.groupby('product_category').agg({'units_sold': 'sum'}).reset_index()
-
-        units_alerts = generate_units_category_alert(units_cat)
-        for alert in units_alerts:
-            alert_class = "alert-success" if "🏆" in alert else "alert-warning"
-            st.markdown(f'<div class="alert {alert_class}">{alert}</div>', unsafe_allow_html=True)
-
-    # Third row - Full width for Price vs Volume relationship
-    st.markdown('<div style="margin-top: 20px;"></div>', unsafe_allow_html=True)
-    plot_margin_per_category(filtered_df)
-
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Section 5: Analisis Geografis (Geographic Market Analysis)
-    st.markdown("""
-    <div class="section-container">
-        <div class="section-title">
-            🌍 Geographic Analysis
-        </div>
-    """, unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        plot_regional_sales(filtered_df)
-        regional_sales = filtered_df.groupby('region').agg({'total_sales': 'sum'}).reset_index()
-        geo_insights = generate_geographic_insights(regional_sales)
-        for insight in geo_insights:
-            alert_class = "alert-info" if "🎯" in insight else "alert-warning"
-            st.markdown(f'<div class="alert {alert_class}">{insight}</div>', unsafe_allow_html=True)
-    
-    with col2:
-        plot_sales_map(filtered_df)
-
-        city_sales = filtered_df.groupby('city').agg({'total_sales': 'sum'}).reset_index()
-        city_sales['total_sales_usd'] = city_sales['total_sales'] / 1e6
-
-        city_alerts = generate_city_alert(city_sales)
-        for alert in city_alerts:
-            alert_class = "alert-success" if "🌆" in alert else "alert-warning"
-            st.markdown(f'<div class="alert {alert_class}">{alert}</div>', unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Section 6: Analisis Saluran Penjualan (Sales Channel Performance)
-    st.markdown("""
-    <div class="section-container">
-        <div class="section-title">
-            🛒 Sales Channel Analysis
-        </div>
-    """, unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        plot_sales_method_distribution(filtered_df)
-
-        sales_method = filtered_df.groupby('sales_method').agg({'total_sales': 'sum'}).reset_index()
-        sales_method['total_sales_usd'] = sales_method['total_sales'] / 1e6
-
-        method_alerts = generate_sales_method_alert(sales_method)
-        for alert in method_alerts:
-            alert_class = "alert-success" if "🎯" in alert else "alert-warning"
-            st.markdown(f'<div class="alert {alert_class}">{alert}</div>', unsafe_allow_html=True)
-    
-    with col2:
-        plot_sales_method_trend(filtered_df)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Section 7: Wawasan Strategis & Rekomendasi (Strategic Insights & Recommendations)
-    st.markdown("""
-    <div class="section-container">
-        <div class="section-title">
-            💡 Wawasan Strategis & Rekomendasi
-        </div>
-    """, unsafe_allow_html=True)
-
-    # Interactive filter for insight focus
-    with st.expander("🔍 Sesuaikan Wawasan", expanded=True):
-        focus_area = st.selectbox(
-            "Pilih Area Fokus",
-            ["Semua", "Wilayah", "Pengecer", "Produk", "Gender", "Saluran Penjualan", "Peramalan"],
-            key="insight_focus"
-        )
-
-    # Generate data-driven insights
-    insights = []
-    if focus_area in ["Semua", "Wilayah"]:
-        top_region = regional_sales.nlargest(1, 'total_sales')
-        region_share = top_region['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
-        insights.append(
-            f"<strong>🌍 Fokus pada Wilayah Utama:</strong> {top_region['region'].iloc[0]} menyumbang ${top_region['total_sales'].iloc[0] / 1e6:.1f}M ({region_share:.1f}% dari total penjualan, Peta Penjualan). Tingkatkan anggaran pemasaran sebesar 25% untuk mencapai pertumbuhan penjualan 15% di wilayah ini dalam 6 bulan."
-        )
-    if focus_area in ["Semua", "Pengecer"]:
-        top_retailer = retailer_data.nlargest(1, 'total_sales')
-        retailer_share = top_retailer['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
-        low_performers = retailer_data.nsmallest(3, 'total_sales')['retailer_name'].tolist()
-        insights.append(
-            f"<strong>🏪 Optimalkan Kemitraan Pengecer:</strong> {top_retailer['retailer_name'].iloc[0]} menghasilkan ${top_retailer['total_sales'].iloc[0] / 1e6:.1f}M ({retailer_share:.1f}% dari penjualan, Top 10 Pengecer). Luncurkan promosi eksklusif untuk meningkatkan penjualan sebesar 12%. Untuk pengecer berkinerja rendah ({', '.join(low_performers)}), tawarkan pelatihan penjualan untuk meningkatkan konversi."
-        )
-    if focus_area in ["Semua", "Produk"]:
-        top_category = filtered_df.groupby('product_category').agg({'total_sales': 'sum'}).nlargest(1, 'total_sales')
-        category_share = top_category['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
-        insights.append(
-            f"<strong>👕 Prioritaskan Kategori Produk:</strong> {top_category.index[0]} menghasilkan ${top_category['total_sales'].iloc[0] / 1e6:.1f}M ({category_share:.1f}% dari penjualan, Performa Kategori Produk). Tambah stok 20% untuk Q4 dan luncurkan kampanye musiman untuk meningkatkan penjualan sebesar 10%."
-        )
-    if focus_area in ["Semua", "Gender"]:
-        top_gender = filtered_df.groupby('gender_type').agg({'total_sales': 'sum'}).reset_index()
-        top_gender_category = filtered_df[filtered_df['gender_type'] == top_gender['gender_type'].iloc[0]].groupby('product_category').agg({'total_sales': 'sum'}).nlargest(2, 'total_sales').index.tolist()
-        gender_share = top_gender['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
-        insights.append(
-            f"<strong>👥 Sesuaikan Kampanye Gender:</strong> Pelanggan {top_gender['gender_type'].iloc[0]} menyumbang ${top_gender['total_sales'].iloc[0] / 1e6:.1f}M ({gender_share:.1f}% dari penjualan, Tren Pembelian Gender), dengan preferensi untuk {', '.join(top_gender_category)}. Targetkan iklan digital untuk kategori ini guna meningkatkan konversi sebesar 8%."
-        )
-    if focus_area in ["Semua", "Saluran Penjualan"]:
-        top_method = filtered_df.groupby('sales_method').agg({'total_sales': 'sum'}).nlargest(1, 'total_sales')
-        method_share = top_method['total_sales'].iloc[0] / filtered_df['total_sales'].sum() * 100
-        insights.append(
-            f"<strong>🛒 Perkuat Saluran Penjualan:</strong> {top_method.index[0]} menghasilkan ${top_method['total_sales'].iloc[0] / 1e6:.1f}M ({method_share:.1f}% dari penjualan, Distribusi Metode Penjualan). Investasikan $750K untuk meningkatkan UX e-commerce, targetkan pertumbuhan 15% dalam 12 bulan."
-        )
-    if focus_area in ["Semua", "Peramalan"]:
-        historical_avg = monthly_data['total_sales'].mean() / 1e6
-        forecast_diff = (prediction_result['prediction'] / 1e6 - historical_avg) / historical_avg * 100
-        insights.append(
-            f"<strong>📈 Rencanakan Berdasarkan Peramalan:</strong> Prediksi penjualan bulan depan ${prediction_result['prediction'] / 1e6:.1f}M (MAE: ${prediction_result['mae'] / 1e6:.1f}M), {abs(forecast_diff):.1f}% {'lebih tinggi' if forecast_diff > 0 else 'lebih rendah'} dari rata-rata historis (Tren Penjualan Bulanan). Siapkan stok tambahan dan optimalkan logistik untuk efisiensi biaya 5%."
-        )
-
-    # Display insights
-    st.markdown("""
-    <div class="insight-box">
-        <div class="insight-title">🎯 Wawasan Bisnis Utama</div>
-        <div class="insight-text">
-    """, unsafe_allow_html=True)
-    for insight in insights:
-        st.markdown(f"{insight}<br><br>", unsafe_allow_html=True)
-    st.markdown("""
-        </div>
-    </div>
-    </div>
-    """, unsafe_allow_html=True)
+    plan_slot.write(
+        f"Aggregation plan: {plan['groupbys_requested']} groupbys merged into {plan['key_sets']} key sets, "
+        f"{plan['data_passes']} data passes ({plan['derived']} derived from finer results)"
+    )
+    render_timings(timings_slot)
+    render_breakdown(breakdown_slot, current_trace())
+    if warmup is not None:
+        # After everything above has rendered, so the first page never waits on it
+        warmup.start()
+    if memory_accounting:
+        render_memory(memory_slot, session_memory, allocations.take())
     
     # Footer
     st.markdown("""
@@ -963,4 +1241,5 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with trace('rerun'):
+        main()
\ No newline at end of file
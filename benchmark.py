@@ -0,0 +1,206 @@
+"""Headless benchmarks of the dashboard data path at several data scales.
+
+    python benchmark.py run --rows 10000 1000000 10000000 --output benchmarks.json
+    python benchmark.py compare baseline.json benchmarks.json --tolerance 0.25
+
+`run` times filtering, KPIs, every chart compute stage, the aggregation plan,
+every alert generator and the sales forecast on synthetic fact frames with the
+load_data schema, plus the cold-start import time of app.py (from `python -X importtime`
+in a fresh interpreter, recorded with rows 0), and writes the timings as JSON. `compare` flags stages whose
+median got slower than the baseline by more than the tolerance (exit code 1).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from aggregation import AGGREGATE_NEEDS
+from alerts import build_alert_table, dimension_frame
+from charts import CHART_REGISTRY, compute_gender_preferences, compute_sales_profit_trend
+from planner import QueryPlan
+from predictions import (
+    generate_sales_prediction, generate_performance_alert, generate_retailer_alert, generate_prediction_alert,
+    generate_category_alert, generate_units_category_alert, generate_margin_category_alert, generate_city_alert,
+    generate_sales_method_alert, generate_gender_preference_alert, generate_geographic_insights
+)
+from processing import calculate_kpis, filter_data, share_dataset
+from synthetic import synthetic_sales
+
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+
+# Stages faster than this (ms) are too noisy to flag as regressions
+NOISE_FLOOR_MS = 1.0
+
+# Cumulative import times recorded for the cold start; modules app.py loads lazily only show up if that regresses
+IMPORT_MODULES = ['app', 'streamlit', 'pandas', 'numpy', 'plotly', 'plotly.express', 'sklearn', 'scipy', 'sqlalchemy']
+
+def stages(df):
+    """(name, callable) pairs over one shared dataset; inputs of later stages are prepared up front"""
+    full_range = (df['invoice_date'].min(), df['invoice_date'].max())
+    filtered = filter_data(df, *full_range)
+    kpis = calculate_kpis(filtered, df)
+    alert_table = build_alert_table(filtered)
+    monthly = compute_sales_profit_trend(filtered)
+    prediction = generate_sales_prediction(monthly)
+    gender_pref = compute_gender_preferences(filtered)
+    categories = [column for column in gender_pref.columns if column != 'gender_type']
+    needs = [need for name in AGGREGATE_NEEDS for need in AGGREGATE_NEEDS[name]]
+
+    yield 'filter_data.full', lambda: filter_data(df, *full_range)
+    yield 'filter_data.q1_2021', lambda: filter_data(df, pd.Timestamp('2021-01-01'), pd.Timestamp('2021-03-31'))
+    yield 'calculate_kpis', lambda: calculate_kpis(filtered, df)
+    for name, compute in CHART_REGISTRY.items():
+        yield f'compute.{name}', lambda compute=compute: compute(filtered)
+    yield 'build_alert_table', lambda: build_alert_table(filtered)
+    yield 'query_plan.execute', lambda: QueryPlan(needs).execute(filtered)
+
+    yield 'alert.performance', lambda: generate_performance_alert(kpis['total_sales'], kpis['historical_avg_sales'], "Sales")
+    dimension_alerts = {
+        'retailer': (generate_retailer_alert, 'retailer_name'),
+        'category': (generate_category_alert, 'product_category'),
+        'units_category': (generate_units_category_alert, 'product_category'),
+        'margin_category': (generate_margin_category_alert, 'product_category'),
+        'city': (generate_city_alert, 'city'),
+        'sales_method': (generate_sales_method_alert, 'sales_method'),
+        'geographic_insights': (generate_geographic_insights, 'region'),
+    }
+    for name, (generate, dimension) in dimension_alerts.items():
+        data = dimension_frame(alert_table, dimension)
+        yield f'alert.{name}', lambda generate=generate, data=data: generate(data)
+    yield 'alert.gender_preference', lambda: generate_gender_preference_alert(gender_pref, categories)
+    yield 'alert.prediction', lambda: generate_prediction_alert(prediction)
+
+    for algorithm in ['random_forest', 'linear']:
+        yield f'prediction.{algorithm}', lambda algorithm=algorithm: generate_sales_prediction(monthly, algorithm)
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def run_scale(rows, repeat, seed):
+    results = []
+    start = time.perf_counter()
+    raw = synthetic_sales(rows, seed)
+    generate_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    df = share_dataset(raw)
+    results.append(result_row(rows, 'share_dataset', [(time.perf_counter() - start) * 1000]))
+    del raw
+    for name, func in stages(df):
+        timings = time_call(func, repeat)
+        results.append(result_row(rows, name, timings))
+    print(f"{rows:>11,} rows: generated in {generate_ms:,.0f} ms, {len(results)} stages timed", file=sys.stderr)
+    return results
+
+def import_times(module='app'):
+    """Cumulative import time (ms) per module for `import module` in a fresh interpreter"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stderr
+    times = {}
+    for line in stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package", nested imports are indented
+        if line.startswith('import time:') and not line.rstrip().endswith('imported package'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+def run_imports(repeat):
+    runs = [import_times() for _ in range(repeat)]
+    results = [result_row(0, f'import.{module}', [run[module] for run in runs])
+               for module in IMPORT_MODULES if all(module in run for run in runs)]
+    print(f"cold start: import app in {results[0]['median_ms']:,.0f} ms", file=sys.stderr)
+    return results
+
+def result_row(rows, stage, timings):
+    return {
+        'rows': rows,
+        'stage': stage,
+        'repeat': len(timings),
+        'min_ms': min(timings),
+        'median_ms': statistics.median(timings),
+        'max_ms': max(timings),
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def compare(baseline, current, tolerance, noise_floor=NOISE_FLOOR_MS):
+    """Rows of (rows, stage, baseline ms, current ms, ratio, status) for stages present in both runs"""
+    before = {(row['rows'], row['stage']): row['median_ms'] for row in baseline['results']}
+    report = []
+    for row in current['results']:
+        key = (row['rows'], row['stage'])
+        if key not in before:
+            continue
+        ratio = row['median_ms'] / before[key] if before[key] else float('inf')
+        if ratio > 1 + tolerance and row['median_ms'] - before[key] > noise_floor:
+            status = 'REGRESSION'
+        elif ratio < 1 / (1 + tolerance) and before[key] - row['median_ms'] > noise_floor:
+            status = 'faster'
+        else:
+            status = 'ok'
+        report.append((row['rows'], row['stage'], before[key], row['median_ms'], ratio, status))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='time the data path and write JSON results')
+    run_parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', default='benchmarks.json')
+    compare_parser = commands.add_parser('compare', help='flag regressions against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run_imports(args.repeat)
+        for rows in args.rows:
+            results.extend(run_scale(rows, args.repeat, args.seed))
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"Wrote {len(results)} timings to {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    report = compare(baseline, current, args.tolerance)
+    print(f"{'rows':>11}  {'stage':<40} {'baseline':>10} {'current':>10} {'ratio':>6}")
+    for rows, stage, before, after, ratio, status in report:
+        print(f"{rows:>11,}  {stage:<40} {before:>8.1f}ms {after:>8.1f}ms {ratio:>6.2f}  {status}")
+    regressions = sum(1 for row in report if row[-1] == 'REGRESSION')
+    print(f"{regressions} regression(s) out of {len(report)} stages (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
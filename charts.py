@@ -0,0 +1,193 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from anomalies import detect_anomalies
+from geo import location_sales, rollup_locations
+from planner import group_totals
+
+# Above this many points the price-vs-volume scatter is binned on the server (SCATTER_BINS² cells per category)
+SCATTER_GL_MAX_POINTS = 20000
+SCATTER_BINS = 60
+
+# Markers drawn on the sales map; smaller locations are dropped (largest sales kept)
+SALES_MAP_MAX_MARKERS = 500
+
+# Measures of the grouped aggregates, shared with CHART_NEEDS so the query planner can merge them
+SALES = {'total_sales': 'sum'}
+SALES_PROFIT = {'total_sales': 'sum', 'operating_profit': 'sum'}
+SALES_MARGIN = {'total_sales': 'sum', 'operating_margin': 'mean'}
+UNITS = {'units_sold': 'sum'}
+
+def density_bins(x, y, groups, n_groups, bins=SCATTER_BINS):
+    """2D histogram of x × y per group on shared edges; yields the non-empty cell centers and counts of each group"""
+    def bin_index(values):
+        low, high = values.min(), values.max()
+        width = (high - low) / bins or 1.0
+        index = np.minimum(((values - low) / width).astype(np.int64), bins - 1)
+        return index, low, width
+
+    x_index, x_low, x_width = bin_index(x)
+    y_index, y_low, y_width = bin_index(y)
+    counts = np.bincount((groups * bins + x_index) * bins + y_index, minlength=n_groups * bins * bins)
+    counts = counts.reshape(n_groups, bins, bins)
+    for group in range(n_groups):
+        cells_x, cells_y = np.nonzero(counts[group])
+        if len(cells_x):
+            yield group, x_low + (cells_x + 0.5) * x_width, y_low + (cells_y + 0.5) * y_width, counts[group, cells_x, cells_y]
+
+def compute_sales_profit_trend(df, totals=group_totals):
+    return totals(df, ['month'], SALES_PROFIT).reset_index()
+
+def compute_multi_period_trend(df, totals=group_totals):
+    yearly_data = totals(df, ['year'], SALES).reset_index()
+    yearly_data['total_sales_usd'] = yearly_data['total_sales'] / 1e6
+    # Only 2020 and 2021 are shown
+    return yearly_data[yearly_data['year'].isin([2020, 2021])]
+
+def compute_annual_sales_profit(df, totals=group_totals):
+    annual_data = totals(df, ['year'], SALES_PROFIT).reset_index()
+    annual_data['total_sales_usd'] = annual_data['total_sales'] / 1e6
+    annual_data['operating_profit_usd'] = annual_data['operating_profit'] / 1e6
+    return annual_data
+
+def series_frame(df, index, series, measures, totals=group_totals):
+    """One dense (index × series) frame of the first measure; combinations without rows are NaN"""
+    return totals(df, [index, series], measures)[next(iter(measures))].astype(float).unstack()
+
+def compute_units_trend(df, totals=group_totals):
+    return series_frame(df, 'month', 'product_category', UNITS, totals)
+
+def compute_top_retailers(df, totals=group_totals):
+    top_retailers = totals(df, ['retailer_name'], SALES).nlargest(10, 'total_sales').reset_index()
+    top_retailers['total_sales_usd'] = top_retailers['total_sales'] / 1e6
+    return top_retailers
+
+def compute_retailer_performance(df, totals=group_totals):
+    retailer_perf = totals(df, ['retailer_name'], SALES_MARGIN).reset_index()
+    retailer_perf['total_sales_usd'] = retailer_perf['total_sales'] / 1e6
+    return retailer_perf
+
+def compute_product_category_performance(df, totals=group_totals):
+    cat_perf = totals(df, ['product_category'], SALES_PROFIT).reset_index()
+    cat_perf['total_sales_usd'] = cat_perf['total_sales'] / 1e6
+    cat_perf['operating_profit_usd'] = cat_perf['operating_profit'] / 1e6
+    return cat_perf
+
+def compute_gender_distribution(df, totals=group_totals):
+    return series_frame(df, 'product_category', 'gender_type', SALES, totals) / 1e6
+
+def compute_gender_preferences(df, totals=group_totals):
+    # One row per gender, one column per category, in millions
+    return (series_frame(df, 'gender_type', 'product_category', SALES, totals) / 1e6).fillna(0).reset_index()
+
+def compute_gender_trend(df, totals=group_totals):
+    return series_frame(df, 'month', 'gender_type', SALES, totals) / 1e6
+
+def compute_units_per_category(df, totals=group_totals):
+    return totals(df, ['product_category'], UNITS).reset_index()
+
+def compute_margin_per_category(df, max_points=SCATTER_GL_MAX_POINTS, bins=SCATTER_BINS):
+    """Price/volume points, or per-category density cells above max_points (attrs['binned'] tells which)"""
+    # Categories in order of appearance, as integer codes so no per-category copy of the rows is made
+    codes, categories = pd.factorize(df['product_category'])
+    price = df['price_per_unit'].to_numpy(dtype=float)
+    units = df['units_sold'].to_numpy(dtype=float)
+    valid = (codes >= 0) & np.isfinite(price) & np.isfinite(units)
+
+    if valid.sum() <= max_points:
+        points = pd.DataFrame({
+            'product_category': np.asarray(categories)[codes[valid]],
+            'price_per_unit': price[valid],
+            'units_sold': units[valid],
+            'transactions': 1,
+        })
+        points.attrs['binned'] = False
+        return points
+
+    cells = pd.concat([
+        pd.DataFrame({'product_category': categories[group], 'price_per_unit': x, 'units_sold': y, 'transactions': count})
+        for group, x, y, count in density_bins(price[valid], units[valid], codes[valid], len(categories), bins)
+    ], ignore_index=True)
+    cells.attrs['binned'] = True
+    return cells
+
+def compute_regional_sales(df, totals=group_totals):
+    regional_sales = totals(df, ['region'], SALES).reset_index()
+    regional_sales['total_sales_usd'] = regional_sales['total_sales'] / 1e6
+    return regional_sales
+
+def compute_sales_map(df, level='city', max_markers=SALES_MAP_MAX_MARKERS):
+    """Sales per map marker at city, state or region level, largest first and capped at max_markers.
+
+    attrs carries the level, the sales of locations without coordinates and the number of dropped markers.
+    """
+    locations = location_sales(df)
+    mapped = locations['latitude'].notna() & locations['longitude'].notna()
+    markers = rollup_locations(locations[mapped], level).sort_values('total_sales', ascending=False, ignore_index=True)
+    hidden = max(len(markers) - max_markers, 0)
+    markers = markers.head(max_markers)
+    markers['total_sales_usd'] = markers['total_sales'] / 1e6
+    markers.attrs.update(level=level, unmapped_sales=float(locations.loc[~mapped, 'total_sales'].sum()),
+                         hidden_markers=hidden)
+    return markers
+
+def compute_sales_method_distribution(df, totals=group_totals):
+    sales_method = totals(df, ['sales_method'], SALES).reset_index()
+    sales_method['total_sales_usd'] = sales_method['total_sales'] / 1e6
+    return sales_method
+
+def compute_sales_method_trend(df, totals=group_totals):
+    return series_frame(df, 'month', 'sales_method', SALES, totals) / 1e6
+
+# Chart name -> compute stage (filtered fact rows in, small frame out); no Streamlit or Plotly involved
+CHART_REGISTRY = {
+    'sales_profit_trend': compute_sales_profit_trend,
+    'multi_period_trend': compute_multi_period_trend,
+    'annual_sales_profit': compute_annual_sales_profit,
+    'units_trend': compute_units_trend,
+    'top_retailers': compute_top_retailers,
+    'retailer_performance': compute_retailer_performance,
+    'product_category_performance': compute_product_category_performance,
+    'gender_distribution': compute_gender_distribution,
+    'gender_preferences': compute_gender_preferences,
+    'gender_trend': compute_gender_trend,
+    'units_per_category': compute_units_per_category,
+    'margin_per_category': compute_margin_per_category,
+    'regional_sales': compute_regional_sales,
+    'sales_map': compute_sales_map,
+    'sales_method_distribution': compute_sales_method_distribution,
+    'sales_method_trend': compute_sales_method_trend,
+    'anomalies': detect_anomalies,
+}
+
+# Grouped aggregates each chart reads, as (keys, measures); charts not listed here read the rows directly
+CHART_NEEDS = {
+    'sales_profit_trend': [(['month'], SALES_PROFIT)],
+    'multi_period_trend': [(['year'], SALES)],
+    'annual_sales_profit': [(['year'], SALES_PROFIT)],
+    'units_trend': [(['month', 'product_category'], UNITS)],
+    'top_retailers': [(['retailer_name'], SALES)],
+    'retailer_performance': [(['retailer_name'], SALES_MARGIN)],
+    'product_category_performance': [(['product_category'], SALES_PROFIT)],
+    'gender_distribution': [(['product_category', 'gender_type'], SALES)],
+    'gender_preferences': [(['gender_type', 'product_category'], SALES)],
+    'gender_trend': [(['month', 'gender_type'], SALES)],
+    'units_per_category': [(['product_category'], UNITS)],
+    'regional_sales': [(['region'], SALES)],
+    'sales_method_distribution': [(['sales_method'], SALES)],
+    'sales_method_trend': [(['month', 'sales_method'], SALES)],
+}
+
+def compute_chart(name, df):
+    return CHART_REGISTRY[name](df)
+
+def compute_all(df, names=None):
+    """Run compute stages headlessly; returns {name: (frame, elapsed_ms)}"""
+    results = {}
+    for name in names or CHART_REGISTRY:
+        start = time.perf_counter()
+        frame = compute_chart(name, df)
+        results[name] = (frame, (time.perf_counter() - start) * 1000)
+    return results
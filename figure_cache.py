@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class FigureCache:
+    """LRU cache of data-dependent Plotly figures, re-themed in place on every use.
+
+    Entries are keyed by (chart, filter, data version) only; the theme is a
+    layout overlay applied under the entry's lock right before the figure is
+    serialized, so a dark/light toggle never rebuilds or re-aggregates a chart.
+    Plotly validates every property set, so the overlay is skipped when the entry
+    already carries the requested theme.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> _Entry
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def themed(self, key, build, overlay, theme):
+        """Yield the figure for key (building it on a miss) with the theme overlay applied"""
+        entry = None
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+        if entry is None:
+            entry = _Entry(build())
+            if key is not None:
+                self._store(key, entry)
+
+        # Overlay and serialization must not interleave with another session's theme
+        with entry.lock:
+            if entry.theme != theme:
+                overlay(entry.figure, theme)
+                entry.theme = dict(theme)
+            yield entry.figure
+
+    def warm(self, key, build):
+        """Build and store the figure for key unless already cached (no theme until first use, no hit/miss counted)"""
+        with self._lock:
+            if key in self._entries:
+                return False
+        self._store(key, _Entry(build()))
+        return True
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries.setdefault(key, entry)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        """(key, figure) for every cached figure"""
+        with self._lock:
+            return [(key, entry.figure) for key, entry in self._entries.items()]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+class _Entry:
+    __slots__ = ('figure', 'lock', 'theme')
+
+    def __init__(self, figure):
+        self.figure = figure
+        self.lock = threading.Lock()
+        self.theme = None  # theme currently overlaid on the figure
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import bind
+from processing import frame_fingerprint
+from predictions import generate_sales_prediction
+
+class ForecastJobs:
+    """Runs sales forecasts on a background executor, one job per data + filter fingerprint"""
+
+    def __init__(self, max_workers=2, max_jobs=64):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='forecast')
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job key -> Future (finished ones double as a result cache)
+        self.max_jobs = max_jobs
+
+    def submit(self, monthly_data, filter_key, algorithm='random_forest'):
+        """Return the Future for this forecast, reusing any job already in flight or finished"""
+        key = (frame_fingerprint(monthly_data), filter_key, algorithm)
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is not None and not (future.done() and future.exception() is not None):
+                self._jobs.move_to_end(key)
+                return future
+
+            # Copy so the job never sees later mutations of the caller's frame
+            future = self._executor.submit(bind(generate_sales_prediction), monthly_data.copy(), algorithm)
+            self._jobs[key] = future
+            self._evict()
+            return future
+
+    def _evict(self):
+        # Drop the oldest finished jobs; in-flight ones are kept so waiters stay coalesced
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[key].done():
+                del self._jobs[key]
+
+    def in_flight(self):
+        with self._lock:
+            return sum(1 for future in self._jobs.values() if not future.done())
+
+    def items(self):
+        """(job key, result) for the finished jobs still held as cache entries"""
+        with self._lock:
+            jobs = list(self._jobs.items())
+        return [(key, future.result()) for key, future in jobs if future.done() and future.exception() is None]
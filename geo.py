@@ -0,0 +1,62 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Reference coordinates per (state, city); the ETL copies them into dim_location.latitude/longitude
+CITY_COORDINATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'city_coordinates.csv')
+
+LOCATION_KEYS = ['region', 'state', 'city']
+GEO_LEVELS = ['city', 'state', 'region']
+
+@lru_cache(maxsize=4)
+def load_city_coordinates(path=CITY_COORDINATES_PATH):
+    return pd.read_csv(path, usecols=['state', 'city', 'latitude', 'longitude'])
+
+def attach_coordinates(locations, coordinates=None):
+    """Add latitude/longitude by a vectorized (state, city) join; unknown locations get NaN, never (0, 0)"""
+    coordinates = load_city_coordinates() if coordinates is None else coordinates
+    return locations.merge(coordinates, on=['state', 'city'], how='left')
+
+def location_sales(df):
+    """Total sales per (region, state, city) with coordinates, from the fact columns or the reference file.
+
+    Locations are keyed by integer (state, city) codes, much cheaper than a groupby on three string columns.
+    """
+    has_coordinates = {'latitude', 'longitude'} <= set(df.columns)
+    city_codes, _ = pd.factorize(df['city'])
+    state_codes, states = pd.factorize(df['state'])
+    known = np.flatnonzero((city_codes >= 0) & (state_codes >= 0))
+    location_codes, _ = pd.factorize(city_codes[known] * len(states) + state_codes[known])
+    first_rows = known[pd.Series(location_codes).drop_duplicates().index]
+
+    columns = LOCATION_KEYS + (['latitude', 'longitude'] if has_coordinates else [])
+    locations = df.iloc[first_rows][columns].reset_index(drop=True)
+    locations['total_sales'] = np.bincount(location_codes, weights=df['total_sales'].to_numpy(dtype=float)[known])
+    return locations if has_coordinates else attach_coordinates(locations)
+
+def rollup_locations(locations, level):
+    """Aggregate city rows to state or region, placing each marker at the sales-weighted centroid"""
+    if level == 'city':
+        return locations.assign(location=locations['city'])
+    weights = locations['total_sales'].clip(lower=0)
+    weighted = locations.assign(
+        weight=weights,
+        latitude=locations['latitude'] * weights,
+        longitude=locations['longitude'] * weights,
+    ).groupby(level, sort=False).agg({
+        'total_sales': 'sum', 'weight': 'sum', 'latitude': 'sum', 'longitude': 'sum'
+    })
+    plain = locations.groupby(level, sort=False)[['latitude', 'longitude']].mean()
+    has_weight = (weighted['weight'] > 0).to_numpy()[:, None]
+    centroids = np.where(has_weight, weighted[['latitude', 'longitude']].to_numpy() / weighted[['weight']].to_numpy(),
+                         plain.loc[weighted.index].to_numpy())
+    rolled = pd.DataFrame({
+        level: weighted.index,
+        'location': weighted.index,
+        'total_sales': weighted['total_sales'].to_numpy(),
+        'latitude': centroids[:, 0],
+        'longitude': centroids[:, 1],
+    })
+    return rolled
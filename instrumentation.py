@@ -0,0 +1,131 @@
+"""Timing spans for the dashboard data path.
+
+A trace collects the spans of one rerun (or one fragment rerun). span() is a
+no-op outside a trace, so library code can be instrumented unconditionally.
+Work handed to a thread pool keeps its trace and parent span when the callable
+is wrapped with bind().
+
+With ADIDAS_TRACE_FILE set, every span is appended to that file as a JSON line
+in the Chrome trace-event format; `jq -s . spans.jsonl > trace.json` opens in
+Perfetto or speedscope as a flame graph.
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILE = os.environ.get('ADIDAS_TRACE_FILE')
+
+_trace = contextvars.ContextVar('trace', default=None)
+_parent = contextvars.ContextVar('parent_span', default=None)
+_trace_ids = itertools.count(1)
+_export_lock = threading.Lock()
+
+class Span:
+    __slots__ = ('name', 'parent', 'thread', 'start', 'duration_ms', 'attrs')
+
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.attrs = attrs
+
+class Trace:
+    """Spans of one rerun; spans may be added from worker threads, also after the trace has finished"""
+
+    def __init__(self, name, export_path=TRACE_FILE):
+        self.id = f'{os.getpid()}-{next(_trace_ids)}'
+        self.name = name
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.duration_ms = None
+        self.spans = []
+        self.export_path = export_path
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+        if self.export_path:
+            export_span(self, span)
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def breakdown(self):
+        """One row per span name: calls, total/max ms, share of the trace's wall time and threads used"""
+        with self._lock:
+            spans = [span for span in self.spans if span.duration_ms is not None]
+        total = self.duration_ms or (time.perf_counter() - self.start) * 1000
+        rows = {}
+        for span in spans:
+            row = rows.setdefault(span.name, {'span': span.name, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                              'first_ms': (span.start - self.start) * 1000, 'threads': set()})
+            row['calls'] += 1
+            row['total_ms'] += span.duration_ms
+            row['max_ms'] = max(row['max_ms'], span.duration_ms)
+            row['first_ms'] = min(row['first_ms'], (span.start - self.start) * 1000)
+            row['threads'].add(span.thread)
+        for row in rows.values():
+            row['share'] = row['total_ms'] / total if total else 0.0
+            row['threads'] = ', '.join(sorted(row['threads']))
+        return sorted(rows.values(), key=lambda row: row['first_ms'])
+
+@contextmanager
+def trace(name, export_path=TRACE_FILE):
+    """Collect the spans opened in this context (and in bound worker calls) into a new Trace"""
+    current = Trace(name, export_path)
+    trace_token = _trace.set(current)
+    parent_token = _parent.set(None)
+    try:
+        with span(name):
+            yield current
+    finally:
+        current.finish()
+        _parent.reset(parent_token)
+        _trace.reset(trace_token)
+
+def current_trace():
+    return _trace.get()
+
+@contextmanager
+def span(name, **attrs):
+    """Time the enclosed block as a span of the current trace; yields the Span (None outside a trace)"""
+    current = _trace.get()
+    if current is None:
+        yield None
+        return
+    opened = Span(name, _parent.get(), attrs)
+    token = _parent.set(name)
+    try:
+        yield opened
+    finally:
+        _parent.reset(token)
+        opened.duration_ms = (time.perf_counter() - opened.start) * 1000
+        current.add(opened)
+
+def bind(func):
+    """Run func later (e.g. on a pool thread) inside the caller's trace and span"""
+    if _trace.get() is None:
+        return func
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+def export_span(trace, span):
+    event = {
+        'name': span.name,
+        'ph': 'X',
+        'ts': round((trace.wall_start + span.start - trace.start) * 1e6),
+        'dur': round(span.duration_ms * 1000),
+        'pid': os.getpid(),
+        'tid': span.thread,
+        'args': {'trace': trace.id, 'trace_name': trace.name, 'parent': span.parent, **span.attrs},
+    }
+    line = json.dumps(event, default=str)
+    with _export_lock, open(trace.export_path, 'a') as f:
+        f.write(line + '\n')
@@ -0,0 +1,213 @@
+"""Concurrent-session load test of app.py, driven headlessly through Streamlit's AppTest API.
+
+    python loadtest.py --sessions 1 2 4 8 --actions 20 --mix analyst --output loadtest.json
+
+Each simulated session is an AppTest on its own thread, so sessions share the
+process-wide caches exactly like browser sessions on one server. After a first
+full run, a session performs random actions (switch period, toggle the theme,
+change the insight focus, open or close a section) drawn from the chosen mix.
+Per number of sessions the harness reports p50/p95/p99 rerun latency,
+throughput and the peak RSS sampled while the sessions ran.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+DEFAULT_SESSIONS = [1, 2, 4, 8]
+
+# Relative weights of the actions a session performs between reruns
+MIXES = {
+    'analyst': {'period': 0.35, 'insight': 0.3, 'section': 0.25, 'theme': 0.1},
+    'browse': {'period': 0.2, 'insight': 0.1, 'section': 0.6, 'theme': 0.1},
+    'monitor': {'period': 0.8, 'insight': 0.1, 'section': 0.05, 'theme': 0.05},
+}
+
+RSS_SAMPLE_SECONDS = 0.05
+
+@contextmanager
+def shared_runtime():
+    """One mock Runtime and one compiled-script cache for every session, as on a server.
+
+    AppTest installs a mock Runtime and a config patch around each run and removes
+    them afterwards, so concurrent sessions would tear down each other's runtime.
+    It also recompiles app.py on every run, and concurrent ast parsing can fail on
+    CPython 3.11 ("AST constructor recursion depth mismatch").
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1.util import patch_config_options
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    script_cache = ScriptCache()
+    # With a runtime installed, AppTest calls from the session threads log "missing ScriptRunContext"
+    logging.getLogger('streamlit.runtime.scriptrunner.script_run_context').addFilter(
+        lambda record: 'missing ScriptRunContext' not in record.getMessage())
+    with patch.object(Runtime, 'instance', classmethod(lambda cls: runtime)), \
+            patch.object(Runtime, 'exists', classmethod(lambda cls: True)), \
+            patch('streamlit.testing.v1.local_script_runner.ScriptCache', lambda: script_cache), \
+            patch_config_options({'global.appTest': True}):
+        yield
+
+class RssSampler:
+    """Peak RSS over a block, sampled from a background thread"""
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        from memory import process_rss_bytes
+        self._rss = process_rss_bytes
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+def prepare(at, action, rng):
+    """Set up the widget change for one action on an AppTest; returns the label recorded for the rerun"""
+    if action == 'period':
+        period = at.selectbox(key='period_filter')
+        return f'period:{period.select_index(int(rng.integers(len(period.options)))).value}'
+    if action == 'theme':
+        at.button(key='theme_toggle').click()
+        return 'theme'
+    if action == 'insight':
+        if not at.toggle(key='section_insights').value:
+            at.toggle(key='section_insights').set_value(True)
+            return 'section:insights'
+        focus = at.selectbox(key='insight_focus')
+        return f'insight:{focus.select_index(int(rng.integers(len(focus.options)))).value}'
+    sections = [toggle for toggle in at.toggle if toggle.key and toggle.key.startswith('section_')]
+    section = sections[int(rng.integers(len(sections)))]
+    section.set_value(not section.value)
+    return f"section:{section.key[len('section_'):]}"
+
+def run_session(index, actions, weights, seed, think_ms, timeout, samples):
+    """One simulated analyst: a first full run, then `actions` reruns; appends (label, ms, ok) to samples"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = np.random.default_rng([seed, index])
+    names, p = list(weights), np.array(list(weights.values()), dtype=float)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    label = 'first_run'
+    for step in range(actions + 1):
+        start = time.perf_counter()
+        try:
+            at.run()
+            ok = not at.exception
+        except Exception:  # a timed-out or crashed run still counts, as a failed rerun
+            ok = False
+        samples.append((label, (time.perf_counter() - start) * 1000, ok))
+        if not ok:
+            # The element tree of a failed run may lack the widgets; start the session over
+            at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+            label = 'first_run'
+            continue
+        if step < actions:
+            if think_ms:
+                time.sleep(rng.exponential(think_ms) / 1000)
+            label = prepare(at, names[rng.choice(len(names), p=p / p.sum())], rng)
+
+def run_level(sessions, actions, weights, seed, think_ms, timeout):
+    samples = []
+    threads = [threading.Thread(target=run_session, name=f'session-{index}',
+                                args=(index, actions, weights, seed, think_ms, timeout, samples))
+               for index in range(sessions)]
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array([ms for _, ms, ok in samples if ok])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (float('nan'),) * 3
+    actions_run = {}
+    for label, _, _ in samples:
+        kind = label.split(':')[0]
+        actions_run[kind] = actions_run.get(kind, 0) + 1
+    return {
+        'sessions': sessions,
+        'reruns': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'throughput_rps': len(samples) / elapsed,
+        'elapsed_s': elapsed,
+        'peak_rss_mb': rss.peak / 2**20,
+        'actions': actions_run,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS,
+                        help='concurrent session counts to ramp through')
+    parser.add_argument('--actions', type=int, default=20, help='reruns per session after its first run')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='analyst')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='mean pause between actions (0 = back to back)')
+    parser.add_argument('--rows', type=int, help='synthetic rows when the database is unreachable (ADIDAS_SAMPLE_ROWS)')
+    parser.add_argument('--database-url', help='SQLAlchemy URL of the warehouse (ADIDAS_DATABASE_URL)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='seconds before a rerun counts as failed')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the results as JSON')
+    args = parser.parse_args(argv)
+
+    # Read by database.py when the app is first imported below
+    if args.rows:
+        os.environ['ADIDAS_SAMPLE_ROWS'] = str(args.rows)
+    if args.database_url:
+        os.environ['ADIDAS_DATABASE_URL'] = args.database_url
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+
+    results = []
+    with shared_runtime():
+        # Imports, data load and module-level caches happen once, as on a server that is already up;
+        # concurrent first imports of lazily loaded modules (e.g. orjson via plotly) can race
+        warmup = run_level(1, 0, MIXES[args.mix], args.seed, 0, args.timeout)
+        print(f"warm-up run: {warmup['p50_ms']:,.0f} ms, {warmup['peak_rss_mb']:,.0f} MB RSS", file=sys.stderr)
+        print(f"{'sessions':>8} {'reruns':>7} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+              f"{'reruns/s':>9} {'peak RSS MB':>12}")
+        for sessions in args.sessions:
+            level = run_level(sessions, args.actions, MIXES[args.mix], args.seed, args.think_ms, args.timeout)
+            results.append(level)
+            print(f"{level['sessions']:>8} {level['reruns']:>7} {level['errors']:>6} {level['p50_ms']:>9,.0f} "
+                  f"{level['p95_ms']:>9,.0f} {level['p99_ms']:>9,.0f} {level['throughput_rps']:>9.2f} "
+                  f"{level['peak_rss_mb']:>12,.0f}", flush=True)
+
+    if args.output:
+        from benchmark import environment
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'mix': args.mix, 'actions': args.actions,
+                       'think_ms': args.think_ms, 'warmup': warmup, 'results': results}, f, indent=2)
+        print(f"Wrote {len(results)} load levels to {args.output}")
+    return 1 if any(level['errors'] for level in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""Memory accounting for the shared dataset, per-session views and process-wide caches.
+
+Sizes are deep: frames use memory_usage(deep=True), figures and aggregates are
+walked down to their arrays, other objects are measured by their pickled size.
+With ADIDAS_TRACEMALLOC set to a frame depth, tracemalloc runs from import and
+each rerun reports its top allocation sites (process-wide, so concurrent
+sessions show up in each other's snapshots). With ADIDAS_METRICS_PORT set,
+GET /metrics on that port serves the accounts in the Prometheus text format.
+"""
+import os
+import pickle
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+TRACEMALLOC_FRAMES = int(os.environ.get('ADIDAS_TRACEMALLOC', 0))
+METRICS_PORT = int(os.environ.get('ADIDAS_METRICS_PORT', 0))
+
+if TRACEMALLOC_FRAMES and not tracemalloc.is_tracing():
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
+def frame_bytes(df):
+    """Deep size of a DataFrame, index included"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+def owned_bytes(view, source):
+    """Bytes of view's columns not backed by the same column of source (0 for a slice of the shared dataset)"""
+    owned = 0
+    for name, column in view.items():
+        if name not in source.columns or not np.may_share_memory(column.to_numpy(), source[name].to_numpy()):
+            owned += int(column.nbytes)
+    return owned
+
+def object_bytes(obj, seen=None):
+    """Approximate deep size of a cached value: frames, arrays, figures and containers are walked"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes if obj.dtype != object else obj.nbytes + sum(object_bytes(item, seen) for item in obj.flat)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(object_bytes(key, seen) + object_bytes(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(object_bytes(item, seen) for item in obj)
+    if hasattr(obj, 'to_plotly_json'):
+        return object_bytes(obj.to_plotly_json(), seen)
+    if hasattr(obj, '__dataclass_fields__'):
+        return sys.getsizeof(obj) + sum(object_bytes(getattr(obj, name), seen) for name in obj.__dataclass_fields__)
+    try:
+        return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(obj)
+
+def process_rss_bytes():
+    """Current resident set size (peak RSS where /proc is not available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class AllocationSnapshot:
+    """Top allocation sites between start and take(), by source line; inactive unless tracemalloc is tracing"""
+
+    def __init__(self):
+        self.start = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+
+    def take(self, limit=10):
+        if self.start is None or not tracemalloc.is_tracing():
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().compare_to(self.start, 'lineno')
+        top = [{'site': str(stat.traceback[0]), 'size_diff': stat.size_diff, 'size': stat.size,
+                'count_diff': stat.count_diff} for stat in stats[:limit]]
+        return {'traced_bytes': current, 'peak_bytes': peak, 'top': top}
+
+class MemoryAccounts:
+    """Process-wide registry of what holds memory: the shared dataset, caches and per-session reports.
+
+    Caches are registered as callables returning their current (key, value) entries,
+    so accounting never keeps an evicted entry alive. Entry sizes are memoized by
+    cache key (a key's value is not rebuilt in place), so a scrape only walks the
+    entries added since the last one. The dataset's deep size is computed once.
+    """
+
+    def __init__(self, max_sessions=256):
+        self._lock = threading.Lock()
+        self._caches = {}  # name -> callable returning the cached (key, value) entries
+        self._entry_bytes = {}  # name -> {entry key: deep bytes} as of the last report
+        self._dataset = None  # [frame, deep bytes once computed]
+        self._views = OrderedDict()  # view key -> (deep bytes, owned bytes)
+        self._sessions = OrderedDict()  # session id -> last report
+        self.max_sessions = max_sessions
+
+    def register_cache(self, name, entries):
+        with self._lock:
+            self._caches[name] = entries
+
+    def register_dataset(self, df):
+        with self._lock:
+            if self._dataset is None or self._dataset[0] is not df:
+                self._dataset = [df, None]
+
+    def dataset(self):
+        """Deep bytes of the registered dataset, computed on first use"""
+        with self._lock:
+            if self._dataset is None:
+                return None
+            if self._dataset[1] is None:
+                self._dataset[1] = frame_bytes(self._dataset[0])
+            return self._dataset[1]
+
+    def view(self, key, view, source):
+        """Deep and owned bytes of a filtered view, memoized per view key (filters of the same data are immutable)"""
+        with self._lock:
+            if key in self._views:
+                self._views.move_to_end(key)
+                return self._views[key]
+        sizes = (frame_bytes(view), owned_bytes(view, source))
+        with self._lock:
+            self._views[key] = sizes
+            while len(self._views) > 64:
+                self._views.popitem(last=False)
+        return sizes
+
+    def caches(self):
+        """name -> {'entries', 'bytes'} for every registered cache"""
+        with self._lock:
+            caches = dict(self._caches)
+        report = {}
+        for name, entries in caches.items():
+            with self._lock:
+                known = self._entry_bytes.get(name, {})
+            sizes = {key: known[key] if key in known else object_bytes(value) for key, value in entries()}
+            with self._lock:
+                self._entry_bytes[name] = sizes  # evicted keys drop out here
+            report[name] = {'entries': len(sizes), 'bytes': sum(sizes.values())}
+        return report
+
+    def record_session(self, session_id, report):
+        with self._lock:
+            self._sessions[session_id] = dict(report, updated=time.time())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def sessions(self):
+        with self._lock:
+            return dict(self._sessions)
+
+    def report(self):
+        report = {
+            'process_rss_bytes': process_rss_bytes(),
+            'dataset_bytes': self.dataset(),
+            'caches': self.caches(),
+            'sessions': self.sessions(),
+        }
+        if tracemalloc.is_tracing():
+            report['tracemalloc_traced_bytes'], report['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()
+        return report
+
+def prometheus_text(report):
+    """Render a MemoryAccounts report in the Prometheus text exposition format"""
+    lines = [
+        '# TYPE adidas_process_rss_bytes gauge',
+        f"adidas_process_rss_bytes {report['process_rss_bytes']}",
+    ]
+    if report['dataset_bytes'] is not None:
+        lines += ['# TYPE adidas_dataset_bytes gauge', f"adidas_dataset_bytes {report['dataset_bytes']}"]
+    lines += ['# TYPE adidas_cache_bytes gauge', '# TYPE adidas_cache_entries gauge']
+    for name, cache in report['caches'].items():
+        lines.append(f'adidas_cache_bytes{{cache="{name}"}} {cache["bytes"]}')
+        lines.append(f'adidas_cache_entries{{cache="{name}"}} {cache["entries"]}')
+    lines += ['# TYPE adidas_session_bytes gauge']
+    for session_id, session in report['sessions'].items():
+        for part in ('view_bytes', 'view_owned_bytes', 'state_bytes'):
+            if session.get(part) is not None:
+                lines.append(f'adidas_session_bytes{{session="{session_id}",part="{part}"}} {session[part]}')
+    for key in ('tracemalloc_traced_bytes', 'tracemalloc_peak_bytes'):
+        if key in report:
+            lines += [f'# TYPE adidas_{key} gauge', f'adidas_{key} {report[key]}']
+    return '\n'.join(lines) + '\n'
+
+def start_metrics_server(accounts, port=METRICS_PORT, host='127.0.0.1'):
+    """Serve GET /metrics from a daemon thread; returns the server (None when no port is configured)"""
+    if not port:
+        return None
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text(accounts.report()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
@@ -0,0 +1,151 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+def factorize_sorted(column):
+    """pd.factorize(sort=True), skipping the hash table for categorical and small-range integer columns"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        used = np.bincount(codes[codes >= 0], minlength=len(column.cat.categories)) > 0
+        categories = np.asarray(column.cat.categories)
+        if column.cat.ordered or not used.all() or not np.all(categories[:-1] <= categories[1:]):
+            return pd.factorize(column, sort=True)
+        return codes, categories
+    values = column.to_numpy()
+    if values.dtype.kind in 'iu' and len(values):
+        low, high = values.min(), values.max()
+        if high - low <= 4 * len(values):
+            present = np.bincount(values - low, minlength=high - low + 1) > 0
+            remap = np.cumsum(present) - 1
+            return remap[values - low], np.flatnonzero(present) + low
+    return pd.factorize(column, sort=True)
+
+def partial_columns(measures):
+    """Additive partials behind a measures dict: a sum needs col:sum, a mean also col:count"""
+    columns = []
+    for column, how in measures.items():
+        columns.append(f'{column}:sum')
+        if how == 'mean':
+            columns.append(f'{column}:count')
+    return columns
+
+def partial_totals(df, keys, columns, dropna=True, factorized=None):
+    """One pass over the rows: additive partials per present key combination, sorted by keys.
+
+    Missing measure values are skipped, as in groupby().agg(). Rows with a missing key are
+    dropped unless dropna=False, which keeps them under a NaN key so coarser totals derived
+    later still see those rows. factorized caches key codes across passes over the same rows.
+    """
+    factorized = {} if factorized is None else factorized
+    key_codes, key_values = [], []
+    for key in keys:
+        if key not in factorized:
+            factorized[key] = factorize_sorted(df[key])
+        codes, values = factorized[key]
+        if not dropna and (codes < 0).any():
+            codes = np.where(codes < 0, len(values), codes)
+            values = np.append(np.asarray(values, dtype=object), np.nan)
+        key_codes.append(codes)
+        key_values.append(values)
+    shape = tuple(len(values) for values in key_values)
+    known = np.logical_and.reduce([codes >= 0 for codes in key_codes])
+    cells = np.ravel_multi_index(tuple(codes[known] for codes in key_codes), shape)
+    size = int(np.prod(shape))
+    if size <= 4 * len(cells) + 1024:
+        occupied = np.bincount(cells, minlength=size) > 0
+        present = np.flatnonzero(occupied)
+        cells = (np.cumsum(occupied) - 1)[cells]
+    else:
+        present, cells = np.unique(cells, return_inverse=True)
+
+    levels = np.unravel_index(present, shape)
+    arrays = [np.asarray(values)[level] for values, level in zip(key_values, levels)]
+    index = pd.Index(arrays[0], name=keys[0]) if len(keys) == 1 else pd.MultiIndex.from_arrays(arrays, names=list(keys))
+    data = {}
+    for partial in columns:
+        column, kind = partial.split(':')
+        values = df[column].to_numpy(dtype=float)[known]
+        valid = ~np.isnan(values)
+        weights = np.where(valid, values, 0.0) if kind == 'sum' else valid.astype(float)
+        data[partial] = np.bincount(cells, weights=weights, minlength=len(present))
+    return pd.DataFrame(data, index=index)
+
+def finish_totals(partials, measures, df=None):
+    """Turn partials into measure columns (sums keep an integer source dtype, means are sum / count)"""
+    result = {}
+    for column, how in measures.items():
+        total = partials[f'{column}:sum']
+        if how == 'mean':
+            result[column] = total / partials[f'{column}:count'].where(partials[f'{column}:count'] > 0)
+        elif df is not None and df[column].dtype.kind in 'iu':
+            result[column] = total.round().astype(df[column].dtype)
+        else:
+            result[column] = total
+    return pd.DataFrame(result, index=partials.index)
+
+def group_totals(df, keys, measures):
+    """Sum/mean of each measure per key combination in a single pass, like df.groupby(keys).agg(measures)"""
+    keys = tuple(keys)
+    return finish_totals(partial_totals(df, keys, partial_columns(measures)), measures, df)
+
+class QueryPlan:
+    """Merges declared aggregate needs into the fewest passes over the rows.
+
+    Needs are (keys, measures) pairs. Needs on the same key set share one
+    multi-measure pass; a key set contained in a larger requested one is derived
+    from that result (sums and counts are additive) instead of reading the rows again.
+    """
+
+    def __init__(self, needs):
+        self.requests = 0
+        partials = {}  # key set -> partial columns
+        for keys, measures in needs:
+            self.requests += 1
+            columns = partials.setdefault(frozenset(keys), [])
+            columns.extend(column for column in partial_columns(measures) if column not in columns)
+
+        # Maximal key sets are read from the rows; the rest come from the narrowest one containing them
+        self.passes = {}  # base key set -> partial columns
+        self.parents = {}  # derived key set -> base key set
+        for key_set in sorted(partials, key=len, reverse=True):
+            parents = [base for base in self.passes if key_set < base]
+            if parents:
+                parent = min(parents, key=len)
+                self.parents[key_set] = parent
+                self.passes[parent].extend(column for column in partials[key_set] if column not in self.passes[parent])
+            else:
+                self.passes[key_set] = list(partials[key_set])
+
+    def execute(self, df):
+        return PlannedTotals(self, df)
+
+    def report(self):
+        return {'groupbys_requested': self.requests, 'key_sets': len(self.passes) + len(self.parents),
+                'data_passes': len(self.passes), 'derived': len(self.parents)}
+
+class PlannedTotals:
+    """Results of a QueryPlan; totals() has the signature of group_totals and reads the rows only for unplanned needs"""
+
+    def __init__(self, plan, df):
+        self.df = df
+        self.parents = plan.parents
+        self.passes = 0
+        self._lock = threading.Lock()
+        self._results = {}
+        factorized = {}
+        for key_set, columns in plan.passes.items():
+            self._results[key_set] = partial_totals(df, sorted(key_set), columns, dropna=False, factorized=factorized)
+            self.passes += 1
+
+    def totals(self, df, keys, measures):
+        keys = tuple(keys)
+        columns = partial_columns(measures)
+        key_set = frozenset(keys)
+        source = self._results.get(self.parents.get(key_set, key_set))
+        if df is not self.df or source is None or not set(columns) <= set(source.columns):
+            with self._lock:
+                self.passes += 1
+            return group_totals(df, keys, measures)
+        partials = source[columns].groupby(level=list(keys), sort=True).sum()
+        return finish_totals(partials, measures, df)
@@ -1,11 +1,69 @@
+"""Sales forecasts and the alert messages built on them.
+
+generate_sales_prediction forecasts the filtered period an analyst is looking at.
+It fits a fresh forest on that period's months on every call; results are reused
+per period through ForecastJobs, but a new filter always costs a full fit.
+IncrementalSalesModel forecasts the whole warehouse history, and only that forecast
+is updated incrementally (and persisted) as new months arrive. Per-period forecasts
+cannot be served from it, since every filter is a different monthly series.
+"""
+import os
+import pickle
+import tempfile
+import threading
+import time
+import weakref
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_absolute_error
+import pandas as pd
+from alerts import ALERT_RULES, evaluate_alerts, table_from_aggregate
+from instrumentation import span
+
+# Flattened node values per fitted forest, with the trees they were built from
+_leaf_tables = weakref.WeakKeyDictionary()
+_leaf_tables_lock = threading.Lock()
+
+def forest_tree_predictions(model, X):
+    """Predictions of every tree in a fitted forest as one (n_trees, n_samples) array"""
+    estimators = model.estimators_
+    # Refits, warm starts and trimmed trees all change the first or last tree (or the count)
+    trees = (len(estimators), estimators[0], estimators[-1])
+    with _leaf_tables_lock:
+        cached = _leaf_tables.get(model)
+    if cached is None or cached[0][0] != trees[0] or cached[0][1] is not trees[1] or cached[0][2] is not trees[2]:
+        # Flatten all trees' node values once per fit so lookups become a single gather
+        node_values = [estimator.tree_.value[:, 0, 0] for estimator in estimators]
+        offsets = np.cumsum([0] + [len(values) for values in node_values[:-1]])
+        cached = (trees, (np.concatenate(node_values), offsets))
+        with _leaf_tables_lock:
+            _leaf_tables[model] = cached
+    node_values, offsets = cached[1]
+    leaves = model.apply(X)  # (n_samples, n_trees) leaf index in each tree
+    return node_values[leaves + offsets].T
+
+def prediction_interval(model, X, coverage=0.8):
+    """Lower/upper bounds from the spread of the per-tree predictions"""
+    tail = (1 - coverage) / 2 * 100
+    tree_predictions = forest_tree_predictions(model, X)
+    lower, upper = np.percentile(tree_predictions, [tail, 100 - tail], axis=0)
+    # Skewed tree spreads can leave the forest mean outside the band; keep it inside
+    mean = tree_predictions.mean(axis=0)
+    return np.minimum(lower, mean), np.maximum(upper, mean)
 
-def generate_sales_prediction(monthly_data, algorithm='random_forest'):
+def trend_label(slope):
+    """Trend word and alert color of a fitted slope"""
+    if slope > 0:
+        return "meningkat", "success"
+    if slope < 0:
+        return "menurun", "danger"
+    return "stabil", "warning"
+
+def generate_sales_prediction(monthly_data, algorithm='random_forest', coverage=0.8):
     if len(monthly_data) < 3:
         return "Data tidak cukup untuk prediksi", None, None
+    # scikit-learn costs about half a second to import; load it on the first forecast, not at app start
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_absolute_error
     
     X = np.array(range(len(monthly_data))).reshape(-1, 1)
     y = monthly_data['total_sales'].values
@@ -19,24 +77,215 @@ def generate_sales_prediction(monthly_data, algorithm='random_forest'):
     else:
         model = RandomForestRegressor(n_estimators=100, random_state=42)
     
-    model.fit(X_train, y_train)
+    with span('model.fit', algorithm=algorithm, months=len(monthly_data)):
+        model.fit(X_train, y_train)
     y_pred_test = model.predict(X_test)
     mae = mean_absolute_error(y_test, y_pred_test)
     
     next_month_pred = model.predict([[len(monthly_data)]])[0]
     
+    # Interval band over the history plus the next month, only available for the forest
+    interval = None
+    if hasattr(model, 'estimators_'):
+        start = time.perf_counter()
+        lower, upper = prediction_interval(model, np.vstack([X, [[len(monthly_data)]]]), coverage)
+        interval = {
+            'coverage': coverage,
+            'lower': lower[-1],
+            'upper': upper[-1],
+            'band_lower': lower[:-1],
+            'band_upper': upper[:-1],
+            'elapsed_ms': (time.perf_counter() - start) * 1000
+        }
+    
     lr_model = LinearRegression().fit(X, y)
-    slope = lr_model.coef_[0]
-    trend = "meningkat" if slope > 0 else "menurun" if slope < 0 else "stabil"
-    trend_color = "success" if slope > 0 else "danger" if slope < 0 else "warning"
+    trend, trend_color = trend_label(lr_model.coef_[0])
     
     return {
         'prediction': next_month_pred,
         'trend': trend,
         'trend_color': trend_color,
-        'mae': mae
+        'mae': mae,
+        'interval': interval
     }, model, lr_model
 
+MODEL_STATE_PATH = os.environ.get('ADIDAS_MODEL_STATE', 'model_state.pkl')
+
+class IncrementalSalesModel:
+    """Calendar-month sales model updated in place as new months land.
+
+    The forest is warm-started with a few extra trees fitted on a bounded
+    window of recent months, and the linear trend keeps running XᵀX / Xᵀy
+    sums, so adding a month costs O(new data) instead of a full refit. The
+    newest month may still have been filling up when it was added; when it
+    comes back with a different total it is replaced, not left at that value.
+    dataset records which data the sums and trees were fitted on, so a state
+    file is never folded into a different or rebuilt warehouse.
+    """
+
+    def __init__(self, n_estimators=100, trees_per_update=10, max_trees=300, window=12):
+        from sklearn.ensemble import RandomForestRegressor
+        self.forest = RandomForestRegressor(n_estimators=n_estimators, random_state=42, warm_start=True)
+        self.n_estimators = n_estimators
+        self.trees_per_update = trees_per_update
+        self.max_trees = max_trees
+        self.window = window
+        self.xtx = np.zeros((2, 2))  # sums of [1, x]ᵀ[1, x]
+        self.xty = np.zeros(2)       # sums of [1, x]ᵀ y
+        self.history = []            # total sales per month, oldest first; x is the position
+        self.errors = {}             # month position -> |forecast error| before the forest was fitted on it
+        self.last_trees = 0          # trees fitted by the latest update, the only ones that saw the newest month
+        self.last_period = None      # (year, month) of the newest month seen
+        self.dataset = None          # (database, first (year, month), rows before the newest month) fitted on
+
+    @property
+    def n_months(self):
+        return len(self.history)
+
+    def update(self, monthly_sales):
+        """Add calendar months (columns year, month, total_sales) from last_period on; returns the months fitted"""
+        monthly_sales = monthly_sales.sort_values(['year', 'month'])
+        if self.last_period is not None:
+            periods = monthly_sales['year'] * 12 + monthly_sales['month']
+            monthly_sales = monthly_sales[periods >= self.last_period[0] * 12 + self.last_period[1]]
+            first = monthly_sales.iloc[0] if not monthly_sales.empty else None
+            if first is not None and (int(first['year']), int(first['month'])) == self.last_period:
+                if float(first['total_sales']) == self.history[-1]:
+                    monthly_sales = monthly_sales.iloc[1:]
+                else:
+                    self._retract_newest()
+        if monthly_sales.empty:
+            return 0
+
+        x = np.arange(self.n_months, self.n_months + len(monthly_sales), dtype=float)
+        y = monthly_sales['total_sales'].to_numpy(dtype=float)
+
+        # Sufficient statistics for the linear trend
+        design = np.column_stack([np.ones_like(x), x])
+        self.xtx += design.T @ design
+        self.xty += design.T @ y
+        if hasattr(self.forest, 'estimators_'):
+            self.errors.update(zip(range(self.n_months, self.n_months + len(y)),
+                                   np.abs(self.forest.predict(x.reshape(-1, 1)) - y).tolist()))
+        self.history.extend(y.tolist())
+
+        with span('model.update', months=len(monthly_sales)):
+            if hasattr(self.forest, 'estimators_'):
+                # Warm start: only the new trees are fitted, on the bounded recent window
+                recent = np.arange(self.n_months, dtype=float)[-self.window:]
+                self.forest.n_estimators += self.trees_per_update
+                self.forest.fit(recent.reshape(-1, 1), np.asarray(self.history[-self.window:]))
+                self.last_trees = self.trees_per_update
+            else:
+                self.forest.n_estimators = self.n_estimators
+                self.forest.fit(np.arange(self.n_months, dtype=float).reshape(-1, 1), np.asarray(self.history))
+                self.last_trees = self.n_estimators
+        if len(self.forest.estimators_) > self.max_trees:
+            self.forest.estimators_ = self.forest.estimators_[-self.max_trees:]
+            self.forest.n_estimators = self.max_trees
+
+        last = monthly_sales.iloc[-1]
+        self.last_period = (int(last['year']), int(last['month']))
+        return len(monthly_sales)
+
+    def _retract_newest(self):
+        """Take the newest month back out of the trend sums, the history and the forest"""
+        design = np.array([1.0, self.n_months - 1])
+        self.xtx -= np.outer(design, design)
+        self.xty -= design * self.history.pop()
+        self.errors.pop(self.n_months, None)
+        remaining = len(self.forest.estimators_) - self.last_trees
+        if remaining > 0:
+            self.forest.estimators_ = self.forest.estimators_[:remaining]
+            self.forest.n_estimators = remaining
+        else:
+            # The month came in with the first fit; the next fit starts over on the full history
+            del self.forest.estimators_
+        self.last_trees = 0
+
+    def trend_coefficients(self):
+        """Intercept and slope solved from the running normal equations"""
+        intercept, slope = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        return intercept, slope
+
+    def predict_next(self):
+        return self.forest.predict([[self.n_months]])[0]
+
+    def forecast(self, coverage=0.8):
+        """Next-month forecast and trend of the full history, shaped like generate_sales_prediction's result.
+
+        The MAE is over one-step-ahead errors (each month predicted before the forest
+        saw it), or in-sample over the window until a warm update has happened.
+        """
+        if self.n_months < 3:
+            return "Data tidak cukup untuk prediksi"
+        if self.errors:
+            mae = float(np.mean(list(self.errors.values())))
+        else:
+            recent = np.arange(self.n_months, dtype=float)[-self.window:]
+            mae = float(np.mean(np.abs(self.forest.predict(recent.reshape(-1, 1)) - self.history[-self.window:])))
+        lower, upper = prediction_interval(self.forest, np.array([[float(self.n_months)]]), coverage)
+        trend, trend_color = trend_label(self.trend_coefficients()[1])
+        return {
+            'prediction': self.predict_next(),
+            'trend': trend,
+            'trend_color': trend_color,
+            'mae': mae,
+            'interval': {'coverage': coverage, 'lower': lower[0], 'upper': upper[0]},
+            'months': self.n_months,
+            'last_period': self.last_period,
+        }
+
+def monthly_sales_series(df):
+    """Total sales per calendar month (year, month), oldest first"""
+    return df.groupby(['year', 'month'], as_index=False).agg({'total_sales': 'sum'}).sort_values(['year', 'month'])
+
+def load_model_state(path=MODEL_STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    # State from before the model recorded its dataset identity is refit instead
+    return model if isinstance(model, IncrementalSalesModel) and hasattr(model, 'dataset') else None
+
+def save_model_state(model, path=MODEL_STATE_PATH):
+    # Write to a temp file first so a crash never leaves a truncated state behind; the name is unique per
+    # writer, so concurrent server processes never write into (or replace away) each other's temp file
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path),
+                                     suffix='.tmp', delete=False) as f:
+        pickle.dump(model, f)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
+
+def dataset_identity(df, last_period):
+    """What a model fitted on df up to last_period is tied to: source database, first month and the
+    row count before last_period's month (rows of that month may still be arriving)"""
+    year, month = last_period
+    settled_rows = df['invoice_date'].searchsorted(pd.Timestamp(year=year, month=month, day=1))
+    return df.attrs.get('database'), (int(df['year'].iloc[0]), int(df['month'].iloc[0])), int(settled_rows)
+
+def refresh_sales_model(df, path=MODEL_STATE_PATH):
+    """Load the persisted model, fold in any months it has not seen (or has only seen partly) and save it back.
+
+    df must be date-sorted (share_dataset). State fitted on other data (another
+    database, or a rebuilt, restored or truncated warehouse) is refit from scratch.
+    """
+    model = load_model_state(path)
+    if model is not None and (df.empty or model.dataset != dataset_identity(df, model.last_period)):
+        model = None
+    model = model or IncrementalSalesModel()
+    new_rows = df
+    if model.last_period is not None:
+        # Only the rows of the newest seen month onwards are aggregated; that month may have grown since
+        new_rows = df.iloc[model.dataset[2]:]
+    if model.update(monthly_sales_series(new_rows)):
+        model.dataset = dataset_identity(df, model.last_period)
+        save_model_state(model, path)
+    return model
+
 def generate_performance_alert(current_value, historical_avg, metric_name):
     if current_value > historical_avg * 1.1:
         return f"🟢 {metric_name} saat ini {((current_value/historical_avg - 1) * 100):.1f}% di atas rata-rata historis"
@@ -45,13 +294,14 @@ def generate_performance_alert(current_value, historical_avg, metric_name):
     else:
         return f"🟡 {metric_name} dalam rentang normal"
 
+def dimension_alerts(data, dimension, rule_names, thresholds=None):
+    """Messages from the alert rule engine for one pre-aggregated dimension"""
+    rules = [rule for rule in ALERT_RULES if rule.name in rule_names]
+    alerts = evaluate_alerts(table_from_aggregate(data, dimension), rules=rules, thresholds=thresholds)
+    return [alert.message for alert in alerts]
+
 def generate_retailer_alert(retailer_data):
-    alerts = []
-    top_performer = retailer_data.nlargest(1, 'total_sales').iloc[0]
-    worst_performer = retailer_data.nsmallest(1, 'total_sales').iloc[0]
-    alerts.append(f"🏆 Top Performer: {top_performer['retailer_name']} dengan penjualan $ {top_performer['total_sales']/1e6:.1f}M")
-    alerts.append(f"⚠️ Perlu Perhatian: {worst_performer['retailer_name']} dengan penjualan ${worst_performer['total_sales']/1e6:.1f}M")
-    return alerts
+    return dimension_alerts(retailer_data, 'retailer_name', ['top_retailer', 'bottom_retailer'])
 
 def generate_prediction_alert(prediction_result):
     alerts = []
@@ -60,61 +310,30 @@ def generate_prediction_alert(prediction_result):
         mae_usd = prediction_result['mae'] / 1e6
         trend = prediction_result['trend'].upper()
         
-        alerts.append(f"📊 Next Month Prediction: ${prediction_usd:.1f}M")
+        interval = prediction_result.get('interval')
+        if interval:
+            alerts.append(f"📊 Next Month Prediction: ${prediction_usd:.1f}M ({interval['coverage']:.0%} interval ${interval['lower']/1e6:.1f}M - ${interval['upper']/1e6:.1f}M)")
+        else:
+            alerts.append(f"📊 Next Month Prediction: ${prediction_usd:.1f}M")
         alerts.append(f"📈 Trend: {trend}")
         alerts.append(f"📉 MAE: ${mae_usd:.1f}M")
     
     return alerts
 
 def generate_category_alert(category_data):
-    alerts = []
-    top_category = category_data.nlargest(1, 'total_sales_usd').iloc[0]
-    worst_category = category_data.nsmallest(1, 'total_sales_usd').iloc[0]
-    
-    alerts.append(f"🏅 Best Category: {top_category['product_category']} (${top_category['total_sales_usd']:.1f}M)")
-    alerts.append(f"⚠️ Needs Attention: {worst_category['product_category']} (${worst_category['total_sales_usd']:.1f}M)")
-    
-    return alerts
+    return dimension_alerts(category_data, 'product_category', ['top_category', 'bottom_category'])
 
 def generate_units_category_alert(units_category_data):
-    alerts = []
-    top_category = units_category_data.nlargest(1, 'units_sold').iloc[0]
-    worst_category = units_category_data.nsmallest(1, 'units_sold').iloc[0]
-    
-    alerts.append(f"🏆 Top Category: {top_category['product_category']} ({top_category['units_sold']} units)")
-    
-    return alerts
+    return dimension_alerts(units_category_data, 'product_category', ['top_units_category'])
 
 def generate_margin_category_alert(margin_category_data):
-    alerts = []
-    top_margin = margin_category_data.nlargest(1, 'operating_margin').iloc[0]
-    worst_margin = margin_category_data.nsmallest(1, 'operating_margin').iloc[0]
-    
-    alerts.append(f"💰 Highest Margin: {top_margin['product_category']} ({top_margin['operating_margin']:.1f}%)")
-    alerts.append(f"⚠️ Lowest Margin: {worst_margin['product_category']} ({worst_margin['operating_margin']:.1f}%)")
-    
-    return alerts
+    return dimension_alerts(margin_category_data, 'product_category', ['top_margin_category', 'bottom_margin_category'])
 
 def generate_city_alert(city_data):
-    alerts = []
-    top_city = city_data.nlargest(1, 'total_sales_usd').iloc[0]
-    worst_city = city_data.nsmallest(1, 'total_sales_usd').iloc[0]
-    
-    alerts.append(f"🌆 Top City: {top_city['city']} (${top_city['total_sales_usd']:.1f}M)")
-    alerts.append(f"⚠️ Needs Focus: {worst_city['city']} (${worst_city['total_sales_usd']:.1f}M)")
-    
-    return alerts
+    return dimension_alerts(city_data, 'city', ['top_city', 'bottom_city'])
 
 def generate_sales_method_alert(sales_method_data):
-    alerts = []
-    top_method = sales_method_data.nlargest(1, 'total_sales_usd').iloc[0]
-    worst_method = sales_method_data.nsmallest(1, 'total_sales_usd').iloc[0]
-    
-    alerts.append(f"🎯 Dominant Method: {top_method['sales_method']} (${top_method['total_sales_usd']:.1f}M)")
-    alerts.append(f"⚠️ Underperforming: {worst_method['sales_method']} (${worst_method['total_sales_usd']:.1f}M)")
-    
-    return alerts
-
+    return dimension_alerts(sales_method_data, 'sales_method', ['top_sales_method', 'bottom_sales_method'])
 
 def generate_gender_preference_alert(gender_pref, categories):
     alerts = []
@@ -129,13 +348,5 @@ def generate_gender_preference_alert(gender_pref, categories):
     
     return alerts
 
-def generate_geographic_insights(regional_data):
-    insights = []
-    total_sales = regional_data['total_sales'].sum()
-    for _, row in regional_data.iterrows():
-        percentage = (row['total_sales'] / total_sales) * 100
-        if percentage > 30:
-            insights.append(f"🎯 {row['region']}: Wilayah dominan ({percentage:.1f}% dari total penjualan)")
-        elif percentage < 10:
-            insights.append(f"📈 {row['region']}: Potensi ekspansi ({percentage:.1f}% dari total penjualan)")
-    return insights
\ No newline at end of file
+def generate_geographic_insights(regional_data, thresholds=None):
+    return dimension_alerts(regional_data, 'region', ['dominant_region', 'expansion_region'], thresholds)
@@ -1,16 +1,53 @@
+import hashlib
+import numpy as np
 import pandas as pd
 
+def share_dataset(df):
+    """Date-sorted, read-only copy of the loaded data, safe to hand to every session without copying.
+
+    Every column is copied into an array of its own and the frame is built from those
+    arrays without consolidating them, so writes to numeric and date columns raise
+    ValueError. String (object) columns stay writable, as pandas 2.0 object comparisons
+    reject read-only buffers. The caller's frame is left as it was.
+    """
+    dates = df['invoice_date']
+    order = None if dates.is_monotonic_increasing else np.argsort(dates.to_numpy(), kind='stable')
+    columns = {}
+    for name, column in df.items():
+        if not isinstance(column.dtype, np.dtype):
+            # Extension dtypes (categoricals, nullable integers) are copied as they are, not frozen
+            columns[name] = column.reset_index(drop=True) if order is None else column.take(order).reset_index(drop=True)
+            continue
+        values = column.to_numpy(copy=True) if order is None else column.to_numpy()[order]
+        if values.dtype != object:
+            values.flags.writeable = False
+        columns[name] = values
+    shared = pd.DataFrame(columns, copy=False)
+    shared.attrs = dict(df.attrs)
+    return shared
+
+def get_period_options(df):
+    """Period presets of the time filter: label -> (start, end); the last one is relative to the newest sale"""
+    return {
+        "📊 Jan 2020 - Dec 2021": (pd.to_datetime("2020-01-01"), pd.to_datetime("2021-12-31")),
+        "📅 2021 Full Year": (pd.to_datetime("2021-01-01"), pd.to_datetime("2021-12-31")),
+        "🗓️ Q1 2021": (pd.to_datetime("2021-01-01"), pd.to_datetime("2021-03-31")),
+        "⏰ Last 6 Months": (df['invoice_date'].max() - pd.Timedelta(days=180), df['invoice_date'].max())
+    }
+
 def filter_data(df, start_date, end_date):
-    print("Filter range:", start_date, "to", end_date)
-    print("Original df shape:", df.shape)
-    filtered_df = df[(df['invoice_date'] >= start_date) & (df['invoice_date'] <= end_date)]
-    print("Filtered df shape:", filtered_df.shape)
+    dates = df['invoice_date']
+    if dates.is_monotonic_increasing:
+        # Date-sorted data: the period is one contiguous row range, returned as a view
+        values = dates.to_numpy()
+        first = values.searchsorted(np.datetime64(start_date), side='left')
+        last = values.searchsorted(np.datetime64(end_date), side='right')
+        filtered_df = df.iloc[first:last]
+    else:
+        filtered_df = df[(dates >= start_date) & (dates <= end_date)]
     return filtered_df
 
 def calculate_kpis(filtered_df, full_df):
-    print("price_per_unit sample:", filtered_df['price_per_unit'].head().to_list())
-    print("price_per_unit mean (USD):", filtered_df['price_per_unit'].dropna().mean())
-    
     total_sales = filtered_df['total_sales'].sum() / 1e6  # USD, in millions
     total_profit = filtered_df['operating_profit'].sum() / 1e6  # USD, in millions
     total_units = filtered_df['units_sold'].sum() / 1e6  # Millions
@@ -29,4 +66,15 @@ def calculate_kpis(filtered_df, full_df):
         'avg_price': avg_price,
         'historical_avg_sales': historical_avg_sales,
         'historical_avg_profit': historical_avg_profit
-    }
\ No newline at end of file
+    }
+
+def frame_fingerprint(df):
+    """Stable content hash of a (small) DataFrame, used as a cache/job key"""
+    hashed = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+def dataset_version(df):
+    """Cheap version tag of the loaded dataset; changes whenever rows are added or edited in place"""
+    if df.empty:
+        return (0,)
+    return (len(df), str(df['invoice_date'].min()), str(df['invoice_date'].max()), float(df['total_sales'].sum()))
@@ -0,0 +1,242 @@
+"""Batch reports of every dashboard section for every period preset, rendered on a process pool.
+
+    python report.py --output reports --workers 4
+
+The data is loaded once. Each (period, section) pair is one job on a process pool.
+Workers inherit the dataset when processes are forked, and receive it pickled once
+per worker otherwise. A job filters the period, computes the section's aggregates
+and renders its Plotly figures, so the runtime divides by the number of cores up to
+the number of jobs. Per period a standalone HTML report is written (plotly.js is
+embedded unless --plotlyjs cdn), and report.json collects the KPIs, alerts and
+forecast of every period.
+"""
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from aggregation import AGGREGATES
+from alerts import build_alert_table, evaluate_alerts
+from api import jsonable
+from predictions import generate_performance_alert, generate_prediction_alert, generate_sales_prediction, refresh_sales_model
+from processing import calculate_kpis, filter_data, get_period_options, share_dataset
+from visualizations import (
+    FIGURE_OVERLAYS, FIGURE_RENDERERS, apply_theme, get_theme_colors,
+    render_anomalies, render_sales_map, render_sales_profit_trend
+)
+
+# Section -> (title, [(chart, chart title)]), in dashboard order
+REPORT_SECTIONS = {
+    'trends': ("📊 Sales Trends", [
+        ('sales_profit_trend', "Monthly Sales and Profit"), ('multi_period_trend', "Multi-Period Sales Trend"),
+        ('annual_sales_profit', "Annual Sales and Profit"), ('units_trend', "Units Sold Trend"),
+    ]),
+    'retailers': ("🏪 Retailer Insights", [
+        ('top_retailers', "Top 10 Retailers"), ('retailer_performance', "Retailer Performance"),
+    ]),
+    'products': ("👥 Product & Gender Analysis", [
+        ('product_category_performance', "Product Category Performance"),
+        ('gender_distribution', "Gender Distribution by Category"), ('gender_preferences', "Product Preferences by Gender"),
+        ('gender_trend', "Gender Purchase Trend"), ('units_per_category', "Units Sold by Category"),
+        ('margin_per_category', "Relationship Between Price and Volume"),
+    ]),
+    'geo': ("🌍 Geographic Analysis", [
+        ('regional_sales', "Sales Hierarchy Treemap"), ('sales_map', "Sales Map"),
+    ]),
+    'channels': ("🛒 Sales Channel Analysis", [
+        ('sales_method_distribution', "Sales by Method"), ('sales_method_trend', "Sales Method Trend"),
+    ]),
+    'anomalies': ("🚨 Anomaly Detection", [
+        ('anomalies', "Sales Anomalies by Segment"),
+    ]),
+}
+
+# Aggregate parameters of the report's charts, the dashboard's widget defaults
+REPORT_PARAMS = {
+    'sales_map': {'level': 'city'},
+    'anomalies': {'freq': 'D', 'method': 'zscore'},
+}
+
+RENDERERS = {**FIGURE_RENDERERS, 'sales_map': render_sales_map, 'anomalies': render_anomalies}
+
+REPORT_CSS = """
+body { font-family: 'Inter', sans-serif; margin: 0 auto; max-width: 1400px; padding: 2rem; color: #4a148c; background: #f3e5f5; }
+h1 { background: linear-gradient(135deg, #7c4dff 0%, #6a1b9a 50%, #4a148c 100%); color: white; padding: 2rem; border-radius: 20px; }
+h2 { border-bottom: 2px solid #7c4dff; padding-bottom: 0.5rem; margin-top: 2.5rem; }
+.kpis { display: grid; grid-template-columns: repeat(4, 1fr); gap: 1rem; }
+.kpi-card { background: white; border-radius: 15px; padding: 1.25rem; box-shadow: 0 8px 20px rgba(124, 77, 255, 0.15); }
+.kpi-label { font-size: 0.9rem; color: #7e57c2; }
+.kpi-value { font-size: 1.8rem; font-weight: 700; }
+.charts { display: grid; grid-template-columns: repeat(2, 1fr); gap: 1rem; }
+.chart { background: white; border-radius: 15px; padding: 1rem; }
+.chart-title { font-weight: 600; margin-bottom: 0.5rem; }
+.alert { padding: 0.6rem 1rem; border-radius: 10px; margin: 0.4rem 0; background: white; border-left: 4px solid #7c4dff; }
+.alert-success { border-left-color: #43a047; } .alert-warning { border-left-color: #fb8c00; } .alert-danger { border-left-color: #e53935; }
+"""
+
+# Set in each worker by init_worker: the dataset every job filters
+_dataset = None
+
+def init_worker(df):
+    global _dataset
+    _dataset = df
+
+def render_section(section, start_date, end_date, dark_mode=False):
+    """One job: (data for report.json, [(chart title, figure div or None)]) of a section over one period"""
+    df = _dataset
+    rows = filter_data(df, start_date, end_date)
+    if section == 'summary':
+        kpis = calculate_kpis(rows, df)
+        alerts = [
+            generate_performance_alert(kpis['total_sales'], kpis['historical_avg_sales'], "Sales"),
+            generate_performance_alert(kpis['total_profit'], kpis['historical_avg_profit'], "Profit"),
+        ]
+        return {'rows': len(rows), 'kpis': kpis, 'kpi_alerts': alerts,
+                'alerts': evaluate_alerts(build_alert_table(rows))}, []
+
+    theme = get_theme_colors(dark_mode)
+    data, figures = {}, []
+    for chart, title in REPORT_SECTIONS[section][1]:
+        aggregate = AGGREGATES[chart](rows, **REPORT_PARAMS.get(chart, {}))
+        if chart == 'sales_profit_trend':
+            prediction, _, _ = generate_sales_prediction(aggregate)
+            data['forecast'] = prediction
+            data['forecast_alerts'] = generate_prediction_alert(prediction)
+            fig = render_sales_profit_trend(aggregate, prediction if isinstance(prediction, dict) else None)
+        elif chart == 'anomalies':
+            data['anomalies'] = len(aggregate)
+            if aggregate.empty:
+                figures.append((title, None))
+                continue
+            fig = RENDERERS[chart](aggregate)
+        else:
+            fig = RENDERERS[chart](aggregate)
+        FIGURE_OVERLAYS.get(chart, apply_theme)(fig, theme)
+        figures.append((title, fig.to_html(full_html=False, include_plotlyjs=False)))
+    return data, figures
+
+def alert_html(message, severity=None):
+    if severity is None:
+        severity = 'success' if '🟢' in message else 'danger' if '🔴' in message else 'warning'
+    return f'<div class="alert alert-{severity}">{html.escape(message)}</div>'
+
+def report_html(label, start_date, end_date, sections, plotlyjs):
+    """Standalone HTML of one period from its jobs' results (section -> (data, figures))"""
+    summary = sections['summary'][0]
+    kpis = summary['kpis']
+    cards = [("Total Sales", f"${kpis['total_sales']:,.1f}M"), ("Total Profit", f"${kpis['total_profit']:,.1f}M"),
+             ("Units Sold", f"{kpis['total_units']:,.1f}M"), ("Avg. Price per Unit", f"${kpis['avg_price']:,.0f}")]
+    parts = [
+        f"<h1>👟 Adidas Sales Analysis — {html.escape(label)}</h1>",
+        f"<p>{start_date:%Y-%m-%d} s/d {end_date:%Y-%m-%d} • {summary['rows']:,} records</p>",
+        '<div class="kpis">' + ''.join(f'<div class="kpi-card"><div class="kpi-label">{name}</div>'
+                                       f'<div class="kpi-value">{value}</div></div>' for name, value in cards) + '</div>',
+        ''.join(alert_html(message) for message in summary['kpi_alerts']),
+    ]
+    for section, (title, _) in REPORT_SECTIONS.items():
+        if section not in sections:
+            continue
+        data, figures = sections[section]
+        parts.append(f"<h2>{html.escape(title)}</h2>")
+        parts.extend(alert_html(message, 'info') for message in data.get('forecast_alerts', []))
+        charts = []
+        for chart_title, figure in figures:
+            body = figure or '<div class="alert alert-success">✅ Tidak ada anomali terdeteksi pada periode ini</div>'
+            charts.append(f'<div class="chart"><div class="chart-title">{chart_title}</div>{body}</div>')
+        parts.append(f'<div class="charts">{"".join(charts)}</div>')
+    parts.append("<h2>💡 Alerts</h2>")
+    parts.extend(alert_html(alert.message, alert.severity) for alert in summary['alerts'])
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Adidas Sales Report — {html.escape(label)}</title>'
+            f'{plotlyjs}<style>{REPORT_CSS}</style></head><body>{"".join(parts)}</body></html>')
+
+def plotlyjs_tag(mode):
+    if mode == 'cdn':
+        from plotly.offline.offline import get_plotlyjs_version
+        return f'<script src="https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"></script>'
+    from plotly.offline import get_plotlyjs
+    return f'<script type="text/javascript">{get_plotlyjs()}</script>'
+
+def period_slug(label):
+    return re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-')
+
+def generate_reports(df, output, sections, workers, dark_mode=False, plotlyjs='inline', sales_model=None):
+    """Render every period preset; returns the report.json payload (with the full-history forecast given a model)"""
+    periods = get_period_options(df)
+    jobs = [(label, section) for label in periods for section in ['summary'] + sections]
+    # Forked workers share the parent's dataset pages instead of unpickling a copy each
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    results = {label: {} for label in periods}
+    errors = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker, initargs=(df,)) as pool:
+        futures = {pool.submit(render_section, section, *periods[label], dark_mode): (label, section)
+                   for label, section in jobs}
+        for future in as_completed(futures):
+            label, section = futures[future]
+            try:
+                results[label][section] = future.result()
+            except Exception as e:
+                errors[f'{label} / {section}'] = str(e)
+    compute_s = time.perf_counter() - start
+
+    os.makedirs(output, exist_ok=True)
+    script = plotlyjs_tag(plotlyjs)
+    report = {'generated': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'rows': len(df),
+              'workers': workers, 'jobs': len(jobs), 'compute_s': compute_s, 'errors': errors,
+              'history_forecast': sales_model.forecast() if sales_model is not None else None, 'periods': {}}
+    for label, (start_date, end_date) in periods.items():
+        sections_done = results[label]
+        entry = {'start': start_date, 'end': end_date}
+        if 'summary' in sections_done:
+            filename = f'{period_slug(label)}.html'
+            with open(os.path.join(output, filename), 'w', encoding='utf-8') as f:
+                f.write(report_html(label, start_date, end_date, sections_done, script))
+            entry['file'] = filename
+            entry.update(sections_done['summary'][0])
+        for data, _ in (sections_done[section] for section in sections if section in sections_done):
+            entry.update(data)
+        report['periods'][label] = entry
+    with open(os.path.join(output, 'report.json'), 'w', encoding='utf-8') as f:
+        json.dump(jsonable(report), f, ensure_ascii=False, indent=2)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='reports', help='directory for the HTML reports and report.json')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sections', nargs='+', choices=list(REPORT_SECTIONS), default=list(REPORT_SECTIONS))
+    parser.add_argument('--theme', choices=['light', 'dark'], default='light')
+    parser.add_argument('--plotlyjs', choices=['inline', 'cdn'], default='inline',
+                        help='embed plotly.js in every report (standalone) or load it from the CDN')
+    parser.add_argument('--rows', type=int, help='synthetic rows when the database is unreachable (ADIDAS_SAMPLE_ROWS)')
+    parser.add_argument('--database-url', help='SQLAlchemy URL of the warehouse (ADIDAS_DATABASE_URL)')
+    args = parser.parse_args(argv)
+
+    # Read by database.py when it is first imported below
+    if args.rows:
+        os.environ['ADIDAS_SAMPLE_ROWS'] = str(args.rows)
+    if args.database_url:
+        os.environ['ADIDAS_DATABASE_URL'] = args.database_url
+    from database import connect_to_database, read_sales_data
+
+    start = time.perf_counter()
+    df = share_dataset(read_sales_data(connect_to_database()))
+    load_s = time.perf_counter() - start
+    # Persisted model state only tracks warehouse data, never the sample fallback
+    sales_model = refresh_sales_model(df) if df.attrs.get('source') == 'warehouse' else None
+    report = generate_reports(df, args.output, args.sections, args.workers, args.theme == 'dark', args.plotlyjs,
+                              sales_model)
+    print(f"{len(report['periods'])} periods, {report['jobs']} jobs on {args.workers} workers: "
+          f"data loaded in {load_s:.1f} s, rendered in {report['compute_s']:.1f} s → {args.output}", file=sys.stderr)
+    for job, error in report['errors'].items():
+        print(f"  failed: {job}: {error}", file=sys.stderr)
+    return 1 if report['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
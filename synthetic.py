@@ -0,0 +1,226 @@
+"""Synthetic Adidas sales facts at any scale, built from the real dimension domains.
+
+    python synthetic.py --rows 100000000 --format parquet --output sales.parquet
+    python synthetic.py --rows 1000000 --format sqlite --output adidas_synthetic.db
+
+Each fact row reuses an observed (retailer, location, product, price, gender,
+channel, units, margin) combination from adidas_sales_cleaned.csv, so cities
+match their state and region and prices match their product. Dates follow the
+observed month-of-year and weekday mix plus the year-over-year growth; rows come
+out date-sorted in fixed-size chunks, with total_sales = price_per_unit × units_sold
+and operating_profit = total_sales × operating_margin.
+"""
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from geo import attach_coordinates
+
+SALES_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'adidas_sales_cleaned.csv')
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Column order of the load_data query
+FACT_COLUMNS = [
+    'sales_id', 'retailer_name', 'year', 'month', 'quarter', 'day', 'weekday',
+    'region', 'state', 'city', 'latitude', 'longitude', 'product_category',
+    'price_per_unit', 'gender_type', 'sales_method', 'units_sold', 'total_sales',
+    'operating_profit', 'operating_margin', 'invoice_date',
+]
+
+# Star-schema dimensions (as built by the ETL notebook): table -> (id column, attribute columns)
+DIMENSIONS = {
+    'dim_retailer': ('retailer_id', ['retailer_name']),
+    'dim_location': ('location_id', ['region', 'state', 'city']),
+    'dim_product': ('product_id', ['product_category', 'price_per_unit']),
+    'dim_gender': ('gender_id', ['gender_type']),
+    'dim_sales_method': ('sales_method_id', ['sales_method']),
+}
+
+@dataclass
+class SalesDomains:
+    profiles: pd.DataFrame    # observed attribute combinations, with star-schema ids and coordinates
+    month_weights: np.ndarray  # share of rows per calendar month (Jan..Dec)
+    weekday_weights: np.ndarray  # relative row rate per weekday (Mon..Sun)
+    annual_growth: float       # row-count growth factor per year
+
+@lru_cache(maxsize=2)
+def load_domains(path=SALES_CSV_PATH):
+    source = pd.read_csv(path).rename(columns={'retailer': 'retailer_name'})
+    dates = pd.to_datetime(source['invoice_date'])
+
+    profiles = attach_coordinates(source[[
+        'retailer_name', 'region', 'state', 'city', 'product_category', 'price_per_unit',
+        'gender_type', 'sales_method', 'units_sold', 'operating_margin'
+    ]])
+    for id_column, columns in DIMENSIONS.values():
+        codes = profiles.groupby(columns, sort=True).ngroup()
+        profiles[id_column] = codes.to_numpy() + 1
+
+    # Month mix per year, averaged so the growth between years does not skew it
+    per_month = pd.crosstab(dates.dt.year, dates.dt.month).reindex(columns=range(1, 13), fill_value=0)
+    month_weights = (per_month.div(per_month.sum(axis=1), axis=0)).mean().to_numpy()
+    weekday_weights = dates.dt.weekday.value_counts().reindex(range(7), fill_value=0).to_numpy(dtype=float)
+    weekday_weights = weekday_weights / weekday_weights.mean()
+    per_year = dates.dt.year.value_counts().sort_index()
+    annual_growth = (per_year.iloc[-1] / per_year.iloc[0]) ** (1 / max(len(per_year) - 1, 1))
+    return SalesDomains(profiles, month_weights, weekday_weights, float(annual_growth))
+
+def daily_weights(days, domains):
+    """Probability of a row falling on each day: month mix × weekday mix × growth per calendar year"""
+    per_day = domains.month_weights[days.month - 1] / days.days_in_month.to_numpy()
+    growth = domains.annual_growth ** (days.year.to_numpy() - days.year[0])
+    weights = per_day * domains.weekday_weights[days.weekday.to_numpy()] * growth
+    return weights / weights.sum()
+
+def draw_chunks(rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, start='2020-01-01', end='2021-12-31', domains=None):
+    """Yield (first sales_id, days, day index, profile index, units) per chunk of date-sorted rows.
+
+    Rows per day are fixed up front from one multinomial draw, so chunks continue one
+    global date order; each chunk draws its attributes from its own (seed, chunk) stream.
+    """
+    domains = domains or load_domains()
+    days = pd.date_range(start, end, freq='D')
+    ends = np.cumsum(np.random.default_rng(seed).multinomial(rows, daily_weights(days, domains)))
+    profile_units = domains.profiles['units_sold'].to_numpy(dtype=float)
+    for chunk, first in enumerate(range(0, max(rows, 1), chunk_rows)):
+        rng = np.random.default_rng([seed, chunk])
+        count = min(chunk_rows, rows - first)
+        day = np.searchsorted(ends, np.arange(first, first + count), side='right')
+        profile = rng.integers(0, len(domains.profiles), count)
+        # Units vary around the observed order size of the combination
+        units = np.rint(profile_units[profile] * rng.lognormal(0.0, 0.25, count)).astype(np.int64)
+        yield first, days, day, profile, units
+
+def fact_chunk(domains, first, days, day, profile, units):
+    """Rows with the load_data schema"""
+    profiles = domains.profiles
+    price = profiles['price_per_unit'].to_numpy()[profile]
+    margin = profiles['operating_margin'].to_numpy()[profile]
+    total_sales = price * units
+    columns = {
+        'sales_id': np.arange(first + 1, first + len(day) + 1),
+        'year': days.year.to_numpy()[day],
+        'month': days.month.to_numpy()[day],
+        'quarter': days.to_period('Q').astype(str).to_numpy(dtype=object)[day],
+        'day': days.day.to_numpy()[day],
+        'weekday': days.day_name().to_numpy(dtype=object)[day],
+        'price_per_unit': price,
+        'units_sold': units,
+        'total_sales': total_sales,
+        'operating_profit': total_sales * margin,
+        'operating_margin': margin,
+        'invoice_date': days.to_numpy()[day],
+    }
+    for column in ['retailer_name', 'region', 'state', 'city', 'latitude', 'longitude',
+                   'product_category', 'gender_type', 'sales_method']:
+        columns[column] = profiles[column].to_numpy()[profile]
+    # One block per column, no consolidation copy; ordered up front since selecting columns later copies
+    return pd.DataFrame({column: columns.pop(column) for column in FACT_COLUMNS}, copy=False)
+
+def star_fact_chunk(domains, first, days, day, profile, units):
+    """fact_sales rows keyed by the ids of star_dimensions()"""
+    profiles = domains.profiles
+    total_sales = profiles['price_per_unit'].to_numpy()[profile] * units
+    margin = profiles['operating_margin'].to_numpy()[profile]
+    columns = {'sales_id': np.arange(first + 1, first + len(day) + 1)}
+    columns['retailer_id'] = profiles['retailer_id'].to_numpy()[profile]
+    columns['date_id'] = day + 1
+    for id_column in ['location_id', 'product_id', 'sales_method_id', 'gender_id']:
+        columns[id_column] = profiles[id_column].to_numpy()[profile]
+    columns.update(units_sold=units, total_sales=total_sales, operating_profit=total_sales * margin,
+                   operating_margin=margin)
+    return pd.DataFrame(columns)
+
+def star_dimensions(domains, days):
+    """Dimension tables of the warehouse schema for these domains and dates"""
+    tables = {}
+    for table, (id_column, columns) in DIMENSIONS.items():
+        extra = ['latitude', 'longitude'] if table == 'dim_location' else []
+        tables[table] = (domains.profiles[[id_column] + columns + extra]
+                         .drop_duplicates(id_column).sort_values(id_column, ignore_index=True))
+    tables['dim_date'] = pd.DataFrame({
+        'date_id': np.arange(1, len(days) + 1),
+        'invoice_date': days,
+        'year': days.year,
+        'month': days.month,
+        'quarter': days.to_period('Q').astype(str),
+        'day': days.day,
+        'weekday': days.day_name(),
+    })
+    return tables
+
+def generate_sales(rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, start='2020-01-01', end='2021-12-31'):
+    """Date-sorted fact frames with the load_data schema, at most chunk_rows rows each"""
+    domains = load_domains()
+    for draw in draw_chunks(rows, chunk_rows, seed, start, end, domains):
+        yield fact_chunk(domains, *draw)
+
+def synthetic_sales(rows, seed=0, start='2020-01-01', end='2021-12-31'):
+    """All rows as one frame (generated as a single chunk, so no concatenation copy)"""
+    return next(generate_sales(rows, chunk_rows=max(rows, 1), seed=seed, start=start, end=end))
+
+def write_csv(path, rows, **options):
+    for index, chunk in enumerate(generate_sales(rows, **options)):
+        chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+
+def write_parquet(path, rows, **options):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in generate_sales(rows, **options):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_database(url, rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, start='2020-01-01', end='2021-12-31'):
+    """Replace the warehouse tables at url (any SQLAlchemy URL) so load_data's star-schema query runs on them"""
+    from sqlalchemy import create_engine
+
+    domains = load_domains()
+    engine = create_engine(url)
+    days = pd.date_range(start, end, freq='D')
+    with engine.begin() as conn:
+        for table, frame in star_dimensions(domains, days).items():
+            frame.to_sql(table, conn, if_exists='replace', index=False)
+        for index, draw in enumerate(draw_chunks(rows, chunk_rows, seed, start, end, domains)):
+            star_fact_chunk(domains, *draw).to_sql('fact_sales', conn, if_exists='replace' if index == 0 else 'append',
+                                                   index=False, chunksize=100_000)
+    return engine
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet, 'sqlite': None}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, required=True)
+    parser.add_argument('--format', choices=['csv', 'parquet', 'sqlite'], required=True)
+    parser.add_argument('--output', required=True, help='file path, or a SQLAlchemy URL / SQLite file for sqlite')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', default='2020-01-01')
+    parser.add_argument('--end', default='2021-12-31')
+    args = parser.parse_args(argv)
+
+    options = dict(chunk_rows=args.chunk_rows, seed=args.seed, start=args.start, end=args.end)
+    if args.format == 'sqlite':
+        url = args.output if '://' in args.output else f'sqlite:///{args.output}'
+        write_database(url, args.rows, **options)
+        print(f"Wrote {args.rows:,} rows to {url} (set ADIDAS_DATABASE_URL={url} to load them in the dashboard)")
+    else:
+        WRITERS[args.format](args.output, args.rows, **options)
+        print(f"Wrote {args.rows:,} rows to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
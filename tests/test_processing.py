@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from processing import share_dataset
+
+def sales_frame():
+    df = pd.DataFrame({
+        'invoice_date': pd.to_datetime(['2021-03-01', '2021-01-01', '2021-02-01', '2021-01-01']),
+        'region': ['West', 'South', 'West', 'Northeast'],
+        'units_sold': np.array([5, 3, 8, 1], dtype=np.int64),
+        'total_sales': [500.0, 300.0, 800.0, 100.0],
+    })
+    df.attrs['source'] = 'sample'
+    return df
+
+@pytest.mark.parametrize('presorted', [False, True])
+def test_share_dataset_freezes_a_sorted_copy(presorted):
+    df = sales_frame()
+    if presorted:
+        df = df.sort_values('invoice_date', kind='stable', ignore_index=True)
+    before = df.copy()
+    shared = share_dataset(df)
+
+    assert shared['invoice_date'].is_monotonic_increasing
+    assert list(shared['region']) == ['South', 'Northeast', 'West', 'West']
+    assert shared.attrs == {'source': 'sample'}
+    with pytest.raises(ValueError):
+        shared.loc[0, 'total_sales'] = 0.0
+    with pytest.raises(ValueError):
+        shared.iloc[0, shared.columns.get_loc('units_sold')] = 0
+    with pytest.raises(ValueError):
+        shared['invoice_date'].to_numpy()[0] = np.datetime64('2000-01-01')
+
+    # The caller's frame is neither frozen nor reordered
+    pd.testing.assert_frame_equal(df, before)
+    df.loc[0, 'total_sales'] = 0.0
+    assert shared['total_sales'].sum() == 1700.0
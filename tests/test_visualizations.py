@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from visualizations import lttb_indices
+
+def sequential_lttb(x, y, budget):
+    """Reference LTTB, one bucket at a time, over the same buckets as lttb_indices"""
+    n = len(y)
+    if budget >= n:
+        return np.arange(n)
+    edges = np.floor(np.linspace(1, n - 1, budget - 1)).astype(np.int64)
+    picks = [0]
+    for bucket, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        if bucket + 2 < len(edges):
+            next_x, next_y = x[end:edges[bucket + 2]].mean(), y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        anchor_x, anchor_y = x[picks[-1]], y[picks[-1]]
+        best, best_area = start, -1.0
+        for i in range(start, end):
+            area = abs((anchor_x - next_x) * (y[i] - anchor_y) - (anchor_x - x[i]) * (next_y - anchor_y))
+            if area > best_area:
+                best, best_area = i, area
+        picks.append(best)
+    return np.array(picks + [n - 1])
+
+@pytest.mark.parametrize('seed', range(60))
+def test_lttb_matches_sequential_reference(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(50, 20_000))
+    budget = int(rng.integers(3, min(n, 600)))
+    x = np.arange(n, dtype=float)
+    # Noisy and periodic series are where a capped number of passes stopped short of the fixed point
+    y = np.sin(x / rng.uniform(2, 50)) * 100 + rng.normal(0, rng.uniform(1, 50), n)
+    np.testing.assert_array_equal(lttb_indices(x, y, budget), sequential_lttb(x, y, budget))
+
+def test_lttb_keeps_short_series():
+    np.testing.assert_array_equal(lttb_indices(np.arange(5), np.arange(5), 10), np.arange(5))
+
+@pytest.mark.parametrize('budget', [0, 1, 2])
+def test_lttb_raises_tiny_budgets_to_three_points(budget):
+    y = np.sin(np.arange(1000) / 10)
+    keep = lttb_indices(np.arange(1000), y, budget)
+    np.testing.assert_array_equal(keep, sequential_lttb(np.arange(1000.0), y, 3))
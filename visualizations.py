@@ -1,11 +1,23 @@
+import os
 import streamlit as st
-import plotly.express as px
+import numpy as np
 import plotly.graph_objects as go
+from figure_cache import FigureCache
+from aggregation import AggregationScheduler
+from instrumentation import span
+
+# Maximum points per trend-chart trace; longer series are downsampled with LTTB
+TREND_POINT_BUDGET = int(os.environ.get('ADIDAS_TREND_POINT_BUDGET', 500))
+
+# Vectorized LTTB re-pick passes before the remaining buckets are settled one by one
+LTTB_VECTOR_PASSES = 4
 
 # Define consistent color palettes and styling
-def get_theme_colors():
-    """Get theme colors based on dark mode setting"""
-    if st.session_state.get('dark_mode', False):
+def get_theme_colors(dark_mode=None):
+    """Get theme colors based on dark mode setting (the session's, unless given)"""
+    if dark_mode is None:
+        dark_mode = st.session_state.get('dark_mode', False)
+    if dark_mode:
         return {
             'bg_color': 'rgba(45, 27, 105, 0.8)',
             'text_color': 'white',
@@ -26,59 +38,199 @@ def get_purple_palette():
     ]
 
 def apply_chart_layout(fig, title_x='', title_y='', height=400, showlegend=True):
-    """Apply consistent layout styling to charts"""
-    theme = get_theme_colors()
-    
+    """Apply consistent layout styling to charts (colors are overlaid by apply_theme)"""
     fig.update_layout(
         xaxis_title=title_x,
         yaxis_title=title_y,
         height=height,
         showlegend=showlegend,
         margin=dict(l=80, r=40, t=60, b=40),
-        paper_bgcolor=theme['bg_color'],
-        plot_bgcolor=theme['bg_color'],
-        font=dict(family='Inter, sans-serif', size=14, color=theme['text_color']),
-        xaxis=dict(
-            gridcolor=theme['grid_color'],
-            title_font_color=theme['text_color'],  # Tambahkan ini
-            tickfont_color=theme['text_color']     # Tambahkan ini
-        ),
-        yaxis=dict(
-            gridcolor=theme['grid_color'],
-            title_font_color=theme['text_color'],  # Tambahkan ini
-            tickfont_color=theme['text_color']     # Tambahkan ini
-        ),
-        yaxis2=dict(
-            gridcolor=theme['grid_color'],
-            title_font_color=theme['text_color'],  # Tambahkan ini
-            tickfont_color=theme['text_color']     # Tambahkan ini
-        ),
+        font=dict(family='Inter, sans-serif', size=14),
         legend=dict(
             x=0.5, 
             xanchor='center', 
             y=1.1, 
-            orientation='h',
-            font_color=theme['text_color']  # Tambahkan ini
+            orientation='h'
         ) if showlegend else {}
     )
     return fig
 
-def plot_sales_profit_trend(monthly_data, prediction_result):
+def apply_theme(fig, theme):
+    """Overlay theme colors; the only theme-dependent step, so cached figures stay valid"""
+    axis_colors = dict(
+        gridcolor=theme['grid_color'],
+        title_font_color=theme['text_color'],
+        tickfont_color=theme['text_color']
+    )
+    fig.update_layout(
+        paper_bgcolor=theme['bg_color'],
+        plot_bgcolor=theme['bg_color'],
+        font_color=theme['text_color'],
+        xaxis=axis_colors,
+        yaxis=axis_colors,
+        yaxis2=axis_colors,
+        legend_font_color=theme['text_color']
+    )
+    return fig
+
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide figure cache shared by every session"""
+    return FigureCache()
+
+@st.cache_resource
+def get_aggregation_scheduler():
+    """Process-wide aggregate thread pool shared by every session"""
+    return AggregationScheduler()
+
+def aggregate(name, filtered_df, cache_key=None, **params):
+    """Aggregate from the scheduler (prefetched or computed on demand) for a chart's build step"""
+    with span(f'wait.{name}'):
+        return get_aggregation_scheduler().result(name, filtered_df, cache_key, **params)
+
+def show_chart(chart, cache_key, build, overlay=apply_theme, container=st):
+    """Render a chart from the figure cache (built on a miss) with the current theme overlaid; returns the figure"""
+    key = (chart, cache_key) if cache_key is not None else None
+    name = chart if isinstance(chart, str) else chart[0]
+
+    def traced_build():
+        with span(f'build.{name}'):
+            return build()
+
+    with span(f'chart.{name}'):
+        with get_figure_cache().themed(key, traced_build, overlay, get_theme_colors()) as fig:
+            container.plotly_chart(fig, use_container_width=True)
+    return fig
+
+def lttb_indices(x, y, budget):
+    """Indices of a Largest-Triangle-Three-Buckets downsample of (x, y) to at most budget points.
+
+    Budgets below 3 (the two end points and one bucket) are raised to 3, so a tiny
+    budget still caps the trace instead of disabling the cap.
+
+    Vectorized over buckets: each bucket's point is first picked against the
+    previous bucket's centroid, then re-picked against the point selected in the
+    previous bucket. Sequential LTTB is the fixed point of that step; a few passes
+    settle most buckets, and one ordered sweep then re-picks the buckets whose
+    anchor still moved, so the result equals sequential LTTB exactly.
+    """
+    n = len(y)
+    budget = max(budget, 3)
+    if budget >= n:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # First and last points are kept; the interior is split into budget - 2 buckets
+    edges = np.floor(np.linspace(1, n - 1, budget - 1)).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    sizes = ends - starts
+    members = starts[:, None] + np.arange(sizes.max())
+    in_bucket = members < ends[:, None]
+    members = np.minimum(members, n - 1)
+    bx, by = x[members], y[members]
+
+    centroid_x = np.add.reduceat(x[:n - 1], starts) / sizes
+    centroid_y = np.add.reduceat(y[:n - 1], starts) / sizes
+    # Third vertex: the next bucket's centroid (the last point for the final bucket)
+    next_x = np.append(centroid_x[1:], x[-1])[:, None]
+    next_y = np.append(centroid_y[1:], y[-1])[:, None]
+
+    def pick(rows, anchor_x, anchor_y):
+        area = np.abs((anchor_x - next_x[rows]) * (by[rows] - anchor_y) - (anchor_x - bx[rows]) * (next_y[rows] - anchor_y))
+        return members[rows, np.where(in_bucket[rows], area, -1).argmax(axis=1)]
+
+    rows = np.arange(len(starts))
+    chosen = pick(rows, np.append(x[0], centroid_x[:-1])[:, None], np.append(y[0], centroid_y[:-1])[:, None])
+    anchors = np.zeros_like(chosen)
+    for _ in range(LTTB_VECTOR_PASSES):
+        # Only buckets whose anchor (the previous bucket's pick) moved need re-picking
+        new_anchors = np.append(0, chosen[:-1])
+        rows = np.flatnonzero(new_anchors != anchors)
+        if not len(rows):
+            return np.concatenate([[0], chosen, [n - 1]])
+        anchors = new_anchors
+        chosen[rows] = pick(rows, x[anchors[rows]][:, None], y[anchors[rows]][:, None])
+    # A change can ripple one bucket per pass on noisy or periodic series; finish in bucket order instead
+    for row in range(1, len(chosen)):
+        if chosen[row - 1] != anchors[row]:
+            anchors[row] = chosen[row - 1]
+            chosen[row] = pick(np.array([row]), x[anchors[row]], y[anchors[row]])[0]
+    return np.concatenate([[0], chosen, [n - 1]])
+
+def downsample(x, y, budget=None):
+    """Downsample a trace to the trend point budget, keeping peaks and troughs"""
+    x, y = np.asarray(x), np.asarray(y)
+    keep = lttb_indices(x.astype('datetime64[ns]').astype(np.int64) if x.dtype.kind == 'M' else x, y,
+                        budget or TREND_POINT_BUDGET)
+    return x[keep], y[keep]
+
+
+
+def series_traces(frame, make_trace, budget=None):
+    """One trace per column of a pivoted frame via make_trace(i, name, x, y), skipping empty cells (and downsampling if budget)"""
+    index_values = frame.index.to_numpy()
+    traces = []
+    for i, name in enumerate(frame.columns):
+        column = frame[name].to_numpy()
+        present = ~np.isnan(column)
+        x, y = index_values[present], column[present]
+        if budget:
+            x, y = downsample(x, y, budget)
+        traces.append(make_trace(i, name, x, y))
+    return traces
+
+def plot_sales_profit_trend(monthly_data, prediction_result, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Monthly Sales and Profit</div>', unsafe_allow_html=True)
     
-    # Prepare data for plotting
-    monthly_data['total_sales_usd'] = monthly_data['total_sales'] / 1e6
-    monthly_data['operating_profit_usd'] = monthly_data['operating_profit'] / 1e6
+    # Chart lives in a placeholder so the forecast band can be drawn in once it is ready
+    chart_slot = st.empty()
+    draw_sales_profit_trend(chart_slot, monthly_data, prediction_result, cache_key)
+
+    st.markdown('</div>', unsafe_allow_html=True)
+    return chart_slot
 
-    theme = get_theme_colors()
+
+def draw_sales_profit_trend(chart_slot, monthly_data, prediction_result, cache_key=None):
+    # With and without the forecast band are separate cache entries
+    has_forecast = isinstance(prediction_result, dict) and bool(prediction_result.get('interval'))
+    show_chart(
+        ('sales_profit_trend', has_forecast), cache_key,
+        lambda: render_sales_profit_trend(monthly_data, prediction_result),
+        container=chart_slot
+    )
+
+def render_sales_profit_trend(monthly_data, prediction_result):
+    # Prepare data for plotting
+    monthly_data = monthly_data.assign(
+        total_sales_usd=monthly_data['total_sales'] / 1e6,
+        operating_profit_usd=monthly_data['operating_profit'] / 1e6
+    )
 
     purple_palette = get_purple_palette()
     fig = go.Figure()
 
+    months = monthly_data['month'].to_numpy()
+    keep = lttb_indices(months, monthly_data['total_sales_usd'].to_numpy(), TREND_POINT_BUDGET)
+
+    interval = prediction_result.get('interval') if isinstance(prediction_result, dict) else None
+    if interval:
+        # Per-tree prediction band, drawn first so it sits behind the sales line
+        band_x = months[keep]
+        fig.add_trace(go.Scatter(
+            x=list(band_x) + list(band_x)[::-1],
+            y=list(np.asarray(interval['band_upper'])[keep] / 1e6) + list(np.asarray(interval['band_lower'])[keep] / 1e6)[::-1],
+            fill='toself',
+            fillcolor='rgba(167, 139, 250, 0.25)',
+            line=dict(width=0),
+            name=f"Prediction Band ({interval['coverage']:.0%})",
+            hoverinfo='skip'
+        ))
+
     # Sales line with markers and hover info
     fig.add_trace(go.Scatter(
-        x=monthly_data['month'],
-        y=monthly_data['total_sales_usd'],
+        x=months[keep],
+        y=monthly_data['total_sales_usd'].to_numpy()[keep],
         mode='lines+markers',
         name='Total Sales',
         line=dict(color=purple_palette[0], width=3),
@@ -87,9 +239,10 @@ def plot_sales_profit_trend(monthly_data, prediction_result):
     ))
 
     # Profit line with markers and hover info
+    profit_x, profit_y = downsample(months, monthly_data['operating_profit_usd'])
     fig.add_trace(go.Scatter(
-        x=monthly_data['month'],
-        y=monthly_data['operating_profit_usd'],
+        x=profit_x,
+        y=profit_y,
         mode='lines+markers',
         name='Total Profit',
         line=dict(color=purple_palette[1], width=3),
@@ -98,48 +251,54 @@ def plot_sales_profit_trend(monthly_data, prediction_result):
         yaxis='y2'
     ))
 
+    tickvals = list(range(1, 13))
+    ticktext = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+    if interval:
+        # Next month forecast with its interval as an error bar
+        next_month = monthly_data['month'].iloc[-1] + 1
+        prediction_usd = prediction_result['prediction'] / 1e6
+        fig.add_trace(go.Scatter(
+            x=[next_month],
+            y=[prediction_usd],
+            mode='markers',
+            name='Prediction',
+            marker=dict(size=10, symbol='diamond', color=purple_palette[4]),
+            error_y=dict(
+                type='data',
+                symmetric=False,
+                array=[interval['upper'] / 1e6 - prediction_usd],
+                arrayminus=[prediction_usd - interval['lower'] / 1e6],
+                color=purple_palette[4]
+            ),
+            hovertemplate='Next Month Prediction: $%{y:.2f}M<extra></extra>'
+        ))
+        if next_month not in tickvals:
+            tickvals.append(next_month)
+            ticktext.append('Next')
+
     # Apply consistent styling
     fig = apply_chart_layout(fig, 'Month', 'Total Sales (Million $)')
     fig.update_layout(
         xaxis=dict(
             # title='Month',
-            tickvals=list(range(1, 13)),
-            ticktext=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+            tickvals=tickvals,
+            ticktext=ticktext
         ),
         yaxis=dict(tickformat='.2f', tickprefix='$ '),
         yaxis2=dict(tickformat='.2f', tickprefix='$ ', overlaying='y', side='right'),
-        font=dict(family='Inter, sans-serif', size=14, color=theme['text_color']),
         hovermode='x unified'
     )
-    
-
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Display prediction results if available
-    # if isinstance(prediction_result, dict):
-    #     prediction_usd = prediction_result['prediction'] / 1e6
-    #     mae_usd = prediction_result['mae'] / 1e6
-    #     st.markdown(f"""
-    #         <div class="prediction-box">
-    #             📊 <strong>Next Month Prediction:</strong> ${prediction_usd:.1f}M<br>
-    #             📈 <strong>Trend:</strong> {prediction_result['trend'].upper()}<br>
-    #             📉 <strong>MAE:</strong> ${mae_usd:.1f}M
-    #         </div>
-    #     """, unsafe_allow_html=True)
 
-    st.markdown('</div>', unsafe_allow_html=True)
+    return fig
 
 
-def plot_multi_period_trend(filtered_df):
+def plot_multi_period_trend(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Multi-Period Sales Trend</div>', unsafe_allow_html=True)
     
-    # Group by year and sum total sales
-    yearly_data = filtered_df.groupby('year').agg({'total_sales': 'sum'}).reset_index()
-    yearly_data['total_sales_usd'] = yearly_data['total_sales'] / 1e6 
-
-    # Filter to include only 2020 and 2021
-    yearly_data = yearly_data[yearly_data['year'].isin([2020, 2021])]
+    show_chart('multi_period_trend', cache_key, lambda: render_multi_period_trend(aggregate('multi_period_trend', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
 
+def render_multi_period_trend(yearly_data):
     purple_palette = get_purple_palette()
     fig = go.Figure()
 
@@ -162,18 +321,16 @@ def plot_multi_period_trend(filtered_df):
         hovermode='x unified'
     )
 
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    return fig
 
 
-def plot_annual_sales_profit(filtered_df):
+def plot_annual_sales_profit(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Annual Sales and Profit</div>', unsafe_allow_html=True)
     
-    # Group by year and sum total sales and operating profit
-    annual_data = filtered_df.groupby('year').agg({'total_sales': 'sum', 'operating_profit': 'sum'}).reset_index()
-    annual_data['total_sales_usd'] = annual_data['total_sales'] / 1e6 
-    annual_data['operating_profit_usd'] = annual_data['operating_profit'] / 1e6 
+    show_chart('annual_sales_profit', cache_key, lambda: render_annual_sales_profit(aggregate('annual_sales_profit', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
 
+def render_annual_sales_profit(annual_data):
     purple_palette = get_purple_palette()
     fig = go.Figure()
 
@@ -211,31 +368,29 @@ def plot_annual_sales_profit(filtered_df):
         hovermode='x unified'
     )
 
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    return fig
 
 
-def plot_units_trend(filtered_df):
+def plot_units_trend(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Units Sold Trend</div>', unsafe_allow_html=True)
     
-    # Group by month and product category to sum units sold
-    units_trend = filtered_df.groupby(['month', 'product_category']).agg({'units_sold': 'sum'}).reset_index()
+    show_chart('units_trend', cache_key, lambda: render_units_trend(aggregate('units_trend', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
 
+def render_units_trend(units):
     purple_palette = get_purple_palette()
     fig = go.Figure()
 
     # Add a line for each product category
-    for i, category in enumerate(units_trend['product_category'].unique()):
-        category_data = units_trend[units_trend['product_category'] == category]
-        fig.add_trace(go.Scatter(
-            x=category_data['month'],
-            y=category_data['units_sold'],
-            mode='lines+markers',
-            name=category,
-            line=dict(width=3, color=purple_palette[i % len(purple_palette)]),
-            marker=dict(size=8, symbol='circle'),
-            hovertemplate='Month: %{x}<br>Units Sold: %{y}<extra></extra>'
-        ))
+    fig.add_traces(series_traces(units, lambda i, category, x, y: go.Scatter(
+        x=x,
+        y=y,
+        mode='lines+markers',
+        name=category,
+        line=dict(width=3, color=purple_palette[i % len(purple_palette)]),
+        marker=dict(size=8, symbol='circle'),
+        hovertemplate='Month: %{x}<br>Units Sold: %{y}<extra></extra>'
+    ), budget=TREND_POINT_BUDGET))
 
     # Apply consistent styling
     fig = apply_chart_layout(fig, 'Month', 'Units Sold')
@@ -248,16 +403,15 @@ def plot_units_trend(filtered_df):
         hovermode='x unified'
     )
 
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    return fig
 
-def plot_top_retailers(filtered_df):
+def plot_top_retailers(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Top 10 Retailers</div>', unsafe_allow_html=True)
     
-    # Prepare data: top 10 retailers by total sales
-    top_retailers = filtered_df.groupby('retailer_name').agg({'total_sales': 'sum'}).nlargest(10, 'total_sales').reset_index()
-    top_retailers['total_sales_usd'] = top_retailers['total_sales'] / 1e6 
-    
+    show_chart('top_retailers', cache_key, lambda: render_top_retailers(aggregate('top_retailers', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_top_retailers(top_retailers):
     # Define a purple palette with distinct shades for up to 10 bars
     purple_palette = get_purple_palette()
     
@@ -282,18 +436,17 @@ def plot_top_retailers(filtered_df):
         yaxis=dict(autorange="reversed")
     )
 
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
+    return fig
 
 
-def plot_retailer_performance(filtered_df):
+def plot_retailer_performance(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Retailer Performance</div>', unsafe_allow_html=True)
     
-    retailer_perf = filtered_df.groupby('retailer_name').agg({'total_sales': 'sum', 'operating_margin': 'mean'}).reset_index()
-    retailer_perf['total_sales_usd'] = retailer_perf['total_sales'] / 1e6 
-    
+    show_chart('retailer_performance', cache_key, lambda: render_retailer_performance(aggregate('retailer_performance', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_retailer_performance(retailer_perf):
     purple_palette = get_purple_palette()
-    theme = get_theme_colors()
     
     fig = go.Figure()
     
@@ -320,18 +473,18 @@ def plot_retailer_performance(filtered_df):
         # xaxis=dict(title='Total Sales ($)'),
         # yaxis=dict(title='Operating Margin (%)'),
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
+    return fig
 
-def plot_product_category_performance(filtered_df):
+
+def plot_product_category_performance(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Product Category Performance</div>', unsafe_allow_html=True)
     
-    cat_perf = filtered_df.groupby('product_category').agg({'total_sales': 'sum', 'operating_profit': 'sum'}).reset_index()
-    cat_perf['total_sales_usd'] = cat_perf['total_sales'] / 1e6 
-    cat_perf['operating_profit_usd'] = cat_perf['operating_profit'] / 1e6 
-    
+    show_chart('product_category_performance', cache_key, lambda: render_product_category_performance(aggregate('product_category_performance', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_product_category_performance(cat_perf):
     purple_palette = get_purple_palette()
     fig = go.Figure()
     
@@ -361,31 +514,26 @@ def plot_product_category_performance(filtered_df):
         height=400,
         barmode='group'
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
-    best_category = cat_perf.nlargest(1, 'total_sales_usd').iloc[0]
-    st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
-def plot_gender_distribution(filtered_df):
+    return fig
+
+def plot_gender_distribution(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Gender Distribution by Category</div>', unsafe_allow_html=True)
     
-    gender_dist = filtered_df.groupby(['product_category', 'gender_type']).agg({'total_sales': 'sum'}).reset_index()
-    gender_dist['total_sales_usd'] = gender_dist['total_sales'] / 1e6 
-    
+    show_chart('gender_distribution', cache_key, lambda: render_gender_distribution(aggregate('gender_distribution', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_gender_distribution(sales):
     purple_palette = get_purple_palette()
     fig = go.Figure()
     
-    for i, gender in enumerate(gender_dist['gender_type'].unique()):
-        gender_data = gender_dist[gender_dist['gender_type'] == gender]
-        fig.add_trace(go.Bar(
-            x=gender_data['product_category'],
-            y=gender_data['total_sales_usd'],
-            name=gender,
-            marker=dict(color=purple_palette[i]),
-            hovertemplate=f'Category: %{{x}}<br>Gender: {gender}<br>Total Sales: $%{{y:.2f}}M<extra></extra>'
-        ))
+    fig.add_traces(series_traces(sales, lambda i, gender, x, y: go.Bar(
+        x=x,
+        y=y,
+        name=gender,
+        marker=dict(color=purple_palette[i % len(purple_palette)]),
+        hovertemplate=f'Category: %{{x}}<br>Gender: {gender}<br>Total Sales: $%{{y:.2f}}M<extra></extra>'
+    )))
     
     # Apply consistent styling
     fig = apply_chart_layout(fig, 'Product Category', 'Total Sales ($)', height=350)
@@ -395,48 +543,42 @@ def plot_gender_distribution(filtered_df):
         height=400,
         barmode='stack'
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
-def plot_gender_preferences(filtered_df):
+    return fig
+
+def plot_gender_preferences(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Product Preferences by Gender</div>', unsafe_allow_html=True)
     
-    # Alternative approach - create pivot table directly
     try:
-        # Method 1: Using pivot_table
-        gender_pref = filtered_df.pivot_table(
-            index='gender_type',
-            columns='product_category',
-            values='total_sales',
-            aggfunc='sum',
-            fill_value=0
-        ).reset_index()
-        
-        # Convert to millions for better readability
-        numeric_columns = [col for col in gender_pref.columns if col != 'gender_type']
-        for col in numeric_columns:
-            gender_pref[col] = gender_pref[col] / 1e6
-            
+        show_chart('gender_preferences', cache_key, lambda: render_gender_preferences(aggregate('gender_preferences', filtered_df, cache_key)),
+                   overlay=theme_gender_preferences)
     except Exception as e:
-        # Method 2: Manual groupby and reshape if pivot fails
-        try:
-            temp_df = filtered_df.groupby(['gender_type', 'product_category']).agg({'total_sales': 'sum'}).reset_index()
-            gender_pref = temp_df.pivot(index='gender_type', columns='product_category', values='total_sales').fillna(0).reset_index()
-            
-            # Convert to millions
-            numeric_columns = [col for col in gender_pref.columns if col != 'gender_type']
-            for col in numeric_columns:
-                gender_pref[col] = gender_pref[col] / 1e6
-                
-        except Exception as e2:
-            st.warning(f"Unable to create gender preferences chart - data processing error: {str(e2)}")
-            st.markdown('</div>', unsafe_allow_html=True)
-            return
+        st.warning(f"Unable to create gender preferences chart - data processing error: {str(e)}")
     
+    # # Add summary insights
+    # if len(gender_pref) > 0:
+    #     # Find top category for each gender
+    #     insights = []
+    #     for gender in gender_pref['gender_type'].unique():
+    #         gender_data = gender_pref[gender_pref['gender_type'] == gender]
+    #         if len(gender_data) > 0:
+    #             top_category = gender_data[categories].iloc[0].idxmax()
+    #             top_value = gender_data[categories].iloc[0].max()
+    #             insights.append(f"<strong>{gender}:</strong> {top_category} (${top_value:.1f}M)")
+        
+    #     if insights:
+    #         st.markdown(f"""
+    #             <div class="alert-success">
+    #                 🎯 <strong>Top Preferences:</strong><br>
+    #                 {' • '.join(insights)}
+    #             </div>
+    #         """, unsafe_allow_html=True)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_gender_preferences(gender_pref):
     # Get styling
     purple_palette = get_purple_palette()
-    theme = get_theme_colors()
     
     # Get categories (theta values) - exclude gender_type column
     categories = [col for col in gender_pref.columns if col != 'gender_type']
@@ -444,40 +586,35 @@ def plot_gender_preferences(filtered_df):
     # Create figure with improved styling
     fig = go.Figure()
     
-    # Add trace for each gender
-    for i, gender in enumerate(gender_pref['gender_type'].unique()):
-        gender_data = gender_pref[gender_pref['gender_type'] == gender]
-        
-        if len(gender_data) > 0:
-            # Get values for this gender
-            values = gender_data[categories].iloc[0].values
-            
-            # Convert hex color to RGB for fillcolor
-            hex_color = purple_palette[i % len(purple_palette)]
-            r = int(hex_color[1:3], 16)
-            g = int(hex_color[3:5], 16)
-            b = int(hex_color[5:7], 16)
-            
-            fig.add_trace(go.Scatterpolar(
-                r=values,
-                theta=categories,
-                fill='toself',
-                name=gender,
-                line=dict(
-                    color=hex_color,
-                    width=3
-                ),
-                fillcolor=f'rgba({r}, {g}, {b}, 0.25)',
-                marker=dict(
-                    size=8,
-                    color=hex_color,
-                    symbol='circle'
-                ),
-                hovertemplate='<b>%{fullData.name}</b><br>' +
-                             'Category: %{theta}<br>' +
-                             'Sales: $%{r:.2f}M<br>' +
-                             '<extra></extra>'
-            ))
+    def gender_trace(i, gender, theta, values):
+        # Convert hex color to RGB for fillcolor
+        hex_color = purple_palette[i % len(purple_palette)]
+        r = int(hex_color[1:3], 16)
+        g = int(hex_color[3:5], 16)
+        b = int(hex_color[5:7], 16)
+        return go.Scatterpolar(
+            r=values,
+            theta=theta,
+            fill='toself',
+            name=gender,
+            line=dict(
+                color=hex_color,
+                width=3
+            ),
+            fillcolor=f'rgba({r}, {g}, {b}, 0.25)',
+            marker=dict(
+                size=8,
+                color=hex_color,
+                symbol='circle'
+            ),
+            hovertemplate='<b>%{fullData.name}</b><br>' +
+                         'Category: %{theta}<br>' +
+                         'Sales: $%{r:.2f}M<br>' +
+                         '<extra></extra>'
+        )
+
+    # One trace per gender row of the pivoted frame (transposed so each gender is a column)
+    fig.add_traces(series_traces(gender_pref.set_index('gender_type')[categories].T, gender_trace))
     
     # Calculate max value for better axis scaling
     max_value = gender_pref[categories].max().max()
@@ -494,22 +631,16 @@ def plot_gender_preferences(filtered_df):
                 range=[0, axis_max],
                 showline=True,
                 linewidth=1,
-                linecolor=theme['grid_color'],
-                gridcolor=theme['grid_color'],
                 gridwidth=1,
-                tickfont=dict(size=11, color=theme['text_color'])
+                tickfont=dict(size=11)
             ),
             angularaxis=dict(
-                tickfont=dict(size=12, color=theme['text_color']),
-                linecolor=theme['grid_color'],
-                gridcolor=theme['grid_color']
-            ),
-            bgcolor=theme['bg_color']
+                tickfont=dict(size=12)
+            )
         ),
         height=400,
         showlegend=True,
-        paper_bgcolor=theme['bg_color'],
-        font=dict(family='Inter, sans-serif', size=14, color=theme['text_color']),
+        font=dict(family='Inter, sans-serif', size=14),
         legend=dict(
             x=0.5, 
             xanchor='center', 
@@ -520,51 +651,41 @@ def plot_gender_preferences(filtered_df):
         ),
         margin=dict(l=60, r=60, t=60, b=80)
     )
+
+    return fig
+
+def theme_gender_preferences(fig, theme):
+    apply_theme(fig, theme)
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(linecolor=theme['grid_color'], gridcolor=theme['grid_color'],
+                            tickfont=dict(color=theme['text_color'])),
+            angularaxis=dict(linecolor=theme['grid_color'], gridcolor=theme['grid_color'],
+                             tickfont=dict(color=theme['text_color'])),
+            bgcolor=theme['bg_color']
+        )
+    )
     
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # # Add summary insights
-    # if len(gender_pref) > 0:
-    #     # Find top category for each gender
-    #     insights = []
-    #     for gender in gender_pref['gender_type'].unique():
-    #         gender_data = gender_pref[gender_pref['gender_type'] == gender]
-    #         if len(gender_data) > 0:
-    #             top_category = gender_data[categories].iloc[0].idxmax()
-    #             top_value = gender_data[categories].iloc[0].max()
-    #             insights.append(f"<strong>{gender}:</strong> {top_category} (${top_value:.1f}M)")
-        
-    #     if insights:
-    #         st.markdown(f"""
-    #             <div class="alert-success">
-    #                 🎯 <strong>Top Preferences:</strong><br>
-    #                 {' • '.join(insights)}
-    #             </div>
-    #         """, unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-def plot_gender_trend(filtered_df):
+def plot_gender_trend(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Gender Purchase Trend</div>', unsafe_allow_html=True)
     
-    gender_trend = filtered_df.groupby(['month', 'gender_type']).agg({'total_sales': 'sum'}).reset_index()
-    gender_trend['total_sales_usd'] = gender_trend['total_sales'] / 1e6 
-    
+    show_chart('gender_trend', cache_key, lambda: render_gender_trend(aggregate('gender_trend', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_gender_trend(sales):
     purple_palette = get_purple_palette()
     fig = go.Figure()
     
-    for i, gender in enumerate(gender_trend['gender_type'].unique()):
-        gender_data = gender_trend[gender_trend['gender_type'] == gender]
-        fig.add_trace(go.Scatter(
-            x=gender_data['month'],
-            y=gender_data['total_sales_usd'],
-            mode='lines+markers',
-            name=gender,
-            line=dict(color=purple_palette[i], width=3),
-            marker=dict(size=8, symbol='circle'),
-            # Adjust hovertemplate to show uniform info, gender shown as trace name
-            hovertemplate='Month: %{x}<br>Total Sales: $%{y:.2f}M<extra></extra>'
-        ))
+    fig.add_traces(series_traces(sales, lambda i, gender, x, y: go.Scatter(
+        x=x,
+        y=y,
+        mode='lines+markers',
+        name=gender,
+        line=dict(color=purple_palette[i % len(purple_palette)], width=3),
+        marker=dict(size=8, symbol='circle'),
+        # Adjust hovertemplate to show uniform info, gender shown as trace name
+        hovertemplate='Month: %{x}<br>Total Sales: $%{y:.2f}M<extra></extra>'
+    ), budget=TREND_POINT_BUDGET))
     
     # Apply consistent styling
     fig = apply_chart_layout(fig, 'Month', 'Total Sales ($)', height=350)
@@ -579,17 +700,26 @@ def plot_gender_trend(filtered_df):
         height=400,
         hovermode='x unified'  # critical for unified vertical hover line
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
+    return fig
 
 
-def plot_units_per_category(filtered_df):
+
+def plot_units_per_category(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Units Sold by Category</div>', unsafe_allow_html=True)
     
-    units_cat = filtered_df.groupby('product_category').agg({'units_sold': 'sum'}).reset_index()
+    show_chart('units_per_category', cache_key, lambda: render_units_per_category(aggregate('units_per_category', filtered_df, cache_key)))
     
+    # top_category = units_cat.nlargest(1, 'units_sold').iloc[0]
+    # st.markdown(f"""
+    #     <div class="alert-success">
+    #         🏆 Top Category: {top_category['product_category']} 
+    #         ({top_category['units_sold']} units)
+    #     </div>
+    # """, unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_units_per_category(units_cat):
     purple_palette = get_purple_palette()
     colors = [purple_palette[i % len(purple_palette)] for i in range(len(units_cat))]
     
@@ -607,56 +737,46 @@ def plot_units_per_category(filtered_df):
     fig.update_layout(
         height=400
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # top_category = units_cat.nlargest(1, 'units_sold').iloc[0]
-    # st.markdown(f"""
-    #     <div class="alert-success">
-    #         🏆 Top Category: {top_category['product_category']} 
-    #         ({top_category['units_sold']} units)
-    #     </div>
-    # """, unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
-def plot_margin_per_category(filtered_df):
+    return fig
+
+def plot_margin_per_category(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Relationship Between Price and Volume</div>', unsafe_allow_html=True)
     
-    # Prepare data for scatter plot
-    scatter_data = filtered_df.copy()
-    
-    # Get theme colors for dark/light mode
-    theme_colors = get_theme_colors()
-    
+    show_chart('margin_per_category', cache_key, lambda: render_margin_per_category(aggregate('margin_per_category', filtered_df, cache_key)),
+               overlay=theme_margin_per_category)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_margin_per_category(points):
     purple_palette = get_purple_palette()
-    # Create gradient colors based on product category
-    categories = scatter_data['product_category'].unique()
-    category_colors = {}
-    for i, category in enumerate(categories):
-        color_idx = i % len(purple_palette)
-        category_colors[category] = purple_palette[color_idx]
+    binned = points.attrs.get('binned', False)
     
     fig = go.Figure()
     
-    # Add scatter points for each category
-    for category in categories:
-        category_data = scatter_data[scatter_data['product_category'] == category]
-        
-        fig.add_trace(go.Scatter(
+    # Add one WebGL scatter trace per category; binned cells are sized by how many transactions they hold
+    for i, (category, category_data) in enumerate(points.groupby('product_category', sort=False)):
+        if binned:
+            counts = category_data['transactions'].to_numpy()
+            marker = dict(size=4 + 14 * np.sqrt(counts / counts.max()), line=dict(width=0))
+            hovertemplate = ('<b>%{fullData.name}</b><br>' +
+                             'Price: ~$%{x:.2f}<br>' +
+                             'Volume: ~%{y:,.0f}<br>' +
+                             'Transactions: %{customdata:,}<br>' +
+                             '<extra></extra>')
+        else:
+            marker = dict(size=8, line=dict(width=1))
+            hovertemplate = ('<b>%{fullData.name}</b><br>' +
+                             'Price: $%{x:.2f}<br>' +
+                             'Volume: %{y:,.0f}<br>' +
+                             '<extra></extra>')
+        fig.add_trace(go.Scattergl(
             x=category_data['price_per_unit'],
             y=category_data['units_sold'],
             mode='markers',
             name=category,
-            marker=dict(
-                color=category_colors[category],
-                size=8,
-                opacity=0.7,
-                line=dict(width=1, color=theme_colors['grid_color'])
-            ),
-            hovertemplate='<b>%{fullData.name}</b><br>' +
-                         'Price: $%{x:.2f}<br>' +
-                         'Volume: %{y:,.0f}<br>' +
-                         '<extra></extra>'
+            marker=dict(color=purple_palette[i % len(purple_palette)], opacity=0.7, **marker),
+            customdata=category_data['transactions'] if binned else None,
+            hovertemplate=hovertemplate
         ))
     
     # Apply consistent styling
@@ -668,20 +788,23 @@ def plot_margin_per_category(filtered_df):
             yanchor="bottom",
             y=1.02,
             xanchor="right",
-            x=1,
-            font=dict(color=theme_colors['text_color'])
+            x=1
         )
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
-def plot_regional_sales(filtered_df):
+    return fig
+
+def theme_margin_per_category(fig, theme):
+    apply_theme(fig, theme)
+    fig.update_traces(marker_line_color=theme['grid_color'])
+
+def plot_regional_sales(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Sales Hierarchy Treemap</div>', unsafe_allow_html=True)
     
-    regional_sales = filtered_df.groupby('region').agg({'total_sales': 'sum'}).reset_index()
-    regional_sales['total_sales_usd'] = regional_sales['total_sales'] / 1e6 
-    
+    show_chart('regional_sales', cache_key, lambda: render_regional_sales(aggregate('regional_sales', filtered_df, cache_key)))
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_regional_sales(regional_sales):
     purple_palette = get_purple_palette()
     # Create gradient colors based on sales values
     colors = []
@@ -710,51 +833,36 @@ def plot_regional_sales(filtered_df):
     fig.update_layout(
         height=400
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
-def plot_sales_map(filtered_df):
+    return fig
+
+def plot_sales_map(filtered_df, cache_key=None, level='city'):
     st.markdown('<div class="chart-container"><div class="chart-title">Sales Map</div>', unsafe_allow_html=True)
     
-    city_sales = filtered_df.groupby('city').agg({'total_sales': 'sum'}).reset_index()
-    city_sales['total_sales_usd'] = city_sales['total_sales'] / 1e6 
-    
-    city_coords = {
-        'Philadelphia': (39.9526, -75.1652), 'Providence': (41.8236, -71.4222),
-        'New York': (40.7128, -74.0060), 'Wilmington': (39.7392, -75.5397),
-        'Manchester': (42.9956, -71.4548), 'Hartford': (41.7658, -72.6734),
-        'Charleston': (32.7765, -79.9311), 'Baltimore': (39.2904, -76.6122),
-        'Boston': (42.3601, -71.0589), 'Portland': (43.6615, -70.2553),
-        'Burlington': (44.4759, -73.2121), 'Newark': (40.7357, -74.1724),
-        'Albany': (42.6526, -73.7562), 'Columbus': (39.9612, -82.9988),
-        'Detroit': (42.3314, -83.0458), 'Fargo': (46.8772, -96.7898),
-        'Sioux Falls': (43.5343, -96.7311), 'St. Louis': (38.6270, -90.1994),
-        'Des Moines': (41.5868, -93.6250), 'Indianapolis': (39.7684, -86.1581),
-        'Milwaukee': (43.0389, -87.9065), 'Chicago': (41.8781, -87.6298),
-        'Minneapolis': (44.9778, -93.2650), 'Omaha': (41.2524, -95.9980),
-        'Wichita': (37.6872, -97.3301), 'Richmond': (37.5407, -77.4360),
-        'Atlanta': (33.7490, -84.3880), 'Orlando': (28.5383, -81.3792),
-        'Miami': (25.7617, -80.1918), 'Louisville': (38.2527, -85.7585),
-        'Charlotte': (35.2271, -80.8431), 'Salt Lake City': (40.7608, -111.8910),
-        'Anchorage': (61.2181, -149.9003), 'Cheyenne': (41.1399, -104.8202),
-        'Los Angeles': (34.0522, -118.2437), 'Seattle': (47.6062, -122.3321),
-        'Dallas': (32.7767, -96.7970), 'Knoxville': (35.9606, -83.9207),
-        'Birmingham': (33.5186, -86.8104), 'Jackson': (32.2988, -90.1848),
-        'Billings': (45.7833, -108.5007), 'New Orleans': (29.9511, -90.0715),
-        'Houston': (29.7604, -95.3698), 'Oklahoma City': (35.4676, -97.5164),
-        'Little Rock': (34.7465, -92.2896), 'San Francisco': (37.7749, -122.4194),
-        'Boise': (43.6150, -116.2023), 'Honolulu': (21.3069, -157.8583),
-        'Albuquerque': (35.0845, -106.6504), 'Phoenix': (33.4484, -112.0740),
-        'Denver': (39.7392, -104.9903), 'Las Vegas': (36.1699, -115.1398)
-    }
-    
-    city_sales['lat'] = city_sales['city'].map(lambda x: city_coords.get(x, (0, 0))[0])
-    city_sales['lon'] = city_sales['city'].map(lambda x: city_coords.get(x, (0, 0))[1])
+    fig = show_chart(('sales_map', level), cache_key, lambda: render_sales_map(aggregate('sales_map', filtered_df, cache_key, level=level)),
+                     overlay=theme_sales_map)
+    coverage = fig.layout.meta or {}
+    notes = []
+    if coverage.get('hidden_markers'):
+        notes.append(f"{coverage['hidden_markers']:,} smaller locations not shown")
+    if coverage.get('unmapped_sales'):
+        notes.append(f"${coverage['unmapped_sales'] / 1e6:,.2f}M in sales without coordinates")
+    if notes:
+        st.caption(" • ".join(notes))
     
+    # top_city = city_sales.nlargest(1, 'total_sales_usd').iloc[0]
+    # st.markdown(f"""
+    #     <div class="alert-success">
+    #         🌆 Top City: {top_city['city']} 
+    #         (${top_city['total_sales_usd']:.1f}M)
+    #     </div>
+    # """, unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_sales_map(markers):
+    import plotly.express as px  # only the map uses Plotly Express, which takes ~0.1 s to import
     # Get consistent styling
     purple_palette = get_purple_palette()
-    theme = get_theme_colors()
     
     # Create custom purple color scale to match other visualizations
     purple_colorscale = [
@@ -767,12 +875,12 @@ def plot_sales_map(filtered_df):
     
     # Create the map visualization with consistent purple theme
     fig = px.scatter_geo(
-        city_sales, 
-        lat='lat', 
-        lon='lon', 
+        markers, 
+        lat='latitude', 
+        lon='longitude', 
         size='total_sales_usd', 
         color='total_sales_usd',
-        hover_name='city', 
+        hover_name='location', 
         hover_data={'total_sales_usd': ':$.2f'},
         title='', 
         color_continuous_scale=purple_colorscale
@@ -782,7 +890,7 @@ def plot_sales_map(filtered_df):
     fig.update_traces(
         marker=dict(
             sizemode='diameter',
-            sizeref=2. * max(city_sales['total_sales_usd']) / (12.**2),  # Reduced from 40 to 20
+            sizeref=2. * (markers['total_sales_usd'].max() if len(markers) else 1) / (12.**2),  # Reduced from 40 to 20
             sizemin=2,  # Reduced minimum size from 4 to 2
             line=dict(width=1, color='white')
         ),
@@ -794,7 +902,6 @@ def plot_sales_map(filtered_df):
         geo=dict(
             scope='usa', 
             projection_type='albers usa',
-            bgcolor=theme['bg_color'],
             showland=True,
             landcolor='rgba(243, 243, 243, 0.8)',
             coastlinecolor='rgba(204, 204, 204, 0.8)',
@@ -803,39 +910,42 @@ def plot_sales_map(filtered_df):
         ),
         height=400,  # Consistent with other charts
         showlegend=False,
-        paper_bgcolor=theme['bg_color'],
-        font=dict(family='Inter, sans-serif', size=14, color=theme['text_color']),
+        font=dict(family='Inter, sans-serif', size=14),
         margin=dict(l=40, r=40, t=60, b=40),
         coloraxis_colorbar=dict(
             title="Sales ($M)",
-            titlefont=dict(color=theme['text_color']),
-            tickfont=dict(color=theme['text_color']),
             tickformat='.1f',
             tickprefix='$',
             ticksuffix='M'
+        ),
+        # Coverage notes for the caption under the map
+        meta=dict(hidden_markers=markers.attrs.get('hidden_markers', 0),
+                  unmapped_sales=markers.attrs.get('unmapped_sales', 0.0))
+    )
+
+    return fig
+
+def theme_sales_map(fig, theme):
+    fig.update_layout(
+        geo_bgcolor=theme['bg_color'],
+        paper_bgcolor=theme['bg_color'],
+        font_color=theme['text_color'],
+        coloraxis_colorbar=dict(
+            titlefont=dict(color=theme['text_color']),
+            tickfont=dict(color=theme['text_color'])
         )
     )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # top_city = city_sales.nlargest(1, 'total_sales_usd').iloc[0]
-    # st.markdown(f"""
-    #     <div class="alert-success">
-    #         🌆 Top City: {top_city['city']} 
-    #         (${top_city['total_sales_usd']:.1f}M)
-    #     </div>
-    # """, unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
 
-def plot_sales_method_distribution(filtered_df):
+def plot_sales_method_distribution(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Sales by Method</div>', unsafe_allow_html=True)
     
-    sales_method = filtered_df.groupby('sales_method').agg({'total_sales': 'sum'}).reset_index()
-    sales_method['total_sales_usd'] = sales_method['total_sales'] / 1e6 
-    
+    show_chart('sales_method_distribution', cache_key, lambda: render_sales_method_distribution(aggregate('sales_method_distribution', filtered_df, cache_key)),
+               overlay=theme_sales_method_distribution)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_sales_method_distribution(sales_method):
     purple_palette = get_purple_palette()
-    theme = get_theme_colors()
     
     # Membuat pie chart dengan warna konsisten dari palet ungu
     fig = go.Figure(data=[go.Pie(
@@ -844,52 +954,55 @@ def plot_sales_method_distribution(filtered_df):
         marker=dict(colors=purple_palette[:len(sales_method)]),
         hoverinfo='label+percent+value',
         textinfo='percent',
-        textfont=dict(family='Inter, sans-serif', size=14, color=theme['text_color']),
+        textfont=dict(family='Inter, sans-serif', size=14),
         hole=0.4
     )])
     
     fig.update_layout(
         height=350,
-        paper_bgcolor=theme['bg_color'],
-        font=dict(family='Inter, sans-serif', size=14, color=theme['text_color']),
+        font=dict(family='Inter, sans-serif', size=14),
         margin=dict(l=40, r=40, t=60, b=40),
         showlegend=True,
-        legend=dict(x=0.5, xanchor='center', y=1.1, orientation='h', font=dict(color=theme['text_color'])) # Set legend text color
+        legend=dict(x=0.5, xanchor='center', y=1.1, orientation='h')
     )
 
+    return fig
+
+def theme_sales_method_distribution(fig, theme):
+    fig.update_layout(
+        paper_bgcolor=theme['bg_color'],
+        font_color=theme['text_color'],
+        legend_font_color=theme['text_color'] # Set legend text color
+    )
     # Update text color inside the pie chart
     fig.update_traces(textfont_color=theme['text_color'])
-    
-    st.plotly_chart(fig, use_container_width=True)
-    st.markdown('</div>', unsafe_allow_html=True)
 
 
 
-def plot_sales_method_trend(filtered_df):
+def plot_sales_method_trend(filtered_df, cache_key=None):
     st.markdown('<div class="chart-container"><div class="chart-title">Sales Method Trend</div>', unsafe_allow_html=True)
     
-    # Prepare data
-    method_trend = filtered_df.groupby(['month', 'sales_method']).agg({'total_sales': 'sum'}).reset_index()
-    method_trend['total_sales_usd'] = method_trend['total_sales'] / 1e6 
+    show_chart('sales_method_trend', cache_key, lambda: render_sales_method_trend(aggregate('sales_method_trend', filtered_df, cache_key)))
+    
+    st.markdown('</div>', unsafe_allow_html=True)
     
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_sales_method_trend(sales):
     purple_palette = get_purple_palette()
-    theme = get_theme_colors()
     
     fig = go.Figure()
-    sales_methods = method_trend['sales_method'].unique()
     
     # Add one line for each sales method
-    for i, method in enumerate(sales_methods):
-        data = method_trend[method_trend['sales_method'] == method]
-        fig.add_trace(go.Scatter(
-            x=data['month'],
-            y=data['total_sales_usd'],
-            mode='lines+markers',
-            name=method,
-            line=dict(color=purple_palette[i % len(purple_palette)], width=3),
-            marker=dict(size=8, symbol='circle'),
-            hovertemplate=f'Month: %{{x}}<br>Method: {method}<br>Total Sales: $%{{y:.2f}}M<extra></extra>'
-        ))
+    fig.add_traces(series_traces(sales, lambda i, method, x, y: go.Scatter(
+        x=x,
+        y=y,
+        mode='lines+markers',
+        name=method,
+        line=dict(color=purple_palette[i % len(purple_palette)], width=3),
+        marker=dict(size=8, symbol='circle'),
+        hovertemplate=f'Month: %{{x}}<br>Method: {method}<br>Total Sales: $%{{y:.2f}}M<extra></extra>'
+    ), budget=TREND_POINT_BUDGET))
     
     # Apply consistent styling
     fig = apply_chart_layout(fig, 'Month', 'Total Sales (Million $)')
@@ -901,21 +1014,87 @@ def plot_sales_method_trend(filtered_df):
         yaxis=dict(tickformat='.2f', tickprefix='$ '),
         height=350,
         margin=dict(l=80, r=40, t=60, b=40),
-        paper_bgcolor=theme['bg_color'],
-        plot_bgcolor=theme['bg_color'],
-        font=dict(family='Inter, sans-serif', size=14, color=theme['text_color']),
+        font=dict(family='Inter, sans-serif', size=14),
         legend=dict(x=0.5, xanchor='center', y=1.1, orientation='h'),
         hovermode='x unified'
     )
+
+    return fig
+
+
+def plot_anomalies(anomalies, cache_key=None):
+    st.markdown('<div class="chart-container"><div class="chart-title">Sales Anomalies by Segment</div>', unsafe_allow_html=True)
     
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Display method performance summary
-    total_sales_by_method = method_trend.groupby('sales_method')['total_sales_usd'].sum().reset_index()
-    best_method = total_sales_by_method.loc[total_sales_by_method['total_sales_usd'].idxmax()]
-    total_methods = len(sales_methods)
-    avg_sales = total_sales_by_method['total_sales_usd'].mean()
-    
+    show_chart('anomalies', cache_key, lambda: render_anomalies(anomalies))
     st.markdown('</div>', unsafe_allow_html=True)
+
+def render_anomalies(anomalies):
+    purple_palette = get_purple_palette()
+    fig = go.Figure()
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    # One marker series per dimension; marker size follows the anomaly score
+    for i, dimension in enumerate(anomalies['dimension'].unique()):
+        dimension_data = anomalies[anomalies['dimension'] == dimension]
+        fig.add_trace(go.Scatter(
+            x=dimension_data['period'],
+            y=dimension_data['score'],
+            mode='markers',
+            name=dimension.replace('_', ' ').title(),
+            marker=dict(
+                size=(dimension_data['score'].abs().clip(upper=12) + 4),
+                color=purple_palette[i % len(purple_palette)],
+                opacity=0.8
+            ),
+            customdata=dimension_data[['segment', 'total_sales', 'baseline']],
+            hovertemplate='%{customdata[0]}<br>Date: %{x|%Y-%m-%d}<br>Sales: $%{customdata[1]:,.0f}<br>Baseline: $%{customdata[2]:,.0f}<br>Score: %{y:.1f}<extra></extra>'
+        ))
+    
+    # Apply consistent styling
+    fig = apply_chart_layout(fig, 'Period', 'Anomaly Score', height=400)
+    fig.update_layout(hovermode='closest')
+
+    return fig
+
+# Charts drawn as render_<chart>(aggregate '<chart>') with no widget parameters
+FIGURE_RENDERERS = {
+    'multi_period_trend': render_multi_period_trend,
+    'annual_sales_profit': render_annual_sales_profit,
+    'units_trend': render_units_trend,
+    'top_retailers': render_top_retailers,
+    'retailer_performance': render_retailer_performance,
+    'product_category_performance': render_product_category_performance,
+    'gender_distribution': render_gender_distribution,
+    'gender_preferences': render_gender_preferences,
+    'gender_trend': render_gender_trend,
+    'units_per_category': render_units_per_category,
+    'margin_per_category': render_margin_per_category,
+    'regional_sales': render_regional_sales,
+    'sales_method_distribution': render_sales_method_distribution,
+    'sales_method_trend': render_sales_method_trend,
+}
+
+# Theme overlays of the charts that need more than apply_theme
+FIGURE_OVERLAYS = {
+    'gender_preferences': theme_gender_preferences,
+    'margin_per_category': theme_margin_per_category,
+    'sales_map': theme_sales_map,
+    'sales_method_distribution': theme_sales_method_distribution,
+}
+
+def warm_figures(figure_cache, scheduler, filtered_df, cache_key, prediction_result=None, map_level='city'):
+    """Build every chart of one filter into the figure cache under the keys the plot_* functions use.
+
+    Runs outside any session (no Streamlit calls); returns the number of figures built.
+    """
+    built = 0
+    for chart, render in FIGURE_RENDERERS.items():
+        built += figure_cache.warm((chart, cache_key), lambda: render(scheduler.result(chart, filtered_df, cache_key)))
+    built += figure_cache.warm((('sales_map', map_level), cache_key),
+                               lambda: render_sales_map(scheduler.result('sales_map', filtered_df, cache_key, level=map_level)))
+    # The trend chart is drawn without the forecast band first, then again once the forecast is in
+    monthly_data = scheduler.result('sales_profit_trend', filtered_df, cache_key)
+    built += figure_cache.warm((('sales_profit_trend', False), cache_key), lambda: render_sales_profit_trend(monthly_data, None))
+    if isinstance(prediction_result, dict) and prediction_result.get('interval'):
+        built += figure_cache.warm((('sales_profit_trend', True), cache_key),
+                                   lambda: render_sales_profit_trend(monthly_data, prediction_result))
+    return built
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+from instrumentation import span, trace
+from processing import calculate_kpis, dataset_version, filter_data, get_period_options
+from visualizations import warm_figures
+
+# Set to 0 to skip warming the period presets after the first page render
+CACHE_WARMUP = os.environ.get('ADIDAS_CACHE_WARMUP', '1') != '0'
+
+class CacheWarmup:
+    """Background pass over every period preset that fills the shared caches before an analyst picks it.
+
+    Per period it queues the aggregates and KPIs on the aggregation scheduler, fits the
+    forecast and builds the figures, under the same keys the sessions use. Periods run
+    one after another, so at most one period's jobs sit ahead of a session's in the pool.
+    """
+
+    def __init__(self, df, requests, scheduler, forecast_jobs, figure_cache):
+        self.df = df
+        self.requests = requests
+        self.scheduler = scheduler
+        self.forecast_jobs = forecast_jobs
+        self.figure_cache = figure_cache
+        self.periods = list(get_period_options(df).items())
+        self.completed = 0
+        self.current = None
+        self.errors = {}  # period label -> exception text
+        self.elapsed_ms = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the warm-up thread once; later calls are no-ops"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cache-warmup', daemon=True)
+                self._thread.start()
+
+    def started(self):
+        return self._thread is not None
+
+    def done(self):
+        return self._thread is not None and not self._thread.is_alive()
+
+    def progress(self):
+        """(periods finished, total periods, label of the period in progress)"""
+        return self.completed, len(self.periods), self.current
+
+    def _run(self):
+        start = time.perf_counter()
+        with trace('cache_warmup'):
+            version = dataset_version(self.df)
+            for label, (start_date, end_date) in self.periods:
+                self.current = label
+                try:
+                    with span('warmup.period', period=label):
+                        self._warm_period(version, start_date, end_date)
+                except Exception as e:
+                    self.errors[label] = str(e)
+                self.completed += 1
+        self.current = None
+        self.elapsed_ms = (time.perf_counter() - start) * 1000
+
+    def _warm_period(self, version, start_date, end_date):
+        filtered_df = filter_data(self.df, start_date, end_date)
+        chart_key = (version, start_date, end_date)
+        self.scheduler.submit_all(self.requests, filtered_df, chart_key)
+        self.scheduler.call('kpis', chart_key, calculate_kpis, filtered_df, self.df).result()
+        monthly_data = self.scheduler.result('sales_profit_trend', filtered_df, chart_key)
+        forecast = self.forecast_jobs.submit(monthly_data, (start_date, end_date), algorithm='random_forest')
+        for request in self.requests:
+            name, params = (request, {}) if isinstance(request, str) else request
+            self.scheduler.result(name, filtered_df, chart_key, **params)
+        prediction_result, _, _ = forecast.result()
+        warm_figures(self.figure_cache, self.scheduler, filtered_df, chart_key, prediction_result)